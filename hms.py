@@ -1,161 +1,553 @@
+import argparse
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
 import os
+import re
 import subprocess
 import sys
-import time # Import time for potential debugging sleep, though not used in final code
-from datetime import date # Import date for date comparisons
+import threading
+import time # Used for per-step timings
+from concurrent.futures import ThreadPoolExecutor
 
 # Define the project directory name
 project_dir = "hotel_management_system"
 main_project_name = "hotel_management"
 app_name = "hotel"
 
+# Per-step fingerprints and output hashes, kept next to manage.py so a re-run
+# only redoes the steps whose inputs changed
+MANIFEST_FILE = ".hms_manifest.json"
+
+STEPS = [] # Registered in file order by @step
+manifest = {}
+current_step = threading.local() # Parallel steps each track their own outputs
+run_options = {"in_process": False, "serve": "dev", "database": "sqlite"}
+
+
+def step(step_id, title, required=False, always=False, blocking=False, parallel=False, done=None, fingerprint=None, products=()):
+    """
+    Register a provisioning step.
+
+    required:    selected even when --only/--from leave it out (it sets the working directory)
+    always:      never skipped as up to date
+    blocking:    does not return (the dev server); the timing summary is printed before it
+    parallel:    only writes its own files, so it may run alongside neighbouring parallel steps
+    done:        callable returning True once the step's effect is already in place
+    fingerprint: callable returning a string that changes whenever the step must re-run
+    products:    paths that must exist for a matching fingerprint to count as up to date
+    """
+    def register(function):
+        STEPS.append({
+            "id": step_id, "title": title, "function": function, "required": required,
+            "always": always, "blocking": blocking, "parallel": parallel, "done": done,
+            "fingerprint": fingerprint, "products": products,
+        })
+        return function
+    return register
+
+
+def content_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    with open(path) as f:
+        return content_digest(f.read())
+
+
+def tree_digest(root):
+    """Digest of every file name and content under `root`, in a stable order."""
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            digest.update(os.path.relpath(path, root).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def write_file(path, content):
+    """Write `content` to `path` unless the file already holds exactly that content."""
+    digest = content_digest(content)
+    outputs = manifest.setdefault(current_step.id, {}).setdefault("outputs", {})
+    outputs[path] = digest
+    if os.path.exists(path) and file_digest(path) == digest:
+        return False
+    with open(path, 'w') as f:
+        f.write(content)
+    current_step.changed.append(path)
+    return True
+
+
+def setup_django():
+    """Configure the generated project's settings in this process, once."""
+    if run_options.get("django_ready"):
+        return
+    import django
+    from django.apps import apps
+    from django.conf import settings
+    from django.core.management import get_commands
+    from django.utils.functional import empty
+    # startproject/startapp set Django up with empty stub settings when they run
+    # in-process; drop those so the project's own settings module is loaded
+    stub_ready = apps.ready
+    settings._wrapped = empty
+    os.environ["DJANGO_SETTINGS_MODULE"] = f"{main_project_name}.settings"
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    django.setup()
+    if stub_ready:
+        apps.set_installed_apps(settings.INSTALLED_APPS)
+    # The command table was cached before the project's apps were known
+    get_commands.cache_clear()
+    run_options["django_ready"] = True
+
+
+def manage(*args):
+    """
+    Run a Django management command.
+
+    By default each command is its own `python manage.py ...` process. With
+    --in-process they go through call_command() in this interpreter, so Django
+    starts up once rather than once per command.
+    """
+    if not run_options["in_process"]:
+        # startproject runs before manage.py exists
+        entry = ["-m", "django"] if args[0] == "startproject" else ["manage.py"]
+        subprocess.run([sys.executable, *entry, *args], check=True)
+        return
+    from django.core.management import call_command
+    if args[0] not in ("startproject", "startapp"):
+        setup_django()
+    try:
+        call_command(*args)
+    except Exception as e:
+        # Fail the same way the subprocess path does so the steps' error handling is unchanged
+        raise subprocess.CalledProcessError(1, ["manage.py", *args], stderr=str(e).encode()) from e
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                manifest.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {path}: {e}")
+
+
+def save_manifest(path):
+    if not os.path.isdir(os.path.dirname(path)):
+        return
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
 # --- Step 1: Create project directory and navigate into it ---
-print(f"Creating project directory: {project_dir}")
-os.makedirs(project_dir, exist_ok=True)
-# Change to the project directory
-try:
-    os.chdir(project_dir)
-    print(f"Changed current directory to: {os.getcwd()}")
-except OSError as e:
-    print(f"Error changing directory to {project_dir}: {e}")
-    sys.exit(1) # Exit if we can't change directory
+
+@step("1", "Create project directory and navigate into it", required=True, always=True)
+def create_project_directory():
+    print(f"Creating project directory: {project_dir}")
+    os.makedirs(project_dir, exist_ok=True)
+    # Change to the project directory
+    try:
+        os.chdir(project_dir)
+        print(f"Changed current directory to: {os.getcwd()}")
+    except OSError as e:
+        print(f"Error changing directory to {project_dir}: {e}")
+        sys.exit(1) # Exit if we can't change directory
+
 
 # --- Step 2: Install Django (if not already installed) ---
-print("Checking for Django installation...")
-try:
-    # Check if django-admin is available
-    subprocess.run(["django-admin", "--version"], check=True, capture_output=True)
-    print("Django is already installed.")
-except (subprocess.CalledProcessError, FileNotFoundError):
-    print("Django not found. Installing Django...")
+
+# The generated code needs Django 5.1. The Booking model's check-out-after-check-in
+# constraint uses CheckConstraint(condition=...) (check= before 5.1), and settings.py
+# passes the SQLite "transaction_mode"/"init_command" OPTIONS.
+MIN_DJANGO_VERSION = (5, 1)
+DJANGO_REQUIREMENT = "django>=5.1"
+
+
+def installed_django_version():
+    try:
+        return tuple(int(part) for part in re.findall(r"\d+", importlib.metadata.version("django"))[:2])
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def django_missing():
+    version = installed_django_version()
+    return version is None or version < MIN_DJANGO_VERSION
+
+
+def postgres_driver_missing():
+    return run_options["database"] == "postgres" and importlib.util.find_spec("psycopg") is None
+
+
+@step("2", "Install Django (if not already installed)",
+      done=lambda: not django_missing() and not postgres_driver_missing())
+def install_django():
+    print("Checking for Django installation...")
+    version = installed_django_version()
+    if not django_missing():
+        print("Django is already installed.")
+    else:
+        if version is None:
+            print("Django not found. Installing Django...")
+        else:
+            print(f"Django {'.'.join(map(str, version))} is too old; this project needs {DJANGO_REQUIREMENT}. Upgrading...")
+        try:
+            subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", DJANGO_REQUIREMENT], check=True)
+            print("Django installed successfully.")
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.decode() if e.stderr else "No error output."
+            print(f"Error installing Django: {error_output}")
+            sys.exit(1)
+    if postgres_driver_missing():
+        print("Installing the PostgreSQL driver and connection pool (psycopg)...")
+        try:
+            subprocess.run([sys.executable, "-m", "pip", "install", "psycopg[binary,pool]"], check=True)
+            print("psycopg installed successfully.")
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.decode() if e.stderr else "No error output."
+            print(f"Error installing psycopg: {error_output}")
+            sys.exit(1)
+
+
+# --- Step 3: Create Django project ---
+
+@step("3", "Create Django project", done=lambda: os.path.exists("manage.py"))
+def create_django_project():
+    print(f"Creating Django project: {main_project_name}")
     try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "django"], check=True)
-        print("Django installed successfully.")
+        # Corrected: Use 'python -m django startproject' to create the project and manage.py
+        manage("startproject", main_project_name, ".")
+        print("Django project created successfully.")
     except subprocess.CalledProcessError as e:
         error_output = e.stderr.decode() if e.stderr else "No error output."
-        print(f"Error installing Django: {error_output}")
+        print(f"Error creating Django project: {error_output}")
         sys.exit(1)
 
-# --- Step 3: Create Django project ---
-print(f"Creating Django project: {main_project_name}")
-try:
-    # Corrected: Use 'python -m django startproject' to create the project and manage.py
-    subprocess.run([sys.executable, "-m", "django", "startproject", main_project_name, "."], check=True)
-    print("Django project created successfully.")
-except subprocess.CalledProcessError as e:
-    error_output = e.stderr.decode() if e.stderr else "No error output."
-    print(f"Error creating Django project: {error_output}")
-    sys.exit(1)
 
 # --- Step 4: Configure basic settings (ALLOWED_HOSTS and Static Files) ---
 settings_file_path = os.path.join(main_project_name, "settings.py")
-print(f"Configuring settings file: {settings_file_path}")
-try:
-    with open(settings_file_path, 'r') as f:
-        settings_content = f.read()
-
-    # Ensure 'import os' is at the top if not already present
-    if "import os" not in settings_content:
-        settings_content = "import os\n" + settings_content
-
-    # Add '*' to ALLOWED_HOSTS
-    settings_content = settings_content.replace(
-        "ALLOWED_HOSTS = []",
-        "ALLOWED_HOSTS = ['*']"
-    )
-
-    # Add STATIC_URL, STATICFILES_DIRS, and STATIC_ROOT for serving static files
-    # Check if STATIC_URL is defined, then replace or append
-    if "STATIC_URL = 'static/'" in settings_content:
-        settings_content = settings_content.replace(
-            "STATIC_URL = 'static/'",
-            """STATIC_URL = 'static/'
-STATICFILES_DIRS = [
+static_files_settings = """STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'hotel/static'),
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') # Add STATIC_ROOT
 """
-        )
+
+# hms.py --serve production runs the app server with DJANGO_DEBUG=0
+production_settings = """
+# Production serving: WhiteNoise serves static files from the app server when
+# it is installed; without it hotel_management/urls.py serves STATIC_ROOT
+import importlib.util
+if importlib.util.find_spec('whitenoise'):
+    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+"""
+
+# Minified, content-hashed and precompressed static files (hotel/assets.py)
+static_pipeline_settings = """
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'hotel.assets.CompressedManifestStaticFilesStorage'},
+}
+"""
+
+# Templates are compiled once per process and kept, instead of being re-read for every render
+cached_template_loaders = """            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+"""
+
+# Opt-in request instrumentation (hotel/instrumentation.py); outermost so it times every other middleware
+instrumentation_settings = """
+HOTEL_INSTRUMENTATION = os.environ.get('HOTEL_INSTRUMENTATION', '0') == '1'
+HOTEL_SLOW_QUERY_MS = int(os.environ.get('HOTEL_SLOW_QUERY_MS', '100'))
+MIDDLEWARE.insert(0, 'hotel.instrumentation.InstrumentationMiddleware')
+"""
+
+# Database profile. hms.py --database picks the default; HOTEL_DATABASE overrides it for a single run.
+# PostgreSQL gets psycopg's connection pool when psycopg_pool is installed, otherwise persistent
+# connections (Django refuses CONN_MAX_AGE together with a pool).
+database_settings = """
+HOTEL_DATABASE = os.environ.get('HOTEL_DATABASE', 'sqlite')
+if HOTEL_DATABASE == 'postgres':
+    import importlib.util
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'hotel_management'),
+            'USER': os.environ.get('POSTGRES_USER', 'hotel_management'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('POSTGRES_POOL', '1') == '1' and importlib.util.find_spec('psycopg_pool'):
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {'min_size': 2, 'max_size': int(os.environ.get('POSTGRES_POOL_SIZE', '10')), 'timeout': 10},
+        }
     else:
-        # Fallback if STATIC_URL line is different or missing
-        settings_content += """
-# Custom static files configuration
-STATIC_URL = 'static/'
-STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, 'hotel/static'),
-]
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') # Add STATIC_ROOT
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('POSTGRES_CONN_MAX_AGE', '600'))
+"""
+
+# hotel_management/asgi.py switches this on, so ASGI servers route the read-heavy pages to hotel/async_views.py
+async_views_settings = """
+HOTEL_ASYNC_VIEWS = os.environ.get('HOTEL_ASYNC_VIEWS', '0') == '1'
+"""
+
+# Where the background invoice renderer (hotel/invoicing.py) writes printable invoices
+invoice_settings = """
+HOTEL_INVOICE_DIR = os.environ.get('HOTEL_INVOICE_DIR', os.path.join(BASE_DIR, 'invoices'))
+"""
+
+# Which version of the generated code is running: a digest of hms.py's step manifest, which changes
+# whenever a re-run rewrites a generated file. It goes into the keys of cached template fragments
+# (hotel/context_processors.py), so after a deploy no page is served with the previous version's markup.
+build_settings = """
+def _hotel_build_id():
+    import hashlib
+    try:
+        with open(os.path.join(BASE_DIR, '.hms_manifest.json'), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'unversioned'
+HOTEL_BUILD_ID = os.environ.get('HOTEL_BUILD_ID') or _hotel_build_id()
 """
 
-    with open(settings_file_path, 'w') as f:
-        f.write(settings_content)
-    print("Settings file configured successfully (ALLOWED_HOSTS and Static Files updated).")
-except FileNotFoundError:
-    print(f"Error: settings.py not found at {settings_file_path}")
-    sys.exit(1)
-except Exception as e:
-    print(f"An error occurred while modifying settings.py: {e}")
-    sys.exit(1)
+# Where background jobs (hotel/jobs.py) write their files, e.g. exports. The job worker writes to
+# SQLite alongside the web server, so writers wait for the lock (WAL lets readers carry on meanwhile)
+# and take it when the transaction starts, instead of failing with "database is locked".
+job_settings = """
+HOTEL_JOB_OUTPUT_DIR = os.environ.get('HOTEL_JOB_OUTPUT_DIR', os.path.join(BASE_DIR, 'job_output'))
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': 'PRAGMA journal_mode=WAL;',
+    })
+"""
+
+@step("4", "Configure basic settings (ALLOWED_HOSTS and Static Files)")
+def configure_settings():
+    print(f"Configuring settings file: {settings_file_path}")
+    try:
+        with open(settings_file_path, 'r') as f:
+            settings_content = f.read()
+
+        # Ensure 'import os' is at the top if not already present
+        if "import os" not in settings_content:
+            settings_content = "import os\n" + settings_content
+
+        # Add '*' to ALLOWED_HOSTS
+        settings_content = settings_content.replace(
+            "ALLOWED_HOSTS = []",
+            "ALLOWED_HOSTS = ['*']"
+        )
+
+        # DEBUG stays on for runserver; the production server switches it off through the environment
+        settings_content = settings_content.replace(
+            "DEBUG = True",
+            "DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'"
+        )
+
+        # Add STATIC_URL, STATICFILES_DIRS, and STATIC_ROOT for serving static files
+        # Check if STATIC_URL is defined, then replace or append (only once, so re-runs don't duplicate it)
+        static_configured = "STATIC_ROOT" in settings_content
+        if not static_configured and "STATIC_URL = 'static/'" in settings_content:
+            settings_content = settings_content.replace(
+                "STATIC_URL = 'static/'",
+                "STATIC_URL = 'static/'\n" + static_files_settings
+            )
+        elif not static_configured:
+            # Fallback if STATIC_URL line is different or missing
+            settings_content += "\n# Custom static files configuration\nSTATIC_URL = 'static/'\n" + static_files_settings
+
+        if "STORAGES" not in settings_content:
+            settings_content += static_pipeline_settings
+        if "cached.Loader" not in settings_content:
+            settings_content = settings_content.replace("'APP_DIRS': True,", "'APP_DIRS': False, # Loaders are listed in OPTIONS")
+            settings_content = settings_content.replace("        'OPTIONS': {\n", "        'OPTIONS': {\n" + cached_template_loaders, 1)
+        if "WhiteNoiseMiddleware" not in settings_content:
+            settings_content += production_settings
+        if "InstrumentationMiddleware" not in settings_content:
+            settings_content += instrumentation_settings
+        if "HOTEL_ASYNC_VIEWS" not in settings_content:
+            settings_content += async_views_settings
+        if "HOTEL_DATABASE" not in settings_content:
+            settings_content += database_settings
+        if "HOTEL_INVOICE_DIR" not in settings_content:
+            settings_content += invoice_settings
+        if "HOTEL_JOB_OUTPUT_DIR" not in settings_content:
+            settings_content += job_settings
+        if "HOTEL_BUILD_ID" not in settings_content:
+            settings_content += build_settings
+        if "hotel.context_processors.build" not in settings_content:
+            settings_content = settings_content.replace(
+                "'django.contrib.messages.context_processors.messages',\n",
+                "'django.contrib.messages.context_processors.messages',\n"
+                "                'hotel.context_processors.build', # HOTEL_BUILD_ID for cached fragments\n"
+            )
+        settings_content = re.sub(
+            r"HOTEL_DATABASE = os\.environ\.get\('HOTEL_DATABASE', '\w+'\)",
+            f"HOTEL_DATABASE = os.environ.get('HOTEL_DATABASE', '{run_options['database']}')",
+            settings_content
+        )
+
+        write_file(settings_file_path, settings_content)
+        print("Settings file configured successfully (ALLOWED_HOSTS and Static Files updated).")
+    except FileNotFoundError:
+        print(f"Error: settings.py not found at {settings_file_path}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An error occurred while modifying settings.py: {e}")
+        sys.exit(1)
+
 
 # --- Step 5: Create Django app ---
-print(f"Creating Django app: {app_name}")
-try:
-    subprocess.run([sys.executable, "manage.py", "startapp", app_name], check=True)
-    print(f"Django app '{app_name}' created successfully.")
-except subprocess.CalledProcessError as e:
-    error_output = e.stderr.decode() if e.stderr else "No error output."
-    print(f"Error creating Django app: {error_output}")
-    sys.exit(1)
+
+@step("5", "Create Django app", done=lambda: os.path.exists(os.path.join(app_name, "__init__.py")))
+def create_django_app():
+    print(f"Creating Django app: {app_name}")
+    try:
+        manage("startapp", app_name)
+        print(f"Django app '{app_name}' created successfully.")
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.decode() if e.stderr else "No error output."
+        print(f"Error creating Django app: {error_output}")
+        sys.exit(1)
+
 
 # --- Step 6: Add the app to INSTALLED_APPS ---
-print(f"Adding '{app_name}' to INSTALLED_APPS in settings.py")
-try:
-    with open(settings_file_path, 'r') as f:
-        settings_content = f.read()
-
-    # Check if 'hotel' is already in INSTALLED_APPS to avoid duplicates
-    if f"'{app_name}'," not in settings_content and f"'{app_name}'" not in settings_content:
-        installed_apps_start = settings_content.find("INSTALLED_APPS = [")
-        if installed_apps_start != -1:
-            installed_apps_end = settings_content.find("]", installed_apps_start)
-            if installed_apps_end != -1:
-                settings_content = (
-                    settings_content[:installed_apps_end]
-                    + f"    '{app_name}',\n"
-                    + settings_content[installed_apps_end:]
-                )
-                with open(settings_file_path, 'w') as f:
-                    f.write(settings_content)
-                print(f"'{app_name}' app added to INSTALLED_APPS.")
+
+@step("6", "Add the app to INSTALLED_APPS")
+def add_app_to_installed_apps():
+    print(f"Adding '{app_name}' to INSTALLED_APPS in settings.py")
+    try:
+        with open(settings_file_path, 'r') as f:
+            settings_content = f.read()
+
+        # Check if 'hotel' is already in INSTALLED_APPS to avoid duplicates
+        if f"'{app_name}'," not in settings_content and f"'{app_name}'" not in settings_content:
+            installed_apps_start = settings_content.find("INSTALLED_APPS = [")
+            if installed_apps_start != -1:
+                installed_apps_end = settings_content.find("]", installed_apps_start)
+                if installed_apps_end != -1:
+                    settings_content = (
+                        settings_content[:installed_apps_end]
+                        + f"    '{app_name}',\n"
+                        + settings_content[installed_apps_end:]
+                    )
+                    write_file(settings_file_path, settings_content)
+                    print(f"'{app_name}' app added to INSTALLED_APPS.")
+                else:
+                    print("Error: Could not find closing bracket for INSTALLED_APPS.")
             else:
-                print("Error: Could not find closing bracket for INSTALLED_APPS.")
+                print("Error: Could not find INSTALLED_APPS list in settings.py.")
         else:
-            print("Error: Could not find INSTALLED_APPS list in settings.py.")
-    else:
-        print(f"'{app_name}' app is already in INSTALLED_APPS.")
+            print(f"'{app_name}' app is already in INSTALLED_APPS.")
+
+    except FileNotFoundError:
+        print(f"Error: settings.py not found at {settings_file_path}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An error occurred while modifying settings.py: {e}")
+        sys.exit(1)
 
-except FileNotFoundError:
-    print(f"Error: settings.py not found at {settings_file_path}")
-    sys.exit(1)
-except Exception as e:
-    print(f"An error occurred while modifying settings.py: {e}")
-    sys.exit(1)
 
 # --- Step 7: Define models in hotel/models.py ---
 models_file_path = os.path.join(app_name, "models.py")
-print(f"Creating/Updating models.py at: {models_file_path}")
 models_content = """
-from django.db import models
+from django.core.validators import RegexValidator
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+class RoomStatus(models.TextChoices):
+    # Allowed moves between these live in hotel/room_status.py
+    AVAILABLE = 'available', 'Available'
+    OCCUPIED = 'occupied', 'Occupied'
+    DIRTY = 'dirty', 'Dirty'
+    CLEANING = 'cleaning', 'Cleaning'
+    MAINTENANCE = 'maintenance', 'Maintenance'
 
 class Room(models.Model):
     room_number = models.CharField(max_length=10, unique=True)
     room_type = models.CharField(max_length=50)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    status = models.CharField(max_length=20, default='available') # e.g., available, booked, maintenance
+    # Current status, kept in step with RoomStatusEvent by hotel/room_status.py
+    status = models.CharField(max_length=20, choices=RoomStatus.choices, default=RoomStatus.AVAILABLE)
+
+    class Meta:
+        indexes = [
+            # Availability lookups filter on status and room_type together
+            models.Index(fields=['status', 'room_type'], name='room_status_type_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        room = super().from_db(db, field_names, values)
+        # Lets the post_save handler in hotel/room_status.py log status changes made through forms
+        room._loaded_status = room.__dict__.get('status')
+        return room
 
     def __str__(self):
         return f"Room {self.room_number} ({self.room_type})"
 
+class RoomStatusEvent(models.Model):
+    \"\"\"One status change of a room. Rows are only ever added, and outlive the room.\"\"\"
+    # Set to NULL when the room is deleted; room_number still says which room it was
+    room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, related_name='status_events')
+    room_number = models.CharField(max_length=10, blank=True)
+    from_status = models.CharField(max_length=20, blank=True) # Empty for a new room
+    to_status = models.CharField(max_length=20, choices=RoomStatus.choices)
+    changed_at = models.DateTimeField(default=timezone.now)
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        indexes = [
+            # A room's history, newest first
+            models.Index(fields=['room', '-changed_at'], name='room_status_event_room_idx'),
+            models.Index(fields=['changed_at'], name='room_status_event_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Room status events are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Room status events are append-only.")
+
+    def __str__(self):
+        return f"Room {self.room_number or self.room_id}: {self.from_status or 'new'} -> {self.to_status}"
+
+class RatePlan(models.Model):
+    \"\"\"Nightly price of a room type on matching dates. Where plans overlap the highest priority wins.\"\"\"
+    name = models.CharField(max_length=100)
+    room_type = models.CharField(max_length=50)
+    nightly_price = models.DecimalField(max_digits=10, decimal_places=2)
+    start_date = models.DateField(null=True, blank=True) # Open-ended when empty
+    end_date = models.DateField(null=True, blank=True) # Inclusive; open-ended when empty
+    weekdays = models.CharField(max_length=7, blank=True, default='', validators=[
+        RegexValidator(r'^[0-6]*$', "Use the digits 0 (Monday) to 6 (Sunday), e.g. 45 for Friday and Saturday."),
+    ]) # Empty means every day
+    priority = models.IntegerField(default=0)
+
+    def applies_to(self, day):
+        return ((self.start_date is None or self.start_date <= day)
+                and (self.end_date is None or day <= self.end_date)
+                and (not self.weekdays or str(day.weekday()) in self.weekdays))
+
+    def __str__(self):
+        return f"{self.name} ({self.room_type}, {self.nightly_price})"
+
 class Guest(models.Model):
     name = models.CharField(max_length=100)
     contact_info = models.TextField() # e.g., address, phone, email
@@ -163,6 +555,18 @@ class Guest(models.Model):
     def __str__(self):
         return self.name
 
+class BookingQuerySet(models.QuerySet):
+
+    def overlapping(self, check_in, check_out):
+        \"\"\"Bookings sharing at least one day with check_in..check_out; both end days count.\"\"\"
+        if connections[self.db].vendor == 'postgresql':
+            # hotel_booking.stay is a generated daterange with a GiST index (the booking_stay_range migration)
+            return self.filter(RawSQL(
+                f"{self.model._meta.db_table}.stay && daterange(%s, %s, '[]')", (check_in, check_out),
+                output_field=models.BooleanField()
+            ))
+        return self.filter(check_in_date__lte=check_out, check_out_date__gte=check_in)
+
 class Booking(models.Model):
     guest = models.ForeignKey(Guest, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
@@ -170,6 +574,22 @@ class Booking(models.Model):
     check_out_date = models.DateField()
     status = models.CharField(max_length=20, default='pending') # e.g., confirmed, pending, cancelled
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Overlap checks: room = X AND check_in_date <= ? AND check_out_date >= ?
+            models.Index(fields=['room', 'check_in_date', 'check_out_date'], name='booking_room_dates_idx'),
+            # Date-range scans that are not tied to one room (availability, reports)
+            models.Index(fields=['check_in_date'], name='booking_check_in_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(check_out_date__gt=models.F('check_in_date')),
+                name='booking_check_out_after_check_in',
+            ),
+        ]
+
     def __str__(self):
         return f"Booking for {self.guest} in Room {self.room.room_number}"
 
@@ -203,28 +623,160 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Payment of {self.amount} for Booking ID {self.booking.id}"
+        return f"Payment of {self.amount} for Booking ID {self.booking_id}"
+
+class ServiceCharge(models.Model):
+    # The unit price is copied from the Service, so a later price change leaves old bills alone
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='service_charges')
+    service = models.ForeignKey(Service, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    charged_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def amount(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.service} for Booking ID {self.booking_id}"
+
+class InvoiceSummary(models.Model):
+    # One booking's bill totals, maintained by hotel/invoicing.py so lists never aggregate per row
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='invoice')
+    nights = models.PositiveIntegerField(default=0)
+    room_charges = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    service_charges = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0) # room + services - payments
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The Invoices page pages through open balances by id
+            models.Index(fields=['id'], condition=models.Q(balance__gt=0), name='invoice_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"INV-{self.booking_id} ({self.balance})"
+
+class DailyRollup(models.Model):
+    # Pre-aggregated occupancy and revenue per day and room type, maintained by hotel/reports.py
+    date = models.DateField()
+    room_type = models.CharField(max_length=50)
+    available_rooms = models.PositiveIntegerField(default=0) # Rooms of this type not in maintenance
+    occupied_rooms = models.PositiveIntegerField(default=0) # Booked room-nights starting on this date
+    room_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments_collected = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'room_type'], name='rollup_unique_date_room_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.room_type}"
+
+class Generation(models.Model):
+    # Write counters that tell worker processes their in-memory indexes are out of date (hotel/availability.py)
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} {self.value}"
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+class Job(models.Model):
+    \"\"\"One run of a background task from hotel/jobs.py, picked up by `manage.py worker`.\"\"\"
+    task = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True) # Keyword arguments for the task
+    status = models.CharField(max_length=10, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now) # Pushed back between retries
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True) # None while the size is unknown
+    message = models.CharField(max_length=200, blank=True) # Latest progress note
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True) # Traceback of the last failed attempt
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers take the oldest due job in one index range scan
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (JobStatus.DONE, JobStatus.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == JobStatus.DONE:
+            return 100
+        if not self.progress_total:
+            return None
+        return min(100, self.progress_done * 100 // self.progress_total)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.task}, {self.status})"
 """
-try:
-    with open(models_file_path, 'w') as f:
-        f.write(models_content)
-    print("models.py created/updated successfully with defined models.")
-except Exception as e:
-    print(f"An error occurred while writing to models.py: {e}")
-    sys.exit(1)
+
+@step("7", "Define models in hotel/models.py", parallel=True)
+def write_models():
+    print(f"Creating/Updating models.py at: {models_file_path}")
+    try:
+        write_file(models_file_path, models_content)
+        print("models.py created/updated successfully with defined models.")
+    except Exception as e:
+        print(f"An error occurred while writing to models.py: {e}")
+        sys.exit(1)
+
 
 # --- Step 8: Create forms in hotel/forms.py ---
 forms_file_path = os.path.join(app_name, "forms.py")
-print(f"Creating forms.py at: {forms_file_path}")
 forms_content = """
 from django import forms
-from .models import Room, Booking, Guest
+from .models import Room, RoomStatus, Booking, Guest, RatePlan, Payment, ServiceCharge
+from . import exports, room_status
 
 class RoomForm(forms.ModelForm):
     class Meta:
         model = Room
         fields = ['room_number', 'room_type', 'price', 'status']
 
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        current = self.instance.status # Not yet overwritten with the submitted value
+        if self.instance.pk and status != current and not room_status.can_transition(current, status):
+            raise forms.ValidationError(
+                f"A room can't go from {room_status.label(current).lower()} to {room_status.label(status).lower()}."
+            )
+        return status
+
+class RoomTransitionForm(forms.Form):
+    \"\"\"Housekeeping: move the ticked rooms, or every room on a floor that can make the move.\"\"\"
+    to_status = forms.ChoiceField(choices=RoomStatus.choices)
+    floor = forms.CharField(max_length=8, required=False)
+    note = forms.CharField(max_length=200, required=False)
+
+class ExportJobForm(forms.Form):
+    \"\"\"An accounting export written to a file by a background job instead of streamed to the browser.\"\"\"
+    kind = forms.ChoiceField(choices=[(kind, kind.title()) for kind in sorted(exports.EXPORTS)])
+    file_format = forms.ChoiceField(choices=[('csv', 'CSV'), ('json', 'JSON')])
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    compress = forms.BooleanField(required=False, label="Gzip")
+
 class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
@@ -234,42 +786,197 @@ class BookingForm(forms.ModelForm):
             'check_out_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in_date = cleaned_data.get('check_in_date')
+        check_out_date = cleaned_data.get('check_out_date')
+        # Mirrors the booking_check_out_after_check_in database constraint
+        if check_in_date and check_out_date and check_in_date >= check_out_date:
+            self.add_error('check_out_date', "Check-out date must be after check-in date.")
+        return cleaned_data
+
+class ServiceChargeForm(forms.ModelForm):
+    class Meta:
+        model = ServiceCharge
+        fields = ['service', 'quantity']
+
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['amount', 'payment_method']
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount == 0:
+            raise forms.ValidationError("Enter a non-zero amount (negative for a refund).")
+        return amount
+
 class GuestForm(forms.ModelForm):
     class Meta:
         model = Guest
         fields = ['name', 'contact_info']
+
+class RatePlanForm(forms.ModelForm):
+    class Meta:
+        model = RatePlan
+        fields = ['name', 'room_type', 'nightly_price', 'start_date', 'end_date', 'weekdays', 'priority']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', "End date must not be before start date.")
+        return cleaned_data
 """
-try:
-    with open(forms_file_path, 'w') as f:
-        f.write(forms_content)
-    print("forms.py created successfully.")
-except Exception as e:
-    print(f"An error occurred while writing to forms.py: {e}")
-    sys.exit(1)
+
+@step("8", "Create forms in hotel/forms.py", parallel=True)
+def write_forms():
+    print(f"Creating forms.py at: {forms_file_path}")
+    try:
+        write_file(forms_file_path, forms_content)
+        print("forms.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to forms.py: {e}")
+        sys.exit(1)
+
 
 # --- Step 9: Create views in hotel/views.py ---
 views_file_path = os.path.join(app_name, "views.py")
-print(f"Creating/Updating views.py at: {views_file_path}")
 views_content = """
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q # Import Q for complex lookups
-from .models import Room, Booking, Guest
-from .forms import RoomForm, BookingForm, GuestForm
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Sum
+from .models import Room, RoomStatus, Booking, Guest, InvoiceSummary, Job, JobStatus
+from .forms import RoomForm, RoomTransitionForm, BookingForm, GuestForm, ServiceChargeForm, PaymentForm, ExportJobForm
+from . import availability # In-memory interval index of booked rooms
+from . import dashboard # Cached dashboard aggregates
+from . import search # Guest full-text search index
+from . import exports # Streaming CSV/JSON exports
+from . import reports # Daily occupancy/revenue rollups
+from . import instrumentation # Opt-in per-view timing behind /metrics
+from . import pricing # Rate plans and the precomputed nightly price grid
+from . import room_status # Room-status state machine, event log and cached projection
+from . import invoicing # Per-booking invoice totals and printable invoices
+from . import jobs # Database-backed background job queue, run by `manage.py worker`
+from .services import save_booking, BookingConflict # Atomic overlap check + insert
+from django.conf import settings
 from django.contrib import messages # Import messages for feedback
 from datetime import date # Import date for date comparisons
+import json
+import os
+
+MAX_PAGE_SIZE = 500
+JOB_LIST_SIZE = 100
+
+def keyset_query(request, queryset):
+    \"\"\"The slice of `queryset` that keyset_page() reads, plus (page_size, after, before) for keyset_result().\"\"\"
+    try:
+        page_size = int(request.GET.get('page_size') or getattr(settings, 'HOTEL_PAGE_SIZE', 50))
+    except ValueError:
+        page_size = getattr(settings, 'HOTEL_PAGE_SIZE', 50)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    def cursor(name):
+        value = request.GET.get(name)
+        return int(value) if value and value.isdigit() else None
+
+    after, before = cursor('after'), cursor('before')
+    if before is not None:
+        # Walk backwards from the cursor; keyset_result() flips the rows back into ascending order
+        return queryset.filter(id__lt=before).order_by('-id')[:page_size + 1], (page_size, after, before)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return queryset.order_by('id')[:page_size + 1], (page_size, after, before)
+
+def keyset_page(request, queryset):
+    \"\"\"
+    Return one page of `queryset` ordered by id, using ?after=<id> / ?before=<id> cursors
+    instead of OFFSET so that every page costs the same regardless of table size.
+    \"\"\"
+    query, window = keyset_query(request, queryset)
+    return keyset_result(request, list(query), window)
+
+def keyset_result(request, rows, window):
+    page_size, after, before = window
+    if before is not None:
+        has_previous, has_next = len(rows) > page_size, True
+        rows = rows[:page_size][::-1]
+    else:
+        has_previous, has_next = after is not None, len(rows) > page_size
+        rows = rows[:page_size]
+
+    # Keep the other query parameters (search, page size) on the pager links
+    params = request.GET.copy()
+    for key in ('after', 'before'):
+        params.pop(key, None)
+    return {
+        'object_list': rows,
+        'next_cursor': rows[-1].id if has_next and rows else None,
+        'previous_cursor': rows[0].id if has_previous and rows else None,
+        'querystring': params.urlencode(),
+    }
 
 def home(request):
     \"\"\"A simple home view for the application.\"\"\"
-    available_rooms_count = Room.objects.filter(status='available').count()
-    recent_guests = Guest.objects.order_by('-id')[:5] # Get 5 most recent guests
-    recent_bookings = Booking.objects.order_by('-id')[:5] # Get 5 most recent bookings
+    # Occupancy count and recent guests/bookings come from the dashboard cache
+    context = dashboard.get_stats()
+    return render(request, 'hotel/home.html', context)
 
+def occupancy_calendar(request, year, month):
+    \"\"\"Per-day free/booked/maintenance room counts for one month, used by the dashboard calendar.\"\"\"
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        return JsonResponse({'error': 'Invalid month.'}, status=400)
+    return JsonResponse({'year': year, 'month': month, 'days': dashboard.month_occupancy(year, month)})
+
+def export_data(request, kind):
+    \"\"\"Stream bookings or payments as CSV/JSON, optionally gzipped, without loading them into memory.\"\"\"
+    file_format = request.GET.get('format', 'csv')
+    if kind not in exports.EXPORTS or file_format not in ('csv', 'json'):
+        return JsonResponse({'error': 'Unknown export.'}, status=404)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format. Please use YYYY-MM-DD.'}, status=400)
+    compress = request.GET.get('gzip') == '1'
+
+    filename = f"{kind}.{file_format}" + ('.gz' if compress else '')
+    content_type = 'application/gzip' if compress else ('text/csv' if file_format == 'csv' else 'application/json')
+    response = StreamingHttpResponse(exports.export_chunks(kind, file_format, start, end, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def report_view(request):
+    \"\"\"Revenue and occupancy report, read from the pre-aggregated daily rollups.\"\"\"
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else today.replace(month=1, day=1)
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+    except ValueError:
+        messages.error(request, "Invalid date format. Please use YYYY-MM-DD.")
+        start, end = today.replace(month=1, day=1), today
+    group_by = 'day' if request.GET.get('group_by') == 'day' else 'month'
     context = {
-        'available_rooms_count': available_rooms_count,
-        'recent_guests': recent_guests,
-        'recent_bookings': recent_bookings,
+        'lines': reports.report(start, end, group_by),
+        'missing': reports.missing_ranges(start, end),
+        'start': start,
+        'end': end,
+        'group_by': group_by,
     }
-    return render(request, 'hotel/home.html', context)
+    return render(request, 'hotel/reports.html', context)
+
+def dashboard_cache_stats(request):
+    \"\"\"Hit/miss counters of the dashboard stats cache.\"\"\"
+    return JsonResponse(dashboard.cache_counters())
+
+def metrics(request):
+    \"\"\"Per-view latency histograms and query counters in Prometheus text format.\"\"\"
+    if not getattr(settings, 'HOTEL_INSTRUMENTATION', False):
+        raise Http404("Instrumentation is off (set HOTEL_INSTRUMENTATION=1).")
+    return HttpResponse(instrumentation.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 def book_room_from_dashboard(request):
     # This view is kept for its core booking logic, though the dashboard form is removed.
@@ -302,24 +1009,32 @@ def book_room_from_dashboard(request):
                     guest.contact_info = guest_contact_info
                     guest.save()
 
-            booked_room_ids = Booking.objects.filter(
-                Q(check_in_date__lte=check_out_date_obj) & Q(check_out_date__gte=check_in_date_obj)
-            ).values_list('room__id', flat=True)
+            booked_room_ids = availability.booked_room_ids(check_in_date_obj, check_out_date_obj)
 
-            available_room = Room.objects.filter(
+            candidate_rooms = Room.objects.filter(
                 room_type=room_type,
-                status='available'
-            ).exclude(id__in=booked_room_ids).first()
-
+                status__in=room_status.SELLABLE
+            ).order_by('id')
+
+            # The index can lag behind another worker, so fall through to the next room on a clash
+            available_room = None
+            for room in candidate_rooms:
+                if room.id in booked_room_ids:
+                    continue
+                try:
+                    booking = save_booking(Booking(
+                        guest=guest,
+                        room=room,
+                        check_in_date=check_in_date_obj,
+                        check_out_date=check_out_date_obj,
+                        status='confirmed'
+                    ))
+                except BookingConflict:
+                    continue
+                available_room = room
+                break
 
             if available_room:
-                booking = Booking.objects.create(
-                    guest=guest,
-                    room=available_room,
-                    check_in_date=check_in_date_obj,
-                    check_out_date=check_out_date_obj,
-                    status='confirmed'
-                )
                 messages.success(request, f"Room {available_room.room_number} booked successfully for {guest.name}! Booking ID: {booking.id}")
             else:
                 messages.warning(request, f"No available rooms of type '{room_type}' for the selected dates.")
@@ -333,12 +1048,13 @@ def book_room_from_dashboard(request):
 
 
 def room_list(request):
-    rooms = Room.objects.all()
-    return render(request, 'hotel/room_list.html', {'rooms': rooms})
+    page = keyset_page(request, Room.objects.all())
+    return render(request, 'hotel/room_list.html', {'rooms': page['object_list'], 'page': page})
 
 def room_detail(request, pk):
     room = get_object_or_404(Room, pk=pk)
-    return render(request, 'hotel/room_detail.html', {'room': room})
+    status_events = room.status_events.order_by('-changed_at', '-id')[:20]
+    return render(request, 'hotel/room_detail.html', {'room': room, 'status_events': status_events})
 
 def room_create(request):
     if request.method == 'POST':
@@ -376,6 +1092,37 @@ def room_delete(request, pk):
         return redirect('room_list')
     return render(request, 'hotel/room_confirm_delete.html', {'room': room})
 
+def housekeeping(request):
+    \"\"\"Room statuses floor by floor, with batch transitions such as marking a whole floor clean.\"\"\"
+    if request.method == 'POST':
+        form = RoomTransitionForm(request.POST)
+        room_ids = [int(value) for value in request.POST.getlist('rooms') if value.isdigit()]
+        if form.is_valid() and (room_ids or form.cleaned_data['floor']):
+            to_status, floor, note = form.cleaned_data['to_status'], form.cleaned_data['floor'], form.cleaned_data['note']
+            try:
+                if floor:
+                    changed = room_status.transition_floor(floor, to_status, note)
+                else:
+                    changed = room_status.transition_many(Room.objects.filter(id__in=room_ids), to_status, note)
+            except room_status.InvalidTransition as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f"{len(changed)} room(s) marked {room_status.label(to_status).lower()}.")
+        else:
+            messages.error(request, "Pick a status, then tick some rooms or choose a floor.")
+        return redirect('housekeeping')
+
+    floors = {}
+    for room in room_status.rooms(None):
+        floors.setdefault(room.floor, []).append(room)
+    counts = room_status.counts()
+    context = {
+        'floors': sorted(floors.items(), key=lambda item: (len(item[0]), item[0])),
+        'status_counts': [(label, counts[value]) for value, label in RoomStatus.choices],
+        'statuses': RoomStatus.choices,
+    }
+    return render(request, 'hotel/housekeeping.html', context)
+
 def room_availability(request):
     \"\"\"A view for room availability with date filtering.\"\"\"
     rooms = Room.objects.all().order_by('room_number')
@@ -383,6 +1130,7 @@ def room_availability(request):
     check_out = request.GET.get('check_out_date')
     available_rooms = []
     message = ""
+    nights = None
 
     if check_in and check_out:
         try:
@@ -400,18 +1148,19 @@ def room_availability(request):
                 }
                 return render(request, 'hotel/room_availability.html', context)
 
-            booked_room_ids = Booking.objects.filter(
-                Q(check_in_date__lte=check_out_date_obj) & Q(check_out_date__gte=check_in_date_obj)
-            ).values_list('room__id', flat=True)
+            booked_room_ids = availability.booked_room_ids(check_in_date_obj, check_out_date_obj)
 
-            available_rooms = Room.objects.filter(
-                status='available'
-            ).exclude(id__in=booked_room_ids).order_by('room_number')
+            # Rooms come from the status projection and the index already knows which are taken
+            available_rooms = [room for room in room_status.rooms() if room.id not in booked_room_ids]
+            quotes = pricing.quote_rooms(available_rooms, check_in_date_obj, check_out_date_obj)
+            for room in available_rooms:
+                room.stay_total = quotes[room.id]
+            nights = (check_out_date_obj - check_in_date_obj).days
 
-            if not available_rooms.exists():
+            if not available_rooms:
                 message = "No rooms available for the selected dates."
             else:
-                message = f"{available_rooms.count()} rooms available for the selected dates."
+                message = f"{len(available_rooms)} rooms available for the selected dates."
 
         except ValueError:
             messages.error(request, "Invalid date format. Please use YYYY-MM-DD.")
@@ -422,8 +1171,8 @@ def room_availability(request):
             message = f"An error occurred: {e}"
             available_rooms = []
     else:
-        available_rooms = Room.objects.filter(status='available').order_by('room_number')
-        message = f"Currently showing all available rooms ({available_rooms.count()}). Select dates to filter."
+        available_rooms = room_status.rooms()
+        message = f"Currently showing all available rooms ({len(available_rooms)}). Select dates to filter."
 
 
     context = {
@@ -432,37 +1181,114 @@ def room_availability(request):
         'check_in_date': check_in,
         'check_out_date': check_out,
         'message': message,
+        'nights': nights, # Set when the rooms carry a stay_total quote
     }
     return render(request, 'hotel/room_availability.html', context)
 
+@csrf_exempt # Called by channel managers and the booking website, not by our own forms
+@require_POST
+def room_availability_batch(request):
+    \"\"\"
+    Answer many availability queries in one request.
+
+    Body: {"queries": [{"check_in": "YYYY-MM-DD", "check_out": "YYYY-MM-DD", "room_type": "single"}, ...]}
+    (room_type is optional). Rooms are loaded once; booked rooms come from the availability index.
+    \"\"\"
+    try:
+        queries = json.loads(request.body)['queries']
+        if not isinstance(queries, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON object with a "queries" list.'}, status=400)
+    batch_limit = getattr(settings, 'HOTEL_AVAILABILITY_BATCH_LIMIT', 500)
+    if len(queries) > batch_limit:
+        return JsonResponse({'error': f"At most {batch_limit} queries per request."}, status=400)
+
+    rooms_by_type = {}
+    for room in sorted(room_status.rooms(), key=lambda room: room.id):
+        rooms_by_type.setdefault(room.room_type, []).append(room.id)
+
+    results = []
+    for query in queries:
+        try:
+            check_in_date_obj = date.fromisoformat(query['check_in'])
+            check_out_date_obj = date.fromisoformat(query['check_out'])
+            room_type = query.get('room_type')
+        except (KeyError, TypeError, ValueError, AttributeError):
+            results.append({'error': "Each query needs check_in and check_out dates in YYYY-MM-DD format."})
+            continue
+        if check_in_date_obj >= check_out_date_obj:
+            results.append({'error': "Check-out date must be after check-in date."})
+            continue
+
+        booked_room_ids = availability.booked_room_ids(check_in_date_obj, check_out_date_obj)
+        types = [room_type] if room_type else sorted(rooms_by_type)
+        free_by_type = {
+            current_type: [room_id for room_id in rooms_by_type.get(current_type, []) if room_id not in booked_room_ids]
+            for current_type in types
+        }
+        results.append({
+            'check_in': query['check_in'],
+            'check_out': query['check_out'],
+            'room_type': room_type,
+            'free_count': sum(len(room_ids) for room_ids in free_by_type.values()),
+            'free_count_by_type': {current_type: len(room_ids) for current_type, room_ids in free_by_type.items()},
+            'room_ids': free_by_type,
+        })
+    return JsonResponse({'results': results})
+
 def booking_list(request):
-    bookings = Booking.objects.all()
-    return render(request, 'hotel/booking_list.html', {'bookings': bookings})
+    # Join guest and room up front; the table only shows these columns
+    bookings = Booking.objects.select_related('guest', 'room').only(
+        'id', 'check_in_date', 'check_out_date', 'status', 'guest__name', 'room__room_number'
+    )
+    page = keyset_page(request, bookings)
+    return render(request, 'hotel/booking_list.html', {'bookings': page['object_list'], 'page': page})
 
 def booking_detail(request, pk):
+    booking = get_object_or_404(Booking.objects.select_related('guest', 'room', 'invoice'), pk=pk)
+    context = {'booking': booking, 'service_form': ServiceChargeForm(), 'payment_form': PaymentForm()}
+    return render(request, 'hotel/booking_detail.html', context)
+
+@require_POST
+def booking_add_service(request, pk):
+    booking = get_object_or_404(Booking, pk=pk)
+    form = ServiceChargeForm(request.POST)
+    if form.is_valid():
+        charge = form.save(commit=False)
+        charge.booking = booking
+        charge.unit_price = charge.service.price or 0
+        charge.save() # Updates the booking's invoice totals in the same transaction
+        messages.success(request, f"Added {charge.quantity} x {charge.service.name} to booking {booking.id}.")
+    else:
+        messages.error(request, "Error adding the service. Please check the form.")
+    return redirect('booking_detail', pk=pk)
+
+@require_POST
+def booking_add_payment(request, pk):
     booking = get_object_or_404(Booking, pk=pk)
-    return render(request, 'hotel/booking_detail.html', {'booking': booking})
+    form = PaymentForm(request.POST)
+    if form.is_valid():
+        payment = form.save(commit=False)
+        payment.booking = booking
+        payment.save()
+        messages.success(request, f"Recorded a payment of {payment.amount} for booking {booking.id}.")
+    else:
+        messages.error(request, "Error recording the payment. Please check the form.")
+    return redirect('booking_detail', pk=pk)
 
 def booking_create(request):
     if request.method == 'POST':
         form = BookingForm(request.POST)
         if form.is_valid():
-            check_in_date_obj = form.cleaned_data['check_in_date']
-            check_out_date_obj = form.cleaned_data['check_out_date']
             room = form.cleaned_data['room']
-
-            # Check for overlapping bookings for the selected room
-            overlapping_bookings = Booking.objects.filter(
-                room=room,
-                check_in_date__lte=check_out_date_obj,
-                check_out_date__gte=check_in_date_obj
-            ).exclude(pk=form.instance.pk if form.instance.pk else None) # Exclude self if updating
-
-            if overlapping_bookings.exists():
+            try:
+                # Overlap check and insert happen in one transaction with the room locked
+                save_booking(form.save(commit=False))
+            except BookingConflict:
                 messages.error(request, f"Room {room.room_number} is already booked for some part of the selected dates.")
                 return render(request, 'hotel/booking_form.html', {'form': form})
 
-            form.save()
             messages.success(request, f"Booking for Room {room.room_number} created successfully!")
             return redirect('booking_list')
         else:
@@ -476,22 +1302,14 @@ def booking_update(request, pk):
     if request.method == 'POST':
         form = BookingForm(request.POST, instance=booking)
         if form.is_valid():
-            check_in_date_obj = form.cleaned_data['check_in_date']
-            check_out_date_obj = form.cleaned_data['check_out_date']
             room = form.cleaned_data['room']
-
-            # Check for overlapping bookings for the selected room, excluding the current booking being updated
-            overlapping_bookings = Booking.objects.filter(
-                room=room,
-                check_in_date__lte=check_out_date_obj,
-                check_out_date__gte=check_in_date_obj
-            ).exclude(pk=booking.pk)
-
-            if overlapping_bookings.exists():
+            try:
+                # The current booking is excluded from its own overlap check
+                save_booking(form.save(commit=False))
+            except BookingConflict:
                 messages.error(request, f"Room {room.room_number} is already booked for some part of the selected dates.")
                 return render(request, 'hotel/booking_form.html', {'form': form})
 
-            form.save()
             messages.success(request, f"Booking ID {booking.id} updated successfully!")
             return redirect('booking_detail', pk=pk)
         else:
@@ -509,17 +1327,149 @@ def booking_delete(request, pk):
         return redirect('booking_list')
     return render(request, 'hotel/booking_confirm_delete.html', {'booking': booking})
 
+def invoice_list(request):
+    \"\"\"Open balances (or every invoice with ?show=all), read from the denormalised InvoiceSummary rows.\"\"\"
+    show_all = request.GET.get('show') == 'all'
+    invoices = InvoiceSummary.objects.all() if show_all else invoicing.open_invoices()
+    page = keyset_page(request, invoices.select_related('booking__guest', 'booking__room').only(
+        'id', 'booking_id', 'nights', 'room_charges', 'service_charges', 'payments', 'balance',
+        'booking__status', 'booking__guest__name', 'booking__room__room_number',
+    ))
+    context = {
+        'invoices': page['object_list'],
+        'page': page,
+        'show_all': show_all,
+        'outstanding': invoicing.open_invoices().aggregate(total=Sum('balance'), count=Count('id')),
+        'render_jobs': Job.objects.filter(task='render_invoices').order_by('-id')[:5],
+        'pdf_available': invoicing.pdf_renderer() is not None,
+    }
+    return render(request, 'hotel/invoice_list.html', context)
+
+def invoice_detail(request, pk):
+    \"\"\"Printable invoice for booking `pk`; ?format=pdf renders it with WeasyPrint when installed.\"\"\"
+    booking = get_object_or_404(Booking, pk=pk)
+    if not InvoiceSummary.objects.filter(booking=booking).exists():
+        invoicing.refresh(booking) # Bookings loaded before invoicing existed
+    invoice = invoicing.load_invoices([pk])[0]
+    html = invoicing.render_invoice(invoice)
+    if request.GET.get('format') == 'pdf':
+        renderer = invoicing.pdf_renderer()
+        if renderer is None:
+            raise Http404("PDF invoices need WeasyPrint (pip install weasyprint).")
+        response = HttpResponse(renderer(string=html).write_pdf(), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="INV-{pk}.pdf"'
+        return response
+    return HttpResponse(html)
+
+@require_POST
+def invoice_render(request):
+    \"\"\"Queue a job that writes printable copies of the open (or all) invoices.\"\"\"
+    file_format = 'pdf' if request.POST.get('format') == 'pdf' else 'html'
+    scope = 'all' if request.POST.get('scope') == 'all' else 'open'
+    invoices = InvoiceSummary.objects.all() if scope == 'all' else invoicing.open_invoices()
+    if file_format == 'pdf' and invoicing.pdf_renderer() is None:
+        messages.error(request, "PDF invoices need WeasyPrint (pip install weasyprint). Choose HTML instead.")
+    elif not invoices.exists():
+        messages.warning(request, "There are no invoices to render.")
+    else:
+        job = jobs.enqueue('render_invoices', scope=scope, file_format=file_format)
+        messages.success(request, f"Rendering the invoices in the background (job {job.id}).")
+    return redirect('invoice_list')
+
+def job_list(request):
+    \"\"\"The most recent background jobs (optionally one ?status=), with forms to queue maintenance work and exports.\"\"\"
+    status = request.GET.get('status')
+    recent = Job.objects.defer('params', 'result', 'error').order_by('-id')
+    if status in JobStatus.values:
+        recent = recent.filter(status=status)
+    counts = dict(Job.objects.values_list('status').annotate(total=Count('id')).order_by())
+    context = {
+        'jobs': [(job, jobs.title(job)) for job in recent[:JOB_LIST_SIZE]],
+        'status': status,
+        'status_counts': [(value, label, counts.get(value, 0)) for value, label in JobStatus.choices],
+        'maintenance_tasks': [(name, jobs.TASKS[name].title) for name in jobs.MAINTENANCE_TASKS],
+        'export_form': ExportJobForm(),
+    }
+    return render(request, 'hotel/job_list.html', context)
+
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, 'hotel/job_detail.html', {'job': job, 'title': jobs.title(job)})
+
+def job_progress(request, pk):
+    \"\"\"Status and progress of one job as JSON, polled by the job page while the job is unfinished.\"\"\"
+    job = get_object_or_404(Job.objects.defer('params', 'result', 'error'), pk=pk)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.finished,
+        'done': job.progress_done,
+        'total': job.progress_total,
+        'percent': job.percent,
+        'message': job.message,
+        'attempts': job.attempts,
+    })
+
+@require_POST
+def job_create(request):
+    \"\"\"Queue a maintenance task or an export from the Jobs page.\"\"\"
+    task = request.POST.get('task')
+    if task == 'export':
+        form = ExportJobForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Error queuing the export. Please check the form.")
+            return redirect('job_list')
+        data = form.cleaned_data
+        params = {
+            'kind': data['kind'],
+            'file_format': data['file_format'],
+            'start': data['start'].isoformat() if data['start'] else None,
+            'end': data['end'].isoformat() if data['end'] else None,
+            'compress': data['compress'],
+        }
+    elif task == 'rebuild_reports' and request.POST.get('gaps_only'):
+        try:
+            start, end = date.fromisoformat(request.POST.get('start', '')), date.fromisoformat(request.POST.get('end', ''))
+        except ValueError:
+            messages.error(request, "Invalid date format. Please use YYYY-MM-DD.")
+            return redirect('reports')
+        params = {'start': start.isoformat(), 'end': end.isoformat(), 'gaps_only': True}
+    elif task in jobs.MAINTENANCE_TASKS:
+        params = {}
+    else:
+        messages.error(request, "Unknown task.")
+        return redirect('job_list')
+    job = jobs.enqueue(task, **params)
+    messages.success(request, f"Queued job {job.id}: {jobs.title(job)}.")
+    return redirect('job_detail', pk=job.pk)
+
+@require_POST
+def job_retry(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    if jobs.retry(job):
+        messages.success(request, f"Job {job.id} queued again.")
+    else:
+        messages.warning(request, f"Job {job.id} has not failed, so there is nothing to retry.")
+    return redirect('job_detail', pk=pk)
+
+def job_download(request, pk):
+    \"\"\"The file a finished export job wrote.\"\"\"
+    job = get_object_or_404(Job, pk=pk, task='export', status=JobStatus.DONE)
+    path = (job.result or {}).get('path')
+    if not path or not os.path.exists(path):
+        raise Http404("The export file is no longer there.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result['filename'])
 
 def guest_list(request):
-    guests = Guest.objects.all()
     search_query = request.GET.get('q') # Get the search query from the URL parameter 'q'
 
     if search_query:
-        # Filter guests by name or contact_info (email)
-        guests = guests.filter(
-            Q(name__icontains=search_query) | Q(contact_info__icontains=search_query)
-        )
-    return render(request, 'hotel/guest_list.html', {'guests': guests, 'search_query': search_query})
+        # Ranked, prefix-matching lookup in the guest search index (name or contact info)
+        guests = search.search_guests(search_query, limit=getattr(settings, 'HOTEL_GUEST_SEARCH_LIMIT', 100))
+        page = {'object_list': guests, 'next_cursor': None, 'previous_cursor': None, 'querystring': ''}
+    else:
+        page = keyset_page(request, Guest.objects.all())
+    return render(request, 'hotel/guest_list.html', {'guests': page['object_list'], 'page': page, 'search_query': search_query})
 
 def guest_detail(request, pk):
     guest = get_object_or_404(Guest, pk=pk)
@@ -561,55 +1511,5166 @@ def guest_delete(request, pk):
         return redirect('guest_list')
     return render(request, 'hotel/guest_confirm_delete.html', {'guest': guest})
 """
-try:
-    with open(views_file_path, 'w') as f:
-        f.write(views_content)
-    print("views.py created/updated successfully with defined views.")
-except Exception as e:
-    print(f"An error occurred while writing to views.py: {e}")
-    sys.exit(1)
 
-# --- Step 10: Create static directories and style.css ---
-static_css_dir = os.path.join(app_name, "static", app_name, "css")
-os.makedirs(static_css_dir, exist_ok=True)
-style_css_path = os.path.join(static_css_dir, "style.css")
+@step("9", "Create views in hotel/views.py", parallel=True)
+def write_views():
+    print(f"Creating/Updating views.py at: {views_file_path}")
+    try:
+        write_file(views_file_path, views_content)
+        print("views.py created/updated successfully with defined views.")
+    except Exception as e:
+        print(f"An error occurred while writing to views.py: {e}")
+        sys.exit(1)
 
-print(f"Creating style.css at: {style_css_path}")
-style_css_content = """
-/* General Body and Layout */
-body {
-    font-family: 'Inter', sans-serif; /* Assuming Inter font from image */
-    margin: 0;
-    padding: 0;
-    background-color: #f0f2f5; /* Light gray background */
-    display: flex;
-    min-height: 100vh;
-    color: #333;
-}
 
-.container {
-    display: flex;
-    width: 100%;
-}
+# --- Step 9a: Create the room availability engine in hotel/availability.py ---
+availability_file_path = os.path.join(app_name, "availability.py")
+availability_content = """
+import time
+from bisect import bisect_right
+from threading import RLock
 
-/* Sidebar Styling */
-.sidebar {
-    width: 250px;
-    background-color: #2c3e50; /* Dark blue/gray */
-    color: #ecf0f1; /* Light text */
-    padding: 20px;
-    box-shadow: 2px 0 5px rgba(0,0,0,0.1);
-    display: flex;
-    flex-direction: column;
-}
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Booking, Generation
+
+# The counter lives in the database, which every worker process shares whatever the cache
+# backend, and an UPDATE increments it atomically where a cache's incr() may not.
+GENERATION_NAME = 'availability'
+
+
+def current_generation():
+    return Generation.objects.filter(name=GENERATION_NAME).values_list('value', flat=True).first() or 0
+
+
+async def acurrent_generation():
+    return await Generation.objects.filter(name=GENERATION_NAME).values_list('value', flat=True).afirst() or 0
+
+
+def bump_generation():
+    \"\"\"Mark every process's index out of date. Returns the new generation.\"\"\"
+    counter = Generation.objects.filter(name=GENERATION_NAME)
+    # The UPDATE locks the row (SQLite: the database) until commit, so the value read back is our own
+    with transaction.atomic():
+        if not counter.update(value=F('value') + 1):
+            try:
+                with transaction.atomic():
+                    Generation.objects.create(name=GENERATION_NAME, value=1)
+                return 1
+            except IntegrityError: # Another process created it first
+                counter.update(value=F('value') + 1)
+        return counter.values_list('value', flat=True).get()
+
+
+class RoomIntervalIndex:
+    \"\"\"Bookings of a single room, kept sorted by check-in date.\"\"\"
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals) # (check_in_date, check_out_date, booking_id)
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = [] # max_ends[i] is the latest check-out among intervals[:i + 1]
+        self._refresh_max_ends(0)
+
+    def _refresh_max_ends(self, position):
+        del self.max_ends[position:]
+        latest = self.max_ends[-1] if self.max_ends else None
+        for check_in, check_out, booking_id in self.intervals[position:]:
+            if latest is None or check_out > latest:
+                latest = check_out
+            self.max_ends.append(latest)
+
+    def add(self, check_in, check_out, booking_id):
+        interval = (check_in, check_out, booking_id)
+        position = bisect_right(self.intervals, interval)
+        self.intervals.insert(position, interval)
+        self.starts.insert(position, check_in)
+        self._refresh_max_ends(position)
+
+    def remove(self, check_in, check_out, booking_id):
+        position = bisect_right(self.intervals, (check_in, check_out, booking_id)) - 1
+        if position >= 0 and self.intervals[position][2] == booking_id:
+            del self.intervals[position]
+            del self.starts[position]
+            self._refresh_max_ends(position)
+
+    def overlaps(self, check_in, check_out):
+        # Same rule as the booking views: a stay clashes when it starts on or before
+        # the requested check-out and ends on or after the requested check-in.
+        position = bisect_right(self.starts, check_out)
+        return position > 0 and self.max_ends[position - 1] >= check_in
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+class AvailabilityEngine:
+    \"\"\"
+    Per-room interval index answering "which rooms are booked between two dates"
+    in O(rooms * log(bookings per room)) instead of scanning the Booking table.
+
+    The index is loaded lazily and updated incrementally from this process's Booking
+    saves and deletes. Every booking write also bumps a generation counter in the
+    database; a process whose index was loaded at another generation reloads it, so
+    changes made by other worker processes are picked up on their next query. It is also
+    fully reloaded every HOTEL_AVAILABILITY_INDEX_TTL seconds, in case a write skipped the
+    signals without calling invalidate().
+    \"\"\"
+
+    def __init__(self):
+        self._lock = RLock()
+        self._rooms = {} # room_id -> RoomIntervalIndex
+        self._bookings = {} # booking_id -> (room_id, check_in_date, check_out_date)
+        self._loaded_at = None
+        self._generation = None # The shared generation the index reflects
+
+    def _ttl(self):
+        return getattr(settings, 'HOTEL_AVAILABILITY_INDEX_TTL', 300)
+
+    def reload(self, generation=None):
+        # Read the generation before the table: a write in between then causes one more reload, never a missed one
+        generation = current_generation() if generation is None else generation
+        per_room = {}
+        bookings = {}
+        rows = Booking.objects.values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+        for booking_id, room_id, check_in, check_out in rows.iterator(chunk_size=5000):
+            bookings[booking_id] = (room_id, check_in, check_out)
+            per_room.setdefault(room_id, []).append((check_in, check_out, booking_id))
+        with self._lock:
+            self._rooms = {room_id: RoomIntervalIndex(intervals) for room_id, intervals in per_room.items()}
+            self._bookings = bookings
+            self._loaded_at = time.monotonic()
+            self._generation = generation
+
+    def invalidate(self):
+        \"\"\"Drop the index here and in every other process (after bulk writes that send no signals).\"\"\"
+        bump_generation()
+        with self._lock:
+            self._loaded_at = None
+
+    def needs_reload(self, generation=None):
+        generation = current_generation() if generation is None else generation
+        return (self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl()
+                or generation != self._generation)
+
+    def _ensure_loaded(self, generation=None):
+        generation = current_generation() if generation is None else generation
+        if self.needs_reload(generation):
+            self.reload(generation)
+
+    def ensure_loaded(self, generation=None):
+        # Under the lock, so a burst of requests on a stale index reloads it once
+        with self._lock:
+            self._ensure_loaded(generation)
+
+    def booked_room_ids(self, check_in, check_out, generation=None):
+        with self._lock:
+            self._ensure_loaded(generation)
+            return {room_id for room_id, index in self._rooms.items() if index.overlaps(check_in, check_out)}
+
+    def is_room_free(self, room_id, check_in, check_out):
+        with self._lock:
+            self._ensure_loaded()
+            index = self._rooms.get(room_id)
+            return index is None or not index.overlaps(check_in, check_out)
+
+    def _discard(self, booking_id):
+        previous = self._bookings.pop(booking_id, None)
+        if previous is not None:
+            room_id, check_in, check_out = previous
+            index = self._rooms.get(room_id)
+            if index is not None:
+                index.remove(check_in, check_out, booking_id)
+                if not len(index):
+                    del self._rooms[room_id]
+
+    def _advance(self, generation):
+        # Apply a change of our own only if it is the sole one since the index was loaded;
+        # otherwise another process wrote too, and the next query reloads.
+        if self._loaded_at is None:
+            return False # Nothing loaded yet; the first query reads the current table
+        if generation is None or self._generation is None or generation != self._generation + 1:
+            self._loaded_at = None
+            return False
+        self._generation = generation
+        return True
+
+    def sync_booking(self, booking, generation=None):
+        with self._lock:
+            if not self._advance(generation):
+                return
+            self._discard(booking.pk)
+            self._bookings[booking.pk] = (booking.room_id, booking.check_in_date, booking.check_out_date)
+            self._rooms.setdefault(booking.room_id, RoomIntervalIndex()).add(
+                booking.check_in_date, booking.check_out_date, booking.pk
+            )
 
-.sidebar h2 {
-    color: #fff;
-    text-align: center;
-    margin-bottom: 30px;
-}
+    def forget_booking(self, booking_id, generation=None):
+        with self._lock:
+            if self._advance(generation):
+                self._discard(booking_id)
 
-.sidebar ul {
+
+engine = AvailabilityEngine()
+
+
+def booked_room_ids(check_in, check_out):
+    \"\"\"Return the set of room ids with a booking overlapping check_in..check_out.\"\"\"
+    return engine.booked_room_ids(check_in, check_out)
+
+
+async def abooked_room_ids(check_in, check_out):
+    \"\"\"booked_room_ids() for async views: only a reload of the index leaves the event loop.\"\"\"
+    generation = await acurrent_generation()
+    if engine.needs_reload(generation):
+        await sync_to_async(engine.ensure_loaded)(generation)
+    return engine.booked_room_ids(check_in, check_out, generation)
+
+
+def is_room_free(room_id, check_in, check_out):
+    return engine.is_room_free(room_id, check_in, check_out)
+
+
+# Keep the index in step with every write path (booking views, cascades from guest/room deletes)
+@receiver(post_save, sender=Booking)
+def _booking_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: engine.sync_booking(instance, bump_generation()))
+
+
+@receiver(post_delete, sender=Booking)
+def _booking_deleted(sender, instance, **kwargs):
+    booking_id = instance.pk
+    transaction.on_commit(lambda: engine.forget_booking(booking_id, bump_generation()))
+"""
+# Register the availability signal handlers when the app is loaded
+apps_file_path = os.path.join(app_name, "apps.py")
+apps_content = f"""
+from django.apps import AppConfig
+
+
+class HotelConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = '{app_name}'
+
+    def ready(self):
+        # Importing these modules connects their model signal handlers
+        from . import availability, dashboard, invoicing, pricing, reports, room_status, search # noqa: F401
+"""
+
+@step("9a", "Create the room availability engine in hotel/availability.py", parallel=True)
+def write_availability_engine():
+    print(f"Creating availability engine at: {availability_file_path}")
+    try:
+        write_file(availability_file_path, availability_content)
+        print("availability.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to availability.py: {e}")
+        sys.exit(1)
+    print(f"Creating/Updating apps.py at: {apps_file_path}")
+    try:
+        write_file(apps_file_path, apps_content)
+        print("apps.py created/updated successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to apps.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9b: Create management commands in hotel/management/commands/ ---
+commands_dir = os.path.join(app_name, "management", "commands")
+management_commands = {
+    "query_plans.py": """
+import re
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from hotel.models import Room, Booking
+from hotel.room_status import SELLABLE
+
+# Planner switches that leave PostgreSQL nothing but sequential scans for the rest of the transaction
+POSTGRES_INDEX_SETTINGS = ('enable_indexscan', 'enable_indexonlyscan', 'enable_bitmapscan')
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plan and timing of the booking overlap and room availability queries, "
+        "first with the indexes and then again with index use disabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check-in', default=None, help="YYYY-MM-DD (defaults to today)")
+        parser.add_argument('--nights', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20, help="Executions to time per query")
+
+    def _without_indexes(self, sql):
+        # SQLite: NOT INDEXED after a table name forbids every index on it (rowid lookups still work)
+        return re.sub(r'((?:FROM|JOIN) "\\w+")', r'\\1 NOT INDEXED', sql)
+
+    def _measure(self, queryset, repeat, use_indexes=True):
+        \"\"\"Run the queryset's SQL `repeat` times; return (ms per query, plan lines).\"\"\"
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not use_indexes and connection.vendor == 'postgresql':
+                for setting in POSTGRES_INDEX_SETTINGS:
+                    cursor.execute(f"SET LOCAL {setting} = off")
+            elif not use_indexes:
+                sql = self._without_indexes(sql)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            plan = [str(row[-1]) for row in cursor.fetchall()] # SQLite's detail column, PostgreSQL's only one
+        return elapsed_ms, plan
+
+    def handle(self, *args, **options):
+        check_in = date.fromisoformat(options['check_in']) if options['check_in'] else date.today()
+        check_out = check_in + timedelta(days=options['nights'])
+        room = Room.objects.order_by('id').first()
+        repeat = max(1, options['repeat'])
+
+        queries = {
+            'room overlap check': Booking.objects.filter(room=room).overlapping(check_in, check_out),
+            'overlapping bookings': Booking.objects.overlapping(check_in, check_out).values_list('room__id', flat=True),
+            'sellable rooms by type': Room.objects.filter(status__in=SELLABLE, room_type='single'),
+        }
+
+        self.stdout.write(f"Backend: {connection.vendor}, {Room.objects.count()} rooms, {Booking.objects.count()} bookings")
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.stdout.write(self.style.WARNING("Index use can only be switched off on SQLite and PostgreSQL"))
+        for label, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\\n{label}"))
+            indexed_ms, indexed_plan = self._measure(queryset, repeat)
+            self.stdout.write(f"  with indexes ({indexed_ms:.2f} ms/query):")
+            for line in indexed_plan:
+                self.stdout.write(f"    {line}")
+            if connection.vendor not in ('sqlite', 'postgresql'):
+                continue
+            scan_ms, scan_plan = self._measure(queryset, repeat, use_indexes=False)
+            self.stdout.write(f"  indexes disabled ({scan_ms:.2f} ms/query):")
+            for line in scan_plan:
+                self.stdout.write(f"    {line}")
+            if indexed_plan == scan_plan:
+                self.stdout.write(self.style.WARNING("  Same plan either way: this query does not use an index"))
+            else:
+                self.stdout.write(f"  Speed-up from the indexes: {scan_ms / indexed_ms if indexed_ms else 0:.1f}x")
+""",
+    "booking_stress.py": """
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from hotel.models import Room, RoomStatusEvent, Guest, Booking
+from hotel.services import save_booking, BookingConflict
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire many parallel bookings for the same room and dates; exactly one per date range must succeed. "
+        "Lock failures (e.g. SQLite's 'database is locked') are counted apart from refused overlaps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=5, help="Distinct date ranges to contend for")
+
+    def _attempt(self, room_id, guest_id, check_in, check_out):
+        try:
+            save_booking(Booking(guest_id=guest_id, room_id=room_id, check_in_date=check_in,
+                                 check_out_date=check_out, status='confirmed'))
+            return 'booked'
+        except BookingConflict:
+            return 'conflict'
+        except OperationalError as e: # The database gave up waiting for a lock; says nothing about overlaps
+            self.lock_errors.add(str(e))
+            return 'lock_failed'
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        room, _ = Room.objects.get_or_create(room_number='STRESS', defaults={'room_type': 'stress', 'price': 0})
+        guest, guest_created = Guest.objects.get_or_create(name='Stress Test', defaults={'contact_info': 'stress@example.com'})
+        Booking.objects.filter(room=room).delete()
+        start = date.today() + timedelta(days=365)
+
+        results = {'booked': 0, 'conflict': 0, 'lock_failed': 0}
+        self.lock_errors = set()
+        check_ins = [start + timedelta(days=10 * round_number) for round_number in range(options['rounds'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = []
+            for attempt in range(options['attempts']):
+                check_in = check_ins[attempt % options['rounds']]
+                futures.append(pool.submit(self._attempt, room.id, guest.id, check_in, check_in + timedelta(days=2)))
+            for future in futures:
+                results[future.result()] += 1
+        elapsed = time.perf_counter() - started
+
+        per_range = Counter(Booking.objects.filter(room=room).values_list('check_in_date', flat=True))
+        double_booked = [check_in for check_in in check_ins if per_range[check_in] > 1]
+        unbooked = [check_in for check_in in check_ins if not per_range[check_in]]
+        self.stdout.write(
+            f"{options['attempts']} attempts in {elapsed:.2f}s ({options['attempts'] / elapsed:.0f}/s): "
+            f"{results['booked']} booked, {results['conflict']} refused as overlapping, {results['lock_failed']} lock failures"
+        )
+        for message in sorted(self.lock_errors):
+            self.stdout.write(f"  lock failure: {message}")
+        RoomStatusEvent.objects.filter(room=room).delete() # The stress room's history is test data too
+        room.delete() # Cascades to the test bookings
+        if guest_created:
+            guest.delete()
+        if unbooked:
+            # Every attempt at these dates timed out on a lock: a capacity problem, not a correctness one
+            self.stdout.write(self.style.WARNING(f"{len(unbooked)} date ranges got no booking because of lock failures"))
+        if double_booked:
+            self.stderr.write(self.style.ERROR(
+                f"Room was double-booked from {', '.join(str(check_in) for check_in in double_booked)}"
+            ))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS("No double bookings."))
+""",
+    "list_page_bench.py": """
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+
+from hotel.models import Room, Booking, Guest
+
+
+class Command(BaseCommand):
+    help = "Time the first, middle and last page of the room, booking and guest lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        client = Client()
+        for url_name, model in (('room_list', Room), ('booking_list', Booking), ('guest_list', Guest)):
+            bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+            if bounds['low'] is None:
+                self.stdout.write(f"{url_name}: no rows")
+                continue
+            cursors = {
+                'first': None,
+                'middle': (bounds['low'] + bounds['high']) // 2,
+                'last': max(bounds['high'] - 50, 0),
+            }
+            timings = []
+            for label, cursor in cursors.items():
+                params = {'after': cursor} if cursor is not None else {}
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    client.get(reverse(url_name), params)
+                timings.append(f"{label} {(time.perf_counter() - started) * 1000 / options['repeat']:.1f} ms")
+            self.stdout.write(f"{url_name} ({model.objects.count()} rows): " + ", ".join(timings))
+""",
+    "rebuild_guest_index.py": """
+from django.core.management.base import BaseCommand
+
+from hotel import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the guest search index from the Guest table (needed after bulk loads)."
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        backend = "FTS5" if search.fts_enabled() else "in-process token index"
+        self.stdout.write(self.style.SUCCESS(f"Guest search index rebuilt ({backend})."))
+""",
+    "guest_search_bench.py": """
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from hotel import search
+from hotel.models import Guest
+
+FIRST_NAMES = ['Anna', 'Ben', 'Carla', 'David', 'Elena', 'Farid', 'Greta', 'Hiro', 'Ines', 'Jonas', 'Kemal', 'Lucia']
+LAST_NAMES = ['Schmidt', 'Nguyen', 'Garcia', 'Okafor', 'Rossi', 'Kowalski', 'Tanaka', 'Silva', 'Novak', 'Larsen']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare guest search through the index against icontains scans. With --guests, synthetic guests "
+        "are added for the run and rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guests', type=int, default=None,
+                            help="Top up to this many guests for the run (e.g. 1000000); nothing is kept")
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def _top_up(self, target, batch_size):
+        missing = target - Guest.objects.count()
+        if missing <= 0:
+            return
+        self.stdout.write(f"Creating {missing} synthetic guests...")
+        rng = random.Random(42)
+        for start in range(0, missing, batch_size):
+            Guest.objects.bulk_create([
+                Guest(
+                    name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.randint(1, 99999)}",
+                    contact_info=f"guest{start + i}@search-bench.invalid",
+                )
+                for i in range(min(batch_size, missing - start))
+            ])
+        search.rebuild() # bulk_create bypasses the sync signals
+
+    def _time(self, label, queries, run):
+        started = time.perf_counter()
+        for query in queries:
+            run(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        self.stdout.write(f"{label}: {elapsed_ms:.2f} ms/query")
+
+    def handle(self, *args, **options):
+        if not options['guests']:
+            self._benchmark(options)
+            return
+        # One transaction, rolled back, so the synthetic guests never reach the real data. On SQLite
+        # it holds the database's write lock until the run ends.
+        try:
+            with transaction.atomic():
+                self._top_up(options['guests'], options['batch_size'])
+                self._benchmark(options)
+                transaction.set_rollback(True)
+        finally:
+            search.token_index.invalidate() # It may have indexed the rolled-back guests
+        self.stdout.write("Synthetic guests rolled back.")
+
+    def _benchmark(self, options):
+        rng = random.Random(7)
+        queries = [f"{rng.choice(FIRST_NAMES)[:3]} {rng.choice(LAST_NAMES)[:4]}" for _ in range(options['queries'])]
+        self.stdout.write(f"{Guest.objects.count()} guests, {len(queries)} two-term prefix queries")
+
+        self._time("search index" + (" (FTS5)" if search.fts_enabled() else " (token index)"), queries,
+                   lambda query: search.search_guests(query, limit=50))
+        self._time("icontains scan", queries, lambda query: list(Guest.objects.filter(
+            Q(name__icontains=query) | Q(contact_info__icontains=query)
+        )[:50]))
+""",
+    "availability_batch_bench.py": """
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from hotel.models import Room
+
+
+class Command(BaseCommand):
+    help = "Compare one batch JSON availability call against one HTML room_availability request per range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ranges', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        room_types = list(Room.objects.values_list('room_type', flat=True).distinct()) or [None]
+        queries = []
+        for _ in range(options['ranges']):
+            check_in = date.today() + timedelta(days=rng.randint(0, 365))
+            queries.append({
+                'check_in': check_in.isoformat(),
+                'check_out': (check_in + timedelta(days=rng.randint(1, 7))).isoformat(),
+                'room_type': rng.choice(room_types),
+            })
+        client = Client()
+
+        started = time.perf_counter()
+        for query in queries:
+            client.get(reverse('room_availability'), {'check_in_date': query['check_in'], 'check_out_date': query['check_out']})
+        html_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        client.post(reverse('room_availability_batch'), json.dumps({'queries': queries}), content_type='application/json')
+        batch_elapsed = time.perf_counter() - started
+
+        count = len(queries)
+        self.stdout.write(f"HTML, one request per range: {html_elapsed * 1000:.1f} ms ({count / html_elapsed:.0f} ranges/s)")
+        self.stdout.write(f"JSON batch, one request:     {batch_elapsed * 1000:.1f} ms ({count / batch_elapsed:.0f} ranges/s)")
+""",
+    "import_data.py": """
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hotel import availability, dashboard, invoicing, pricing, reports, room_status, search
+from hotel.availability import RoomIntervalIndex
+from hotel.forms import RoomForm, GuestForm, BookingForm, RatePlanForm
+from hotel.models import Booking
+
+FORMS = {
+    'rooms': RoomForm,
+    'guests': GuestForm,
+    'bookings': BookingForm,
+    'rate_plans': RatePlanForm,
+}
+
+
+class Command(BaseCommand):
+    help = "Bulk import rooms, guests, bookings or rate plans from a CSV or JSONL file, validated with the app's forms."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(FORMS))
+        parser.add_argument('path', help="CSV with a header row, or JSONL with one object per line")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true', help="Skip rows committed by a previous run")
+        parser.add_argument('--strict', action='store_true', help="Stop at the first invalid row")
+
+    def _rows(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                for line_number, line in enumerate(f, start=1):
+                    if line.strip():
+                        yield line_number, json.loads(line)
+            else:
+                for line_number, row in enumerate(csv.DictReader(f), start=2): # Line 1 is the header
+                    yield line_number, row
+
+    def _state_path(self, path):
+        return path + '.import-state.json'
+
+    def _load_booking_indexes(self):
+        # Existing bookings per room, so overlaps are checked in memory instead of one query per row
+        per_room = {}
+        rows = Booking.objects.values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+        for booking_id, room_id, check_in, check_out in rows.iterator(chunk_size=5000):
+            per_room.setdefault(room_id, []).append((check_in, check_out, booking_id))
+        return {room_id: RoomIntervalIndex(intervals) for room_id, intervals in per_room.items()}
+
+    def handle(self, *args, **options):
+        kind, path, batch_size = options['kind'], options['path'], options['batch_size']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        state_path = self._state_path(path)
+        resume_after = 0
+        if options['resume'] and os.path.exists(state_path):
+            with open(state_path) as f:
+                resume_after = json.load(f)['line']
+            self.stdout.write(f"Resuming after line {resume_after}")
+
+        form_class = FORMS[kind]
+        room_indexes = self._load_booking_indexes() if kind == 'bookings' else None
+        seen_room_numbers = set()
+        pending_booking_id = -1 # Placeholder ids for imported bookings that are not saved yet
+        min_check_in = max_check_out = None # Span of the imported stays, for the report rollups
+        batch, last_line = [], resume_after
+        imported = rejected = 0
+        started = time.perf_counter()
+
+        def flush():
+            nonlocal batch
+            if not batch:
+                return
+            with transaction.atomic():
+                created = form_class._meta.model.objects.bulk_create(batch, batch_size=batch_size)
+                if kind == 'rooms':
+                    room_status.log_new_rooms(created, note="Imported")
+            # Only record progress once the batch is committed
+            with open(state_path, 'w') as f:
+                json.dump({'line': last_line}, f)
+            batch = []
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{imported} rows imported ({imported / elapsed:.0f} rows/sec)")
+
+        for line_number, row in self._rows(path):
+            if line_number <= resume_after:
+                continue
+            form = form_class(data=row)
+            error = None
+            if not form.is_valid():
+                error = form.errors.as_json()
+            elif kind == 'rooms':
+                room_number = form.cleaned_data['room_number']
+                if room_number in seen_room_numbers:
+                    error = f"Duplicate room_number {room_number} in file"
+                seen_room_numbers.add(room_number)
+            elif kind == 'bookings':
+                data = form.cleaned_data
+                index = room_indexes.setdefault(data['room'].id, RoomIntervalIndex())
+                if index.overlaps(data['check_in_date'], data['check_out_date']):
+                    error = f"Room {data['room'].room_number} is already booked for some part of the selected dates."
+                else:
+                    index.add(data['check_in_date'], data['check_out_date'], pending_booking_id)
+                    pending_booking_id -= 1
+                    min_check_in = min(min_check_in or data['check_in_date'], data['check_in_date'])
+                    max_check_out = max(max_check_out or data['check_out_date'], data['check_out_date'])
+
+            if error:
+                rejected += 1
+                self.stderr.write(f"Line {line_number}: {error}")
+                if options['strict']:
+                    flush()
+                    raise CommandError(f"Stopped at invalid line {line_number}; rerun with --resume after fixing it.")
+                continue
+
+            batch.append(form.save(commit=False))
+            imported += 1
+            last_line = line_number
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        # bulk_create sends no model signals, so refresh the derived indexes and caches here
+        availability.engine.invalidate()
+        dashboard.invalidate()
+        dashboard.invalidate_calendar()
+        if kind == 'guests':
+            search.rebuild()
+        if kind == 'rate_plans':
+            pricing.engine.invalidate()
+            if imported:
+                reports.rebuild() # Room revenue in the rollups is priced with the rate plans
+        if kind == 'rooms':
+            room_status.projection.invalidate()
+            if imported:
+                reports.rebuild() # New rooms add to the available room nights of every day
+        if kind == 'bookings' and imported:
+            reports.rebuild(min_check_in, max_check_out)
+            invoicing.rebuild(batch_size)
+
+        elapsed = time.perf_counter() - started
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} {kind}, rejected {rejected}, in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):.0f} rows/sec)"
+        ))
+""",
+    "export_data.py": """
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from hotel import exports
+
+
+class Command(BaseCommand):
+    help = "Stream bookings or payments to CSV/JSON (optionally gzipped) for accounting."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        parser.add_argument('--start', type=date.fromisoformat, help="First check-in/payment date, YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last check-in/payment date, YYYY-MM-DD")
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', '-o', help="File to write (defaults to stdout)")
+        parser.add_argument('--measure-memory', action='store_true', help="Report peak Python memory on stderr")
+
+    def handle(self, *args, **options):
+        if options['measure_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        chunks = exports.export_chunks(options['kind'], options['format'], options['start'], options['end'], options['gzip'])
+        if options['output']:
+            # The CSV writer ends rows with \\r\\n itself, so newline='' stops Windows doubling the \\r
+            output = open(options['output'], 'wb' if options['gzip'] else 'w',
+                          encoding=None if options['gzip'] else 'utf-8', newline=None if options['gzip'] else '')
+        else:
+            output = sys.stdout.buffer if options['gzip'] else sys.stdout
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        report = f"Exported {options['kind']}: {written} {'bytes' if options['gzip'] else 'characters'} in {elapsed:.2f}s"
+        if options['measure_memory']:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report += f", peak memory {peak / 1024 / 1024:.1f} MiB"
+        self.stderr.write(report)
+""",
+    "rebuild_rollups.py": """
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel import reports
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily occupancy/revenue rollups from bookings and payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="YYYY-MM-DD (defaults to the earliest data)")
+        parser.add_argument('--end', type=date.fromisoformat, help="YYYY-MM-DD (defaults to the latest data)")
+        parser.add_argument('--gaps-only', action='store_true', help="Only compute days that have no rollups yet")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['gaps_only']:
+            if not options['start'] or not options['end']:
+                raise CommandError("--gaps-only needs --start and --end.")
+            total = reports.fill_gaps(options['start'], options['end'])
+            self.stdout.write(self.style.SUCCESS(f"Filled {total} rollup rows in {time.perf_counter() - started:.1f}s"))
+            return
+        total = reports.rebuild(
+            options['start'], options['end'],
+            progress=lambda chunk_end, rows: self.stdout.write(f"  up to {chunk_end}: {rows} rollup rows"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} rollup rows in {time.perf_counter() - started:.1f}s"))
+""",
+    "rebuild_invoices.py": """
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotel import invoicing
+
+
+class Command(BaseCommand):
+    help = "Rebuild every booking's invoice summary from bookings, service charges and payments (needed after bulk loads)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = invoicing.rebuild(options['batch_size'], progress=lambda done: self.stdout.write(f"  {done} invoices"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} invoice summaries in {time.perf_counter() - started:.1f}s"))
+""",
+    "worker.py": """
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotel import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (report rebuilds, exports, invoice batches, reindexing) on a pool of threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Jobs run at once, one thread and database connection each")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between queue checks while idle")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due instead of waiting for more")
+
+    def handle(self, *args, **options):
+        worker = jobs.Worker(options['concurrency'], options['poll'])
+        # Ctrl+C or a service manager's SIGTERM: stop claiming, finish the running jobs, exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: worker.stop())
+        self.stdout.write(f"Worker {worker.name}: {worker.concurrency} thread(s), tasks: {', '.join(sorted(jobs.TASKS))}")
+        started = time.perf_counter()
+        total = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} job(s) in {time.perf_counter() - started:.1f}s"))
+""",
+    "render_invoices.py": """
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel import invoicing
+from hotel.models import InvoiceSummary
+
+
+class Command(BaseCommand):
+    help = "Write printable HTML or PDF invoices (INV-<booking id>) for open balances, or every booking with --all."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Every invoice, not only those with a balance due")
+        parser.add_argument('--format', choices=['html', 'pdf'], default='html')
+        parser.add_argument('--output', '-o', help="Directory to write (defaults to HOTEL_INVOICE_DIR)")
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if options['format'] == 'pdf' and invoicing.pdf_renderer() is None:
+            raise CommandError("PDF invoices need WeasyPrint (pip install weasyprint); use --format html without it.")
+        output_dir = options['output'] or getattr(settings, 'HOTEL_INVOICE_DIR', os.path.join(settings.BASE_DIR, 'invoices'))
+        invoices = InvoiceSummary.objects.all() if options['all'] else invoicing.open_invoices()
+        booking_ids = list(invoices.order_by('booking_id').values_list('booking_id', flat=True))
+        started = time.perf_counter()
+        total = invoicing.render_invoices(
+            booking_ids, output_dir, options['format'], options['batch_size'],
+            progress=lambda done: self.stdout.write(f"  {done} of {len(booking_ids)} invoices"),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {total} invoices to {output_dir} in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} invoices/sec)"
+        ))
+""",
+    "report_bench.py": """
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from hotel import reports
+from hotel.models import DailyRollup
+
+
+class Command(BaseCommand):
+    help = "Compare a monthly report read from the rollups against aggregating the raw bookings on the fly."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=5)
+
+    def handle(self, *args, **options):
+        end = date.today()
+        start = end - timedelta(days=365 * options['years'])
+        self.stdout.write(f"{start} .. {end}, {DailyRollup.objects.filter(date__gte=start, date__lte=end).count()} rollup rows")
+
+        started = time.perf_counter()
+        lines = reports.report(start, end, 'month')
+        self.stdout.write(f"rollup read:          {(time.perf_counter() - started) * 1000:.1f} ms ({len(lines)} lines)")
+
+        started = time.perf_counter()
+        rows = reports.compute_rollups(start, end)
+        self.stdout.write(f"on-the-fly aggregate: {(time.perf_counter() - started) * 1000:.1f} ms ({len(rows)} day/type cells)")
+""",
+    "serve.py": """
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    timeout = 5 # Idle keep-alive connections are closed after this many seconds
+
+    def log_message(self, format, *args):
+        pass # Per-request logging costs more than the requests themselves under load
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the project with threaded WSGI worker processes sharing one socket. "
+        "hms.py --serve production uses this when gunicorn and uvicorn are not installed. "
+        "SIGHUP starts fresh workers and lets the old ones finish their requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--access-log', action='store_true')
+        parser.add_argument('--fd', type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        host, port = options['bind'].rsplit(':', 1)
+        if options['fd'] is not None:
+            self._serve(self._server(host, int(port), options), options['fd'])
+            return
+        # Workers inherit the listening socket, which needs POSIX fd passing
+        workers = options['workers'] if os.name == 'posix' else 1
+        listener = socket.create_server((host, int(port)), backlog=1024)
+        self.stdout.write(f"Serving on http://{options['bind']}/ with {workers} worker(s), master pid {os.getpid()}")
+        if workers == 1:
+            self._serve(self._server(host, int(port), options), listener.detach())
+        else:
+            self._supervise(listener, workers, options)
+
+    def _server(self, host, port, options):
+        handler = WSGIRequestHandler if options['access_log'] else KeepAliveRequestHandler
+        server = ThreadedWSGIServer((host, port), handler, bind_and_activate=False)
+        server.daemon_threads = False # server_close() waits for in-flight requests
+        server.server_name, server.server_port = host, port
+        server.setup_environ()
+        server.set_app(get_internal_wsgi_application())
+        return server
+
+    def _serve(self, server, fd):
+        server.socket.close()
+        server.socket = socket.socket(fileno=fd)
+        stop = lambda *args: threading.Thread(target=server.shutdown).start()
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def _spawn(self, listener, options):
+        command = [sys.executable, sys.argv[0], 'serve', '--bind', options['bind'], '--fd', str(listener.fileno())]
+        if options['access_log']:
+            command.append('--access-log')
+        return subprocess.Popen(command, pass_fds=(listener.fileno(),))
+
+    def _supervise(self, listener, workers, options):
+        state = {'reload': False, 'stop': False}
+        signal.signal(signal.SIGHUP, lambda *args: state.update(reload=True))
+        signal.signal(signal.SIGTERM, lambda *args: state.update(stop=True))
+        signal.signal(signal.SIGINT, lambda *args: state.update(stop=True))
+        children = [self._spawn(listener, options) for _ in range(workers)]
+        retiring = []
+        while not state['stop']:
+            time.sleep(0.2)
+            if state['reload']:
+                state['reload'] = False
+                self.stdout.write("Reloading: starting new workers, draining the old ones")
+                retiring += children
+                children = [self._spawn(listener, options) for _ in range(workers)]
+                for child in retiring:
+                    child.terminate()
+            retiring = [child for child in retiring if child.poll() is None]
+            for index, child in enumerate(children):
+                if child.poll() is not None:
+                    self.stderr.write(f"Worker {child.pid} exited with {child.returncode}; restarting it")
+                    children[index] = self._spawn(listener, options)
+        for child in children + retiring:
+            child.terminate()
+        for child in children + retiring:
+            child.wait()
+        listener.close()
+""",
+    "load_test.py": """
+import http.client
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = "Load a running server's dashboard and availability pages over keep-alive connections and report requests/sec."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per page")
+        parser.add_argument('--pages', default='dashboard,availability', help="Comma-separated: dashboard, availability, rooms, guests")
+
+    def _client(self, target, path, deadline, latencies, errors):
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(type(e).__name__)
+                connection.close()
+                continue
+            if response.status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(response.status)
+            if response.will_close:
+                connection.close() # Reconnects on the next request
+        connection.close()
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['url'])
+        check_in = date.today() + timedelta(days=30)
+        pages = {
+            'dashboard': reverse('home'),
+            'availability': reverse('room_availability') + '?' + urlencode({
+                'check_in_date': check_in.isoformat(),
+                'check_out_date': (check_in + timedelta(days=3)).isoformat(),
+            }),
+            'rooms': reverse('room_list'),
+            'guests': reverse('guest_list'),
+        }
+        unknown = set(options['pages'].split(',')) - set(pages)
+        if unknown:
+            raise CommandError(f"Unknown page(s): {', '.join(sorted(unknown))}")
+        pages = {label: pages[label] for label in options['pages'].split(',')}
+        probe = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=10)
+        probe.request('GET', reverse('home'))
+        server = probe.getresponse().getheader('Server', 'unknown')
+        probe.close()
+        self.stdout.write(f"{options['url']} (Server: {server}), {options['concurrency']} connections, {options['duration']:.0f}s per page")
+
+        for label, path in pages.items():
+            latencies, errors = [], []
+            deadline = time.perf_counter() + options['duration']
+            threads = [
+                threading.Thread(target=self._client, args=(target, path, deadline, latencies, errors))
+                for _ in range(options['concurrency'])
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            if not latencies:
+                self.stdout.write(f"{label:<13} no successful requests ({len(errors)} errors)")
+                continue
+            percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+            self.stdout.write(
+                f"{label:<13} {len(latencies) / elapsed:8.1f} req/s  "
+                f"p50 {percentile(0.5):.1f} ms  p95 {percentile(0.95):.1f} ms  p99 {percentile(0.99):.1f} ms  "
+                f"{len(errors)} errors"
+            )
+""",
+    "page_weight.py": """
+import os
+import re
+from datetime import date
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+ASSET_URL = re.compile(r'<(?:link|script|img)\\b[^>]*?(?:href|src)="([^"]+)"')
+HASH_SUFFIX = re.compile(r'\\.[0-9a-f]{12}(\\.[^/.]+)$')
+
+
+class Command(BaseCommand):
+    help = "Measure the bytes one dashboard load transfers, on a first visit and on a repeat visit."
+
+    def _body(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            raise CommandError("Run with DJANGO_DEBUG=0 to measure what production serves (hashed names, compressed variants).")
+        client = Client()
+        today = date.today()
+        html = self._body(client.get(reverse('home')))
+        calendar = self._body(client.get(reverse('occupancy_calendar', kwargs={'year': today.year, 'month': today.month})))
+        self.stdout.write(f"{'dashboard HTML':<40} {len(html):>8} B")
+        self.stdout.write(f"{'calendar JSON (fetched by the page)':<40} {len(calendar):>8} B")
+
+        first_visit = repeat_visit = len(html) + len(calendar)
+        self.stdout.write(f"\\n{'asset':<40} {'source':>8} {'served':>8} {'gzip':>8} {'br':>8}  cache-control")
+        for url in dict.fromkeys(ASSET_URL.findall(html.decode())):
+            if url.startswith(('http://', 'https://', '//')):
+                self.stdout.write(f"{url[:40]:<40} {'external, not measured':>35}")
+                continue
+            sizes = {}
+            for encoding in ('identity', 'gzip', 'br'):
+                response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                if response.status_code == 200 and response.get('Content-Encoding', 'identity') == encoding:
+                    sizes[encoding] = len(self._body(response))
+            if not sizes:
+                self.stdout.write(f"{url[:40]:<40} {'not served':>35}")
+                continue
+            cache_control = response.get('Cache-Control', '')
+            best = min(sizes.values())
+            first_visit += best
+            if 'immutable' not in cache_control:
+                repeat_visit += best # Revalidated (or refetched) on every load
+            relative = url.split('?')[0].split(settings.STATIC_URL, 1)[-1]
+            source = finders.find(HASH_SUFFIX.sub(r'\\1', relative))
+            source_size = os.path.getsize(source) if source else 0
+            column = lambda encoding: f"{sizes[encoding]:>8}" if encoding in sizes else f"{'-':>8}"
+            self.stdout.write(f"{url[:40]:<40} {source_size:>8} {column('identity')} {column('gzip')} {column('br')}  {cache_control}")
+
+        self.stdout.write(f"\\nfirst visit:  {first_visit} B (local resources, best encoding)")
+        self.stdout.write(f"repeat visit: {repeat_visit} B (immutable assets come from the browser cache)")
+""",
+    "warmup.py": """
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from hotel import warmup
+
+PAGES = ('home', 'room_list', 'booking_list', 'guest_list', 'room_availability', 'reports')
+
+
+class Command(BaseCommand):
+    help = "Pre-compile the hotel templates and URL patterns; with --compare, time each page cold and warm."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _time(self, client, url):
+        started = time.perf_counter()
+        client.get(url)
+        return (time.perf_counter() - started) * 1000
+
+    def handle(self, *args, **options):
+        if not options['compare']:
+            templates, patterns, elapsed = warmup.warm()
+            self.stdout.write(f"Compiled {templates} templates and {patterns} URL patterns in {elapsed * 1000:.1f} ms")
+            return
+
+        client = Client()
+        urls = [reverse(name) for name in PAGES]
+        for url in urls:
+            client.get(url) # Fill the data caches first so only templates and URLs differ below
+
+        cold = {}
+        for url in urls:
+            warmup.reset()
+            cold[url] = self._time(client, url)
+        warmup.reset()
+        templates, patterns, elapsed = warmup.warm()
+        warm = {url: statistics.median(self._time(client, url) for _ in range(options['repeat'])) for url in urls}
+
+        self.stdout.write(f"warm-up: {templates} templates, {patterns} URL patterns in {elapsed * 1000:.1f} ms")
+        self.stdout.write(f"{'page':<22} {'cold':>9} {'warm':>9}")
+        for url in urls:
+            self.stdout.write(f"{url:<22} {cold[url]:>7.1f}ms {warm[url]:>7.1f}ms")
+""",
+    "generate_data.py": """
+import random
+import time
+from array import array
+from datetime import date, datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from hotel import availability, dashboard, invoicing, pricing, reports, room_status, search
+from hotel.models import (
+    Room, RoomStatus, RoomStatusEvent, RatePlan, Guest, Booking, Payment, ServiceCharge, InvoiceSummary, Staff, Service,
+    Amenity, DailyRollup,
+)
+
+ROOM_TYPES = {'single': (80, 120), 'double': (120, 180), 'deluxe': (180, 250), 'suite': (250, 400)}
+FIRST_NAMES = ['Anna', 'Ben', 'Chloé', 'David', 'Elif', 'Farah', 'Georg', 'Hana', 'Ivan', 'José',
+               'Kenji', 'Lena', 'Marta', 'Nils', 'Olu', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tomás']
+LAST_NAMES = ['Schmidt', 'Okafor', 'García', 'Nguyen', 'Kowalski', 'Haddad', 'Rossi', 'Jensen',
+              'Tanaka', 'Dubois', 'Silva', 'Müller', 'Novak', 'Yilmaz', 'Andersen', 'Costa']
+STAFF_ROLES = ['Receptionist', 'Housekeeping', 'Concierge', 'Chef', 'Maintenance', 'Manager']
+SERVICES = [('Room service', 25), ('Spa treatment', 90), ('Airport transfer', 60), ('Laundry', 15),
+            ('Breakfast', 18), ('Late checkout', 30), ('Parking', 12), ('Guided tour', 45)]
+AMENITIES = ['Wi-Fi', 'Pool', 'Gym', 'Sauna', 'Minibar', 'Air conditioning', 'Balcony', 'Sea view']
+PAYMENT_METHODS = ['card', 'cash', 'bank transfer']
+SERVICE_CHARGE_RATIO = 0.3 # Share of past stays that ordered services
+ROOM_STATUS_SHARES = [(0.03, RoomStatus.MAINTENANCE), (0.08, RoomStatus.DIRTY), (0.1, RoomStatus.CLEANING)]
+AVERAGE_CYCLE_DAYS = 6 # Mean stay (4 nights) plus mean gap (2 days) in the generated timelines
+
+
+def room_status_for(draw):
+    for upper_bound, status in ROOM_STATUS_SHARES:
+        if draw < upper_bound:
+            return status
+    return RoomStatus.AVAILABLE
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic rooms, rate plans, guests, bookings, payments, service charges, staff, "
+        "services and amenities using bulk inserts, e.g. --rooms 1000 --guests 1000000 --bookings 5000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--guests', type=int, default=10000)
+        parser.add_argument('--bookings', type=int, default=50000)
+        parser.add_argument('--payment-ratio', type=float, default=0.8, help="Share of past stays that have a payment")
+        parser.add_argument('--staff', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help="Delete existing hotel data first")
+
+    def _insert(self, model, objects, batch_size):
+        \"\"\"Bulk insert an iterable of unsaved objects, one transaction per batch. Returns the count.\"\"\"
+        total, batch = 0, []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                total += self._flush(model, batch)
+                batch = []
+        if batch:
+            total += self._flush(model, batch)
+        return total
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def _progress(self, label, done, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label}: {done} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f} rows/sec)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        if options['flush']:
+            for model in (InvoiceSummary, ServiceCharge, Payment, Booking, Guest, RoomStatusEvent, Room, RatePlan, Staff, Service,
+                          Amenity, DailyRollup):
+                model.objects.all().delete()
+        elif Room.objects.exists():
+            raise CommandError("The database already has rooms; pass --flush to replace them.")
+        started = time.perf_counter()
+
+        def rooms():
+            for i in range(options['rooms']):
+                room_type = rng.choice(list(ROOM_TYPES))
+                low, high = ROOM_TYPES[room_type]
+                yield Room(room_number=f"{i // 50 + 1}{i % 50 + 1:02d}", room_type=room_type,
+                           price=Decimal(rng.randrange(low, high + 1)), status=room_status_for(rng.random()))
+        phase_started = time.perf_counter()
+        self._progress('rooms', self._insert(Room, rooms(), batch_size), phase_started)
+        room_status.log_new_rooms(Room.objects.only('id', 'room_number', 'status').iterator(), note="Generated")
+
+        def guests():
+            for i in range(options['guests']):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                yield Guest(name=f"{first} {last}", contact_info=f"{first.lower()}.{last.lower()}{i}@example.com")
+        phase_started = time.perf_counter()
+        self._progress('guests', self._insert(Guest, guests(), batch_size), phase_started)
+
+        self._insert(Staff, (Staff(name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", role=rng.choice(STAFF_ROLES),
+                                   contact_info=f"staff{i}@hotel.example.com") for i in range(options['staff'])), batch_size)
+        self._insert(Service, (Service(name=name, description=f"{name} on request", price=Decimal(price))
+                               for name, price in SERVICES), batch_size)
+        self._insert(Amenity, (Amenity(name=name, description=f"{name} for all guests") for name in AMENITIES), batch_size)
+        self._insert(RatePlan, self._rate_plans(), batch_size)
+
+        room_prices = dict(Room.objects.values_list('id', 'price'))
+        guest_ids = array('q', Guest.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+        if not room_prices or not guest_ids:
+            raise CommandError("Bookings need at least one room and one guest.")
+        self._services = list(Service.objects.values_list('id', 'price'))
+        phase_started = time.perf_counter()
+        bookings = self._generate_bookings(rng, room_prices, guest_ids, options, phase_started)
+        self._progress('bookings, payments and service charges', bookings, phase_started)
+
+        # Bulk inserts send no model signals, so rebuild every derived index and cache
+        availability.engine.invalidate()
+        pricing.engine.invalidate()
+        room_status.projection.invalidate()
+        dashboard.invalidate()
+        dashboard.invalidate_calendar()
+        search.rebuild()
+        reports.rebuild()
+        phase_started = time.perf_counter()
+        self._progress('invoices', invoicing.rebuild(batch_size), phase_started)
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s"))
+
+    def _rate_plans(self):
+        \"\"\"Per room type: a Friday/Saturday price, and summer and year-end seasons from two years back to two ahead.\"\"\"
+        this_year = date.today().year
+        for room_type, (low, high) in ROOM_TYPES.items():
+            middle = (low + high) // 2
+            yield RatePlan(name=f"{room_type} weekend", room_type=room_type, nightly_price=Decimal(middle * 6 // 5), weekdays='45')
+            for year in range(this_year - 2, this_year + 3):
+                yield RatePlan(name=f"{room_type} summer {year}", room_type=room_type, nightly_price=Decimal(middle * 27 // 20),
+                               start_date=date(year, 6, 15), end_date=date(year, 8, 31), priority=1)
+                yield RatePlan(name=f"{room_type} year end {year}", room_type=room_type, nightly_price=Decimal(middle * 3 // 2),
+                               start_date=date(year, 12, 20), end_date=date(year + 1, 1, 2), priority=2)
+
+    def _generate_bookings(self, rng, room_prices, guest_ids, options, started):
+        \"\"\"
+        Lay out back-to-back stays per room (never overlapping, with at least a one-day
+        gap) so that about two thirds of each room's timeline is in the past.
+        \"\"\"
+        today = date.today()
+        room_ids = list(room_prices)
+        per_room, extra = divmod(options['bookings'], len(room_ids))
+        next_free = {
+            room_id: today - timedelta(days=(per_room + 1) * AVERAGE_CYCLE_DAYS * 2 // 3 + rng.randrange(7))
+            for room_id in room_ids
+        }
+        remaining = {room_id: per_room + (1 if index < extra else 0) for index, room_id in enumerate(room_ids)}
+
+        batch, inserted = [], 0
+        while remaining:
+            for room_id in list(remaining):
+                check_in = next_free[room_id] + timedelta(days=rng.randint(1, 3))
+                check_out = check_in + timedelta(days=rng.randint(1, 7))
+                next_free[room_id] = check_out
+                if check_out <= today:
+                    status = 'cancelled' if rng.random() < 0.05 else 'confirmed'
+                else:
+                    status = 'pending' if rng.random() < 0.3 else 'confirmed'
+                batch.append(Booking(guest_id=guest_ids[rng.randrange(len(guest_ids))], room_id=room_id,
+                                     check_in_date=check_in, check_out_date=check_out, status=status))
+                remaining[room_id] -= 1
+                if not remaining[room_id]:
+                    del remaining[room_id]
+                if len(batch) >= options['batch_size']:
+                    inserted += self._insert_bookings(rng, batch, room_prices, options['payment_ratio'])
+                    self._progress('bookings', inserted, started)
+                    batch = []
+        if batch:
+            inserted += self._insert_bookings(rng, batch, room_prices, options['payment_ratio'])
+        return inserted
+
+    def _insert_bookings(self, rng, batch, room_prices, payment_ratio):
+        today = date.today()
+        with transaction.atomic():
+            Booking.objects.bulk_create(batch) # Sets primary keys on backends that return them (SQLite, PostgreSQL)
+            payments = [
+                Payment(booking_id=booking.id, payment_method=rng.choice(PAYMENT_METHODS),
+                        amount=room_prices[booking.room_id] * (booking.check_out_date - booking.check_in_date).days)
+                for booking in batch
+                if booking.status == 'confirmed' and booking.check_in_date <= today and rng.random() < payment_ratio
+            ]
+            Payment.objects.bulk_create(payments) # payment_date is auto_now_add, so this stamps the load time
+            check_ins = {booking.id: booking.check_in_date for booking in batch}
+            for payment in payments: # Date them at check-in instead; bulk_update writes the values as given
+                payment.payment_date = timezone.make_aware(datetime.combine(check_ins[payment.booking_id], day_time(12)))
+            Payment.objects.bulk_update(payments, ['payment_date'], batch_size=1000)
+            charges = []
+            for booking in batch:
+                if booking.status == 'confirmed' and booking.check_in_date <= today and rng.random() < SERVICE_CHARGE_RATIO:
+                    service_id, price = rng.choice(self._services)
+                    charges.append(ServiceCharge(
+                        booking_id=booking.id, service_id=service_id, unit_price=price, quantity=rng.randint(1, 3),
+                        charged_at=timezone.make_aware(datetime.combine(booking.check_in_date, day_time(18))),
+                    ))
+            ServiceCharge.objects.bulk_create(charges)
+        return len(batch)
+""",
+    "benchmark.py": """
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+
+from hotel.models import Room, Guest, Booking, Payment
+from hotel.room_status import floor_of
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every view through the test client and write latency percentiles, query counts and "
+        "peak memory per view to JSON; --compare prints the change against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', help="Defaults to benchmarks/<git commit or timestamp>.json")
+        parser.add_argument('--compare', help="An earlier benchmark JSON file to diff against")
+        parser.add_argument('--only', help="Comma-separated case names")
+
+    def _middle_id(self, model):
+        bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            raise CommandError(f"No {model.__name__} rows; run generate_data first.")
+        return model.objects.filter(id__gte=(bounds['low'] + bounds['high']) // 2).values_list('id', flat=True).first()
+
+    def _cases(self):
+        \"\"\"(name, method, url, payload, mutates) for every view in hotel/urls.py worth timing.\"\"\"
+        room_id, guest_id, booking_id = self._middle_id(Room), self._middle_id(Guest), self._middle_id(Booking)
+        room = Room.objects.get(id=room_id)
+        today = date.today()
+        check_in, check_out = today + timedelta(days=30), today + timedelta(days=33)
+        # Far enough ahead that the generated timelines leave it free
+        free_in = (Booking.objects.aggregate(last=Max('check_out_date'))['last'] or today) + timedelta(days=30)
+        dates = {'check_in_date': check_in.isoformat(), 'check_out_date': check_out.isoformat()}
+        new_booking = {'guest': guest_id, 'room': room_id, 'check_in_date': free_in.isoformat(),
+                       'check_out_date': (free_in + timedelta(days=2)).isoformat(), 'status': 'confirmed'}
+        batch = json.dumps({'queries': [
+            {'check_in': (check_in + timedelta(days=7 * week)).isoformat(),
+             'check_out': (check_out + timedelta(days=7 * week)).isoformat()} for week in range(10)
+        ]})
+        return [
+            ('home', 'get', reverse('home'), None, False),
+            ('room_list', 'get', reverse('room_list'), None, False),
+            ('room_detail', 'get', reverse('room_detail', args=[room_id]), None, False),
+            ('room_create_form', 'get', reverse('room_create'), None, False),
+            ('room_update_form', 'get', reverse('room_update', args=[room_id]), None, False),
+            ('room_delete_confirm', 'get', reverse('room_delete', args=[room_id]), None, False),
+            ('housekeeping', 'get', reverse('housekeeping'), None, False),
+            ('housekeeping_floor', 'post', reverse('housekeeping'),
+             {'to_status': 'dirty', 'floor': floor_of(room.room_number), 'note': 'Benchmark'}, True),
+            ('booking_list', 'get', reverse('booking_list'), None, False),
+            ('booking_detail', 'get', reverse('booking_detail', args=[booking_id]), None, False),
+            ('booking_create_form', 'get', reverse('booking_create'), None, False),
+            ('booking_create', 'post', reverse('booking_create'), new_booking, True),
+            ('booking_update_form', 'get', reverse('booking_update', args=[booking_id]), None, False),
+            ('booking_delete_confirm', 'get', reverse('booking_delete', args=[booking_id]), None, False),
+            ('booking_add_payment', 'post', reverse('booking_add_payment', args=[booking_id]),
+             {'amount': '10.00', 'payment_method': 'card'}, True),
+            ('invoice_list', 'get', reverse('invoice_list'), None, False),
+            ('invoice_list_all', 'get', reverse('invoice_list') + '?show=all', None, False),
+            ('invoice_detail', 'get', reverse('invoice_detail', args=[booking_id]), None, False),
+            ('job_list', 'get', reverse('job_list'), None, False),
+            ('guest_list', 'get', reverse('guest_list'), None, False),
+            ('guest_search', 'get', reverse('guest_list') + '?q=schmidt', None, False),
+            ('guest_detail', 'get', reverse('guest_detail', args=[guest_id]), None, False),
+            ('guest_create_form', 'get', reverse('guest_create'), None, False),
+            ('room_availability', 'get', reverse('room_availability') + '?' + '&'.join(f"{k}={v}" for k, v in dates.items()), None, False),
+            ('room_availability_batch', 'post_json', reverse('room_availability_batch'), batch, False),
+            ('book_room_from_dashboard', 'post', reverse('book_room_from_dashboard'),
+             {'room_type': room.room_type, 'check_in_date': new_booking['check_in_date'],
+              'check_out_date': new_booking['check_out_date'], 'name': 'Bench Guest', 'email': 'bench@example.com'}, True),
+            ('occupancy_calendar', 'get', reverse('occupancy_calendar', kwargs={'year': today.year, 'month': today.month}), None, False),
+            ('reports', 'get', reverse('reports') + f"?start={(today - timedelta(days=365)).isoformat()}&end={today.isoformat()}", None, False),
+            ('export_bookings_month', 'get', reverse('export_data', kwargs={'kind': 'bookings'}) + f"?start={(today - timedelta(days=30)).isoformat()}&end={today.isoformat()}", None, False),
+        ]
+
+    def _request(self, client, method, url, payload, mutates):
+        if mutates:
+            # Roll back so every iteration sees the same data
+            with transaction.atomic():
+                response = self._request(client, method, url, payload, False)
+                transaction.set_rollback(True)
+            return response
+        if method == 'get':
+            response = client.get(url)
+        elif method == 'post_json':
+            response = client.post(url, payload, content_type='application/json')
+        else:
+            response = client.post(url, payload)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        client = Client()
+        cases = self._cases()
+        if options['only']:
+            wanted = set(options['only'].split(','))
+            cases = [case for case in cases if case[0] in wanted]
+
+        results = {}
+        for name, method, url, payload, mutates in cases:
+            for _ in range(options['warmup']):
+                self._request(client, method, url, payload, mutates)
+
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                response = self._request(client, method, url, payload, mutates)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            # Queries and memory are measured on separate requests so they do not skew the timings
+            executed = []
+            with connection.execute_wrapper(lambda execute, sql, *rest: executed.append(sql) or execute(sql, *rest)):
+                self._request(client, method, url, payload, mutates)
+            tracemalloc.start()
+            self._request(client, method, url, payload, mutates)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 0.50), 3),
+                'p90_ms': round(percentile(timings, 0.90), 3),
+                'p99_ms': round(percentile(timings, 0.99), 3),
+                'mean_ms': round(sum(timings) / len(timings), 3),
+                'queries': len(executed),
+                'peak_kb': round(peak / 1024, 1),
+            }
+            self.stdout.write(
+                f"{name:<26} {response.status_code}  p50 {results[name]['p50_ms']:8.2f} ms  p99 {results[name]['p99_ms']:8.2f} ms  "
+                f"{results[name]['queries']:3} queries  {results[name]['peak_kb']:8.1f} KB peak"
+            )
+
+        commit = self._git_commit()
+        report = {
+            'meta': {
+                'commit': commit,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'rows': {model.__name__: model.objects.count() for model in (Room, Guest, Booking, Payment)},
+            },
+            'results': results,
+        }
+        output = options['output'] or os.path.join('benchmarks', f"{commit or datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+        if options['compare']:
+            self._compare(options['compare'], report)
+
+    def _compare(self, path, report):
+        with open(path) as f:
+            baseline = json.load(f)
+        self.stdout.write(f"\\nagainst {path} (commit {baseline['meta'].get('commit')}, rows {baseline['meta'].get('rows')})")
+        self.stdout.write(f"{'case':<26} {'p50 before':>11} {'p50 now':>9} {'change':>8}  queries")
+        for name, now in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                self.stdout.write(f"{name:<26} {'(new)':>11} {now['p50_ms']:>9.2f}")
+                continue
+            change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            self.stdout.write(
+                f"{name:<26} {before['p50_ms']:>11.2f} {now['p50_ms']:>9.2f} {change:>+7.1f}%  {before['queries']} -> {now['queries']}"
+            )
+""",
+    "concurrency_benchmark.py": """
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the sync views on the WSGI `serve` command and the async views on uvicorn (ASGI), "
+        "then run the same load_test against each, by default with 500 concurrent clients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per page and server")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes per server")
+        parser.add_argument('--pages', default='dashboard,availability,rooms,guests')
+        parser.add_argument('--port', type=int, default=8100, help="WSGI server port; ASGI uses the next one")
+
+    def _wait_for(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with {process.returncode} before accepting connections")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Nothing listening on port {port} after {timeout}s")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("The ASGI side needs uvicorn: pip install uvicorn")
+        project = settings.ROOT_URLCONF.split('.')[0]
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+        workers = str(options['workers'])
+        wsgi_port, asgi_port = options['port'], options['port'] + 1
+        servers = [
+            ('WSGI, sync views', wsgi_port, {'HOTEL_ASYNC_VIEWS': '0'},
+             [sys.executable, manage_py, 'serve', '--bind', f'127.0.0.1:{wsgi_port}', '--workers', workers]),
+            # asgi.py switches HOTEL_ASYNC_VIEWS on
+            ('ASGI, async views', asgi_port, {},
+             [sys.executable, '-m', 'uvicorn', f'{project}.asgi:application', '--port', str(asgi_port),
+              '--workers', workers, '--no-access-log', '--backlog', '2048', '--log-level', 'warning']),
+        ]
+
+        for label, port, extra_env, command in servers:
+            env = {**os.environ, 'DJANGO_DEBUG': '0', **extra_env}
+            process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+            try:
+                self._wait_for(port, process)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\\n{label}"))
+                call_command('load_test', url=f'http://127.0.0.1:{port}', concurrency=options['concurrency'],
+                             duration=options['duration'], pages=options['pages'], stdout=self.stdout)
+            finally:
+                process.terminate()
+                process.wait()
+""",
+    "pricing_benchmark.py": """
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel import pricing
+from hotel.models import Room, RatePlan
+
+
+class Command(BaseCommand):
+    help = (
+        "Time stay quotes through the precomputed price grid against evaluating the rate plans night by night, "
+        "and check that both give the same totals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', type=int, default=100000)
+        parser.add_argument('--max-nights', type=int, default=14)
+        parser.add_argument('--target', type=int, default=10000, help="Quotes per second the grid has to reach")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _evaluate_rules(self, plans_by_type, room, check_in, check_out):
+        total, day = 0, check_in
+        while day < check_out:
+            plan = pricing.plan_for(plans_by_type.get(room.room_type, ()), day)
+            total += pricing.to_cents(plan.nightly_price if plan else room.price)
+            day += pricing.ONE_DAY
+        return pricing.from_cents(total)
+
+    def handle(self, *args, **options):
+        rooms = list(Room.objects.all())
+        if not rooms:
+            raise CommandError("No rooms; run generate_data first.")
+        rng = random.Random(options['seed'])
+        today = date.today()
+        stays = []
+        for _ in range(options['quotes']):
+            check_in = today + timedelta(days=rng.randrange(365))
+            stays.append((rng.choice(rooms), check_in, check_in + timedelta(days=rng.randint(1, options['max_nights']))))
+
+        started = time.perf_counter()
+        pricing.engine.invalidate()
+        pricing.engine.ensure_loaded()
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        grid_totals = [pricing.quote(room, check_in, check_out) for room, check_in, check_out in stays]
+        grid_rate = len(stays) / (time.perf_counter() - started)
+
+        # Rule evaluation is much slower, so it is timed (and cross-checked) on a sample
+        plans_by_type = {}
+        for plan in RatePlan.objects.order_by('-priority', '-id'):
+            plans_by_type.setdefault(plan.room_type, []).append(plan)
+        sample = min(len(stays), 10000)
+        started = time.perf_counter()
+        rule_totals = [self._evaluate_rules(plans_by_type, room, check_in, check_out) for room, check_in, check_out in stays[:sample]]
+        rule_rate = sample / (time.perf_counter() - started)
+
+        mismatches = sum(1 for grid_total, rule_total in zip(grid_totals, rule_totals) if grid_total != rule_total)
+        self.stdout.write(f"{len(rooms)} rooms, {sum(map(len, plans_by_type.values()))} rate plans, "
+                          f"grid built in {build_ms:.1f} ms")
+        self.stdout.write(f"{'price grid':<18} {grid_rate:>10,.0f} quotes/sec")
+        self.stdout.write(f"{'rule evaluation':<18} {rule_rate:>10,.0f} quotes/sec")
+        if mismatches:
+            raise CommandError(f"{mismatches} of {sample} sampled quotes differ between the grid and the rules")
+        if grid_rate < options['target']:
+            raise CommandError(f"Below the target of {options['target']:,} quotes/sec")
+        self.stdout.write(self.style.SUCCESS(f"OK: {sample} sampled quotes match, target {options['target']:,} quotes/sec met"))
+""",
+}
+
+@step("9b", "Create management commands in hotel/management/commands/", parallel=True)
+def write_management_commands():
+    print(f"Creating management commands in: {commands_dir}")
+    try:
+        os.makedirs(commands_dir, exist_ok=True)
+        for package_dir in (os.path.join(app_name, "management"), commands_dir):
+            open(os.path.join(package_dir, "__init__.py"), 'a').close()
+    except Exception as e:
+        print(f"Error creating management command directory {commands_dir}: {e}")
+        sys.exit(1)
+
+    for filename, content in management_commands.items():
+        file_path = os.path.join(commands_dir, filename)
+        try:
+            write_file(file_path, content)
+            print(f"Created management command {file_path}.")
+        except Exception as e:
+            print(f"An error occurred while writing to {file_path}: {e}")
+            sys.exit(1)
+
+
+# --- Step 9c: Create the booking service in hotel/services.py ---
+services_file_path = os.path.join(app_name, "services.py")
+services_content = """
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import Room, Booking
+
+
+class BookingConflict(Exception):
+    \"\"\"Raised when the room already has a booking overlapping the requested dates.\"\"\"
+
+
+def _lock_room(room_id):
+    # Serialise writers per room so the overlap check and the insert cannot interleave.
+    if connection.features.has_select_for_update:
+        Room.objects.select_for_update().filter(pk=room_id).values_list('pk', flat=True).first()
+    else:
+        # SQLite has no row locks: a no-op UPDATE takes the database write lock up front,
+        # so the check below always sees every booking committed before it.
+        Room.objects.filter(pk=room_id).update(id=F('id'))
+
+
+def save_booking(booking):
+    \"\"\"
+    Insert or update a booking, refusing to double-book its room. Raises BookingConflict.
+
+    The room lock, the overlap check and the write run in one transaction, so concurrent
+    requests for the same room cannot both succeed. That is one transaction, not one
+    query. Inside it, a new booking takes the lock, the EXISTS check, the INSERT, and its
+    invoice INSERT, plus SELECTs of the room and rate plans when they are not loaded yet. An
+    update adds a SELECT of the old dates (hotel/dashboard.py) and reprices its invoice
+    with a single UPDATE. After the commit, the signal handlers bump the availability
+    generation and refresh the report rollups of the days the booking touches.
+    \"\"\"
+    with transaction.atomic():
+        _lock_room(booking.room_id)
+        overlapping_bookings = Booking.objects.filter(room_id=booking.room_id).overlapping(
+            booking.check_in_date, booking.check_out_date
+        )
+        if booking.pk:
+            overlapping_bookings = overlapping_bookings.exclude(pk=booking.pk)
+        message = f"Room {booking.room_id} is already booked for some part of the selected dates."
+        if overlapping_bookings.exists():
+            raise BookingConflict(message)
+        try:
+            booking.save()
+        except IntegrityError as e:
+            if 'booking_room_stay_excl' not in str(e): # PostgreSQL's exclusion constraint, the last line of defence
+                raise
+            raise BookingConflict(message) from e
+    return booking
+"""
+
+@step("9c", "Create the booking service in hotel/services.py", parallel=True)
+def write_booking_service():
+    print(f"Creating booking service at: {services_file_path}")
+    try:
+        write_file(services_file_path, services_content)
+        print("services.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to services.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9d: Write query-count regression tests in hotel/tests.py ---
+tests_file_path = os.path.join(app_name, "tests.py")
+tests_content = """
+import gzip
+import json
+import os
+import re
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from . import async_views, assets, availability, dashboard, instrumentation, invoicing, jobs, pricing, reports, room_status, search, warmup
+from .models import (
+    Room, RoomStatus, RoomStatusEvent, RatePlan, Guest, Booking, Payment, Service, ServiceCharge, InvoiceSummary, DailyRollup, Job,
+)
+from .services import BookingConflict, save_booking
+
+
+class QueryCountTests(TestCase):
+    \"\"\"Each view must issue a fixed number of queries no matter how many rows it shows.\"\"\"
+
+    @classmethod
+    def setUpTestData(cls):
+        rooms = Room.objects.bulk_create(
+            [Room(room_number=str(100 + i), room_type='single', price=100) for i in range(20)]
+        )
+        guests = Guest.objects.bulk_create(
+            [Guest(name=f"Guest {i}", contact_info=f"guest{i}@example.com") for i in range(20)]
+        )
+        start = date(2030, 1, 1)
+        Booking.objects.bulk_create([
+            Booking(guest=guests[i], room=rooms[i], check_in_date=start + timedelta(days=i),
+                    check_out_date=start + timedelta(days=i + 2), status='confirmed')
+            for i in range(20)
+        ])
+        cls.booking = Booking.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+        room_status.projection.invalidate()
+
+    def test_home(self):
+        # room-status projection, recent guests, recent bookings
+        with self.assertNumQueries(3):
+            self.client.get(reverse('home'))
+        # Served from the dashboard cache afterwards
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+
+    def test_home_cache_invalidated_on_booking_change(self):
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.save()
+        # Room counts still come from the loaded projection
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home'))
+
+    def test_booking_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('booking_list'))
+        self.assertContains(response, 'Guest 0')
+
+    def test_booking_detail(self):
+        # booking with its invoice summary, service choices for the charge form
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('booking_detail', kwargs={'pk': self.booking.pk}))
+        self.assertContains(response, self.booking.room.room_number)
+
+    def test_room_list(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('room_list'))
+
+    def test_guest_list(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('guest_list'))
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [room.id for room in Room.objects.bulk_create(
+            [Room(room_number=str(300 + i), room_type='single', price=100) for i in range(20)]
+        )]
+        if None in cls.ids: # Backends that don't return ids from bulk_create
+            cls.ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+
+    def page(self, **params):
+        return self.client.get(reverse('room_list'), params).context['page']
+
+    def ids_on(self, page):
+        return [room.id for room in page['object_list']]
+
+    def test_after_and_before_cursors_walk_every_row_once(self):
+        first = self.page(page_size=7)
+        self.assertEqual(self.ids_on(first), self.ids[:7])
+        self.assertIsNone(first['previous_cursor'])
+
+        second = self.page(page_size=7, after=first['next_cursor'])
+        third = self.page(page_size=7, after=second['next_cursor'])
+        self.assertEqual(self.ids_on(second) + self.ids_on(third), self.ids[7:])
+        self.assertIsNone(third['next_cursor'])
+        self.assertEqual(third['previous_cursor'], self.ids[14])
+
+        back = self.page(page_size=7, before=third['previous_cursor'])
+        self.assertEqual(self.ids_on(back), self.ids[7:14])
+        self.assertEqual((back['previous_cursor'], back['next_cursor']), (self.ids[7], self.ids[13]))
+        self.assertEqual(self.ids_on(self.page(page_size=7, before=back['previous_cursor'])), self.ids[:7])
+        self.assertIn('page_size=7', back['querystring'])
+        self.assertNotIn('before', back['querystring'])
+
+    def test_page_size_is_capped(self):
+        with mock.patch('hotel.views.MAX_PAGE_SIZE', 5):
+            self.assertEqual(len(self.page(page_size=10000)['object_list']), 5)
+        self.assertEqual(len(self.page(page_size=0)['object_list']), 1)
+        with self.settings(HOTEL_PAGE_SIZE=4):
+            self.assertEqual(len(self.page(page_size='lots')['object_list']), 4)
+
+    def test_tampered_cursors_fall_back_to_the_first_page(self):
+        for cursor in ('abc', '-1', '1.5', '1 OR 1=1', '', '%00'):
+            with self.subTest(cursor=cursor):
+                for direction in ('after', 'before'):
+                    response = self.client.get(reverse('room_list'), {direction: cursor, 'page_size': 3})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(self.ids_on(response.context['page']), self.ids[:3])
+        self.assertEqual(self.ids_on(self.page(after=self.ids[-1] + 1000)), []) # Past the end: empty, not an error
+
+
+class OccupancyCalendarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        room_status.projection.invalidate()
+        self.room = Room.objects.create(room_number='301', room_type='single', price=80)
+        Room.objects.create(room_number='302', room_type='single', price=80)
+        Room.objects.create(room_number='303', room_type='single', price=80, status='maintenance')
+        self.guest = Guest.objects.create(name="Calendar Guest", contact_info="cal@example.com")
+        self.booking = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 6, 29),
+                                              check_out_date=date(2030, 7, 2), status='confirmed')
+
+    def days(self, year, month):
+        return self.client.get(reverse('occupancy_calendar', kwargs={'year': year, 'month': month})).json()['days']
+
+    def test_counts_per_day(self):
+        days = self.days(2030, 7)
+        self.assertEqual(len(days), 31)
+        self.assertEqual(days[0], {'date': '2030-07-01', 'free': 1, 'booked': 1, 'maintenance': 1})
+        self.assertEqual(days[2]['booked'], 0)
+        self.assertEqual(self.days(2030, 6)[28]['booked'], 1)
+
+    def test_cached_until_a_booking_in_the_month_changes(self):
+        self.days(2030, 7)
+        with self.assertNumQueries(0):
+            self.days(2030, 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.check_in_date, self.booking.check_out_date = date(2030, 8, 1), date(2030, 8, 3)
+            self.booking.save()
+        self.assertEqual(self.days(2030, 7)[0]['booked'], 0)
+        self.assertEqual(self.days(2030, 8)[0]['booked'], 1)
+
+    def test_calendar_invalidation_survives_an_evicted_counter(self):
+        dashboard.invalidate_calendar()
+        before = dashboard._calendar_generation()
+        with mock.patch.object(dashboard._cache(), 'incr', side_effect=ValueError):
+            dashboard.invalidate_calendar()
+        self.assertNotEqual(dashboard._calendar_generation(), before)
+
+
+class AvailabilityBatchTests(TestCase):
+
+    def setUp(self):
+        availability.engine.invalidate()
+        room_status.projection.invalidate()
+        self.single = Room.objects.create(room_number='201', room_type='single', price=80)
+        self.double = Room.objects.create(room_number='202', room_type='double', price=120)
+        Room.objects.create(room_number='203', room_type='double', price=120, status='maintenance')
+        guest = Guest.objects.create(name="Batch Guest", contact_info="batch@example.com")
+        Booking.objects.create(guest=guest, room=self.double, check_in_date=date(2030, 5, 1),
+                               check_out_date=date(2030, 5, 4), status='confirmed')
+
+    def post(self, queries):
+        return self.client.post(reverse('room_availability_batch'), json.dumps({'queries': queries}),
+                                content_type='application/json')
+
+    def test_multiple_ranges_in_one_call(self):
+        response = self.post([
+            {'check_in': '2030-05-02', 'check_out': '2030-05-03'},
+            {'check_in': '2030-05-10', 'check_out': '2030-05-12', 'room_type': 'double'},
+            {'check_in': '2030-05-12', 'check_out': '2030-05-10'},
+        ])
+        first, second, third = response.json()['results']
+        self.assertEqual(first['free_count_by_type'], {'double': 0, 'single': 1})
+        self.assertEqual(first['room_ids']['single'], [self.single.id])
+        self.assertEqual(second['free_count'], 1)
+        self.assertIn('error', third)
+
+    def test_rejects_malformed_body(self):
+        response = self.client.post(reverse('room_availability_batch'), 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityIndexTests(TestCase):
+
+    def setUp(self):
+        availability.engine.invalidate()
+        self.room = Room.objects.create(room_number='204', room_type='single', price=80)
+        self.guest = Guest.objects.create(name="Index Guest", contact_info="index@example.com")
+
+    def test_room_interval_index(self):
+        index = availability.RoomIntervalIndex([(date(2030, 6, 1), date(2030, 6, 20), 1), (date(2030, 6, 3), date(2030, 6, 4), 2)])
+        self.assertTrue(index.overlaps(date(2030, 6, 10), date(2030, 6, 11))) # Inside the long stay, after the short one
+        self.assertTrue(index.overlaps(date(2030, 6, 20), date(2030, 6, 22))) # Check-out day counts
+        self.assertTrue(index.overlaps(date(2030, 5, 28), date(2030, 6, 1))) # So does check-in day
+        self.assertFalse(index.overlaps(date(2030, 6, 21), date(2030, 6, 25)))
+        self.assertFalse(index.overlaps(date(2030, 5, 1), date(2030, 5, 31)))
+
+        index.add(date(2030, 7, 1), date(2030, 7, 3), 3)
+        index.remove(date(2030, 6, 1), date(2030, 6, 20), 1)
+        index.remove(date(2030, 6, 3), date(2030, 6, 4), 99) # Unknown booking id: left alone
+        self.assertEqual(len(index), 2)
+        self.assertFalse(index.overlaps(date(2030, 6, 10), date(2030, 6, 11)))
+        self.assertTrue(index.overlaps(date(2030, 6, 4), date(2030, 6, 5)))
+        self.assertTrue(index.overlaps(date(2030, 7, 2), date(2030, 7, 2)))
+
+    def test_own_writes_update_the_index_in_place(self):
+        self.assertTrue(availability.is_room_free(self.room.id, date(2030, 6, 1), date(2030, 6, 3)))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 6, 1),
+                                             check_out_date=date(2030, 6, 3), status='confirmed')
+        with self.assertNumQueries(1): # The generation check; synced from the signal, not reloaded
+            self.assertEqual(availability.booked_room_ids(date(2030, 6, 2), date(2030, 6, 2)), {self.room.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.check_in_date, booking.check_out_date = date(2030, 6, 10), date(2030, 6, 12)
+            booking.save()
+        with self.assertNumQueries(2): # One generation check per lookup
+            self.assertTrue(availability.is_room_free(self.room.id, date(2030, 6, 1), date(2030, 6, 3)))
+            self.assertFalse(availability.is_room_free(self.room.id, date(2030, 6, 11), date(2030, 6, 11)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(availability.booked_room_ids(date(2030, 6, 1), date(2030, 6, 30)), set())
+
+    def test_writes_from_other_processes_trigger_a_reload(self):
+        self.assertTrue(availability.is_room_free(self.room.id, date(2030, 8, 1), date(2030, 8, 2)))
+        # Another worker's booking: this process gets no signal, only the bumped generation
+        Booking.objects.bulk_create([Booking(guest=self.guest, room=self.room, check_in_date=date(2030, 8, 1),
+                                             check_out_date=date(2030, 8, 2), status='confirmed')])
+        self.assertTrue(availability.is_room_free(self.room.id, date(2030, 8, 1), date(2030, 8, 2)))
+        availability.bump_generation()
+        self.assertFalse(availability.is_room_free(self.room.id, date(2030, 8, 1), date(2030, 8, 2)))
+
+        availability.bump_generation() # A write elsewhere between loading and our own write
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 8, 5),
+                                   check_out_date=date(2030, 8, 6), status='confirmed')
+        with self.assertNumQueries(2): # The generation check and the reload
+            self.assertFalse(availability.is_room_free(self.room.id, date(2030, 8, 5), date(2030, 8, 5)))
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        room = Room.objects.create(room_number='401', room_type='suite', price=300)
+        guest = Guest.objects.create(name="Export Guest", contact_info="export@example.com")
+        for day in (1, 15):
+            Booking.objects.create(guest=guest, room=room, check_in_date=date(2030, 3, day),
+                                   check_out_date=date(2030, 3, day + 2), status='confirmed')
+
+    def test_csv_with_date_filter(self):
+        response = self.client.get(reverse('export_data', kwargs={'kind': 'bookings'}), {'start': '2030-03-10'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,guest_id,guest_name,room_number,room_type,check_in_date,check_out_date,status')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('2030-03-15', lines[1])
+
+    def test_gzipped_json(self):
+        response = self.client.get(reverse('export_data', kwargs={'kind': 'bookings'}), {'format': 'json', 'gzip': '1'})
+        rows = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([row['check_in_date'] for row in rows], ['2030-03-01', '2030-03-15'])
+
+
+class ReportTests(TestCase):
+
+    def setUp(self):
+        pricing.engine.invalidate()
+        self.room = Room.objects.create(room_number='501', room_type='deluxe', price=200)
+        Room.objects.create(room_number='502', room_type='deluxe', price=200)
+        self.guest = Guest.objects.create(name="Report Guest", contact_info="report@example.com")
+
+    def test_rollups_follow_bookings_and_payments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 9, 1),
+                                             check_out_date=date(2030, 9, 4), status='confirmed')
+        self.assertEqual(DailyRollup.objects.get(date=date(2030, 9, 3), room_type='deluxe').occupied_rooms, 1)
+        self.assertEqual(DailyRollup.objects.get(date=date(2030, 9, 4), room_type='deluxe').occupied_rooms, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.check_in_date, booking.check_out_date = date(2030, 9, 10), date(2030, 9, 12)
+            booking.save()
+        self.assertEqual(DailyRollup.objects.get(date=date(2030, 9, 1), room_type='deluxe').occupied_rooms, 0)
+
+        reports.fill_gaps(date(2030, 9, 1), date(2030, 9, 30))
+        line, = reports.report(date(2030, 9, 1), date(2030, 9, 30))
+        self.assertEqual(line['occupied_room_nights'], 2)
+        self.assertEqual(line['revenue'], Decimal('400.00'))
+        self.assertEqual(line['adr'], Decimal('200.00'))
+        self.assertEqual(line['revpar'], Decimal('6.67')) # 400 over 2 rooms x 30 nights, quiet days included
+
+    def test_rebuild_matches_raw_aggregation(self):
+        Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 10, 1),
+                               check_out_date=date(2030, 10, 3), status='confirmed')
+        DailyRollup.objects.all().delete()
+        reports.rebuild(date(2030, 10, 1), date(2030, 10, 31))
+        self.assertEqual(DailyRollup.objects.filter(date__month=10).count(), 31)
+        response = self.client.get(reverse('reports'), {'start': '2030-10-01', 'end': '2030-10-31'})
+        self.assertContains(response, '400.00')
+
+    def test_revenue_is_priced_with_the_rate_plans(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RatePlan.objects.create(name="Deluxe festival", room_type='deluxe', nightly_price=260,
+                                    start_date=date(2031, 1, 2), end_date=date(2031, 1, 2))
+        self.assertTrue(Job.objects.filter(task='rebuild_reports', status='queued').exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2031, 1, 1),
+                                   check_out_date=date(2031, 1, 4), status='confirmed')
+        revenue = dict(DailyRollup.objects.filter(room_type='deluxe').values_list('date', 'room_revenue'))
+        self.assertEqual([revenue[date(2031, 1, day)] for day in (1, 2, 3)], [200, 260, 200])
+        self.assertEqual(InvoiceSummary.objects.get().room_charges, sum(revenue.values())) # Same rates as the invoice
+
+    def test_report_reads_only_rollups_and_queues_the_gaps(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 11, 1),
+                                   check_out_date=date(2030, 11, 2), status='confirmed')
+        stored = DailyRollup.objects.count()
+        with mock.patch.object(reports, 'compute_rollups', side_effect=AssertionError("report aggregated raw tables")):
+            line, = reports.report(date(2030, 11, 1), date(2030, 11, 30))
+            response = self.client.get(reverse('reports'), {'start': '2030-11-01', 'end': '2030-11-30'})
+        self.assertEqual((line['occupied_room_nights'], line['revpar']), (1, Decimal('50.00'))) # Nov 1-2 only
+        self.assertEqual(reports.missing_ranges(date(2030, 11, 1), date(2030, 11, 30)), [(date(2030, 11, 3), date(2030, 11, 30))])
+        self.assertContains(response, 'Not yet computed')
+        self.assertEqual(DailyRollup.objects.count(), stored)
+
+        self.client.post(reverse('job_create'), {'task': 'rebuild_reports', 'gaps_only': '1',
+                                                 'start': '2030-11-01', 'end': '2030-11-30'})
+        job = Job.objects.get(task='rebuild_reports')
+        self.assertEqual(job.params, {'start': '2030-11-01', 'end': '2030-11-30', 'gaps_only': True})
+        jobs.work_off()
+        line, = reports.report(date(2030, 11, 1), date(2030, 11, 30))
+        self.assertEqual((line['occupied_room_nights'], line['revpar']), (1, Decimal('3.33')))
+        self.assertNotContains(self.client.get(reverse('reports'), {'start': '2030-11-01', 'end': '2030-11-30'}), 'Not yet computed')
+
+    def test_refresh_upserts_and_failures_after_commit_are_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 12, 1),
+                                             check_out_date=date(2030, 12, 3), status='confirmed')
+        self.assertEqual(reports.refresh(date(2030, 12, 1), date(2030, 12, 3)), 3)
+        self.assertEqual(DailyRollup.objects.filter(date__month=12).count(), 3)
+
+        with mock.patch.object(reports, 'refresh', side_effect=IntegrityError("duplicate key")):
+            with self.assertLogs('hotel.reports', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                booking.status = 'cancelled'
+                booking.save()
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'cancelled')
+
+
+class GuestSearchTests(TestCase):
+
+    def setUp(self):
+        self.anna = Guest.objects.create(name="Anna Schmidt", contact_info="anna@example.com")
+        self.hans = Guest.objects.create(name="Hans Anders", contact_info="+49 30 1234")
+        self.jose = Guest.objects.create(name="José Álvarez", contact_info="jose@example.org")
+
+    def test_prefix_and_ranking(self):
+        # Exact and name matches rank ahead of prefix-only ones
+        self.assertEqual(search.search_guest_ids("ann"), [self.anna.id])
+        self.assertEqual(search.search_guest_ids("an")[:1], [self.anna.id])
+        self.assertEqual(search.search_guest_ids("hans 1234"), [self.hans.id])
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(search.search_guest_ids("jose alv"), [self.jose.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hans.name = "Johann Anders"
+            self.hans.save()
+            self.anna.delete()
+        self.assertEqual(search.search_guest_ids("hans"), [])
+        self.assertEqual(search.search_guest_ids("johann"), [self.hans.id])
+        self.assertEqual(search.search_guest_ids("schmidt"), [])
+
+    def test_guest_list_uses_index(self):
+        response = self.client.get(reverse('guest_list'), {'q': 'alvarez'})
+        self.assertContains(response, "José Álvarez")
+        self.assertNotContains(response, "Anna Schmidt")
+
+    def test_search_bench_rolls_back_its_guests(self):
+        stdout = StringIO()
+        call_command('guest_search_bench', guests=200, queries=2, batch_size=50, stdout=stdout)
+        self.assertIn("Creating 197 synthetic guests", stdout.getvalue())
+        self.assertEqual(Guest.objects.count(), 3)
+        self.assertEqual(search.search_guest_ids("guest1"), [])
+
+
+class StaticPipelineTests(TestCase):
+
+    def test_minify_css(self):
+        css = "/* sidebar */\\n.sidebar > ul li,\\n.sidebar a :hover {\\n    color: #fff;\\n    margin: 0 auto;\\n}\\n"
+        self.assertEqual(assets.minify_css(css), ".sidebar>ul li,.sidebar a :hover{color:#fff;margin:0 auto}")
+
+    def test_serves_precompressed_variant_with_immutable_lifetime(self):
+        factory = RequestFactory()
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            data = b"body{color:red}" * 100
+            for name in ('site.0123456789ab.css', 'site.css'):
+                with open(os.path.join(root, name), 'wb') as f:
+                    f.write(data)
+                assets.compress_file(os.path.join(root, name))
+
+            response = assets.serve_static(factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'), 'site.0123456789ab.css')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), data)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+            response = assets.serve_static(factory.get('/'), 'site.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(b''.join(response.streaming_content), data)
+            self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_cached_sidebar_still_marks_the_current_page(self):
+        cache.clear()
+        active_rooms_link = 'class="active"><i class="fas fa-bed"></i>'
+        self.assertContains(self.client.get(reverse('room_list')), active_rooms_link)
+        self.assertNotContains(self.client.get(reverse('guest_list')), active_rooms_link)
+        self.assertContains(self.client.get(reverse('room_list')), active_rooms_link)
+
+
+class TemplateWarmupTests(TestCase):
+
+    def test_warm_pages_render_without_reading_templates(self):
+        warmup.reset()
+        templates, patterns, _ = warmup.warm()
+        self.assertGreater(templates, 10)
+        self.assertGreater(patterns, 10)
+        with mock.patch('django.template.loaders.app_directories.Loader.get_contents') as get_contents:
+            self.assertEqual(self.client.get(reverse('room_list')).status_code, 200)
+        get_contents.assert_not_called()
+
+    def test_cached_sidebar_is_keyed_by_build(self):
+        cache.clear()
+        for build in ('build-1', 'build-2'):
+            with self.settings(HOTEL_BUILD_ID=build):
+                self.client.get(reverse('room_list'))
+            self.assertIsNotNone(cache.get(make_template_fragment_key('sidebar_nav', [build, 'room_list'])))
+
+
+@override_settings(HOTEL_INSTRUMENTATION=True, HOTEL_SLOW_QUERY_MS=0)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        instrumentation.registry.clear()
+        Room.objects.create(room_number='601', room_type='single', price=90)
+
+    def test_metrics_per_url_name(self):
+        with self.assertLogs('hotel.slow_queries', 'WARNING') as logs:
+            response = self.client.get(reverse('room_list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('SELECT', logs.output[0])
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        worker = instrumentation.worker_id()
+        self.assertIn(f'hotel_request_duration_seconds_bucket{{view="room_list",method="GET",worker="{worker}",le="+Inf"}} 1', body)
+        self.assertIn(f'hotel_request_duration_seconds_count{{view="room_list",method="GET",worker="{worker}"}} 1', body)
+        self.assertIn(f'hotel_requests_total{{view="room_list",method="GET",worker="{worker}",status="200"}} 1', body)
+        self.assertRegex(body, r'hotel_db_queries_total\\{view="room_list",method="GET",worker="[^"]+"\\} [1-9]')
+
+    def test_metrics_cover_every_worker(self):
+        # What another worker process would have published to the shared cache
+        other = (list(range(len(instrumentation.LATENCY_BUCKETS) + 1)), 3, 0.3, 9, 0.01, 0, {200: 3})
+        cache.set(instrumentation.WORKER_KEY.format('other:1'), {('room_list', 'GET'): other})
+        cache.set(instrumentation.WORKERS_KEY, ['gone:2', 'other:1'])
+        with self.assertLogs('hotel.slow_queries', 'WARNING'):
+            self.client.get(reverse('room_list'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('hotel_requests_total{view="room_list",method="GET",worker="other:1",status="200"} 3', body)
+        self.assertIn(f'worker="{instrumentation.worker_id()}"', body)
+        self.assertNotIn('gone:2', body)
+        self.assertNotIn('gone:2', cache.get(instrumentation.WORKERS_KEY))
+
+    @override_settings(HOTEL_INSTRUMENTATION=False)
+    def test_off_by_default(self):
+        response = self.client.get(reverse('room_list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.booked = Room.objects.create(room_number='801', room_type='double', price=120)
+        Room.objects.create(room_number='802', room_type='double', price=120)
+        guest = Guest.objects.create(name='Grace Hopper', contact_info='grace@example.com')
+        Booking.objects.create(guest=guest, room=cls.booked, check_in_date=date(2030, 6, 1),
+                               check_out_date=date(2030, 6, 4), status='confirmed')
+
+    def setUp(self):
+        cache.clear()
+        availability.engine.invalidate()
+        room_status.projection.invalidate()
+
+    async def get(self, name, params=None):
+        request = AsyncRequestFactory().get(reverse(name), params or {})
+        request.resolver_match = resolve(request.path)
+        return await getattr(async_views, name)(request)
+
+    async def test_read_pages(self):
+        self.assertContains(await self.get('home'), 'Grace Hopper')
+        self.assertContains(await self.get('room_list'), '802')
+        self.assertContains(await self.get('guest_list', {'q': 'grac'}), 'grace@example.com')
+
+    async def test_availability_excludes_booked_rooms(self):
+        response = await self.get('room_availability', {'check_in_date': '2030-06-03', 'check_out_date': '2030-06-05'})
+        self.assertContains(response, '1 rooms available')
+        self.assertNotContains(response, '<td>801</td>')
+        self.assertContains(await self.get('room_availability'), 'all available rooms (2)')
+
+
+class BookingOverlapTests(TestCase):
+
+    def test_both_end_days_count(self):
+        room = Room.objects.create(room_number='701', room_type='single', price=90)
+        guest = Guest.objects.create(name='Ada Lovelace', contact_info='ada@example.com')
+        booking = Booking.objects.create(guest=guest, room=room, check_in_date=date(2030, 5, 10),
+                                         check_out_date=date(2030, 5, 12), status='confirmed')
+        self.assertEqual(list(Booking.objects.overlapping(date(2030, 5, 12), date(2030, 5, 14))), [booking])
+        self.assertEqual(list(Booking.objects.overlapping(date(2030, 5, 8), date(2030, 5, 10))), [booking])
+        self.assertFalse(Booking.objects.overlapping(date(2030, 5, 13), date(2030, 5, 15)).exists())
+        self.assertFalse(Booking.objects.filter(room_id=room.id + 1).overlapping(date(2030, 5, 10), date(2030, 5, 11)).exists())
+
+    @skipUnless(connection.vendor == 'sqlite', "Checks SQLite's plan wording")
+    def test_query_plans_compare_with_indexes_off(self):
+        room = Room.objects.create(room_number='703', room_type='single', price=90)
+        guest = Guest.objects.create(name='Ada Lovelace', contact_info='ada@example.com')
+        Booking.objects.create(guest=guest, room=room, check_in_date=date(2030, 7, 10),
+                               check_out_date=date(2030, 7, 12), status='confirmed')
+        stdout = StringIO()
+        call_command('query_plans', check_in='2030-07-11', repeat=1, stdout=stdout)
+        output = stdout.getvalue()
+        with_indexes, _, without = output.partition('indexes disabled')
+        self.assertIn('USING INDEX booking_room_dates_idx', with_indexes)
+        self.assertIn('SCAN hotel_booking', without)
+        self.assertNotIn('USING INDEX booking_room_dates_idx', without.partition('\\n\\n')[0])
+        self.assertEqual(output.count('indexes disabled'), 3)
+
+    @skipUnless(connection.vendor == 'postgresql', "The exclusion constraint exists on PostgreSQL only")
+    def test_database_refuses_double_bookings(self):
+        room = Room.objects.create(room_number='702', room_type='single', price=90)
+        guest = Guest.objects.create(name='Ada Lovelace', contact_info='ada@example.com')
+        Booking.objects.create(guest=guest, room=room, check_in_date=date(2030, 6, 10),
+                               check_out_date=date(2030, 6, 12), status='confirmed')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            # bulk_create skips save_booking(), so only the constraint stands in the way
+            Booking.objects.bulk_create([Booking(guest=guest, room=room, check_in_date=date(2030, 6, 12),
+                                                 check_out_date=date(2030, 6, 13), status='pending')])
+        Booking.objects.bulk_create([
+            Booking(guest=guest, room=room, check_in_date=date(2030, 6, 11), check_out_date=date(2030, 6, 13), status='cancelled'),
+            Booking(guest=guest, room=room, check_in_date=date(2030, 6, 13), check_out_date=date(2030, 6, 14), status='pending'),
+        ])
+        self.assertEqual(room.booking_set.count(), 3)
+
+
+class SaveBookingTests(TestCase):
+
+    def setUp(self):
+        self.room = Room.objects.create(room_number='703', room_type='single', price=90)
+        self.guest = Guest.objects.create(name='Grace Hopper', contact_info='grace@example.com')
+        self.booking = save_booking(Booking(guest=self.guest, room=self.room, check_in_date=date(2030, 7, 10),
+                                            check_out_date=date(2030, 7, 12), status='confirmed'))
+
+    def book(self, check_in, check_out, room=None):
+        return save_booking(Booking(guest=self.guest, room=room or self.room, check_in_date=check_in,
+                                    check_out_date=check_out, status='confirmed'))
+
+    def test_overlapping_stays_are_refused(self):
+        for check_in, check_out in [(date(2030, 7, 11), date(2030, 7, 11)), (date(2030, 7, 8), date(2030, 7, 10)),
+                                    (date(2030, 7, 12), date(2030, 7, 14)), (date(2030, 7, 1), date(2030, 7, 31))]:
+            with self.subTest(check_in=check_in, check_out=check_out), self.assertRaises(BookingConflict):
+                self.book(check_in, check_out)
+        self.book(date(2030, 7, 13), date(2030, 7, 15))
+        self.book(date(2030, 7, 10), date(2030, 7, 12), room=Room.objects.create(room_number='704', room_type='single', price=90))
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_update_does_not_conflict_with_itself(self):
+        self.booking.check_out_date = date(2030, 7, 14)
+        save_booking(self.booking)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).check_out_date, date(2030, 7, 14))
+
+        other = self.book(date(2030, 7, 20), date(2030, 7, 22))
+        other.check_in_date = date(2030, 7, 14)
+        with self.assertRaises(BookingConflict):
+            save_booking(other)
+        self.assertEqual(Booking.objects.get(pk=other.pk).check_in_date, date(2030, 7, 20))
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+
+    def test_parallel_bookings_of_one_room_never_overlap(self):
+        stdout = StringIO()
+        # Rollup refreshes would only add more contention on the test database's shared in-memory cache
+        with mock.patch.object(reports, '_refresh_after_commit'):
+            call_command('booking_stress', workers=8, attempts=40, rounds=4, stdout=stdout, stderr=StringIO())
+        self.assertIn("No double bookings.", stdout.getvalue())
+        booked, refused, lock_failed = map(int, re.search(
+            r"(\\d+) booked, (\\d+) refused as overlapping, (\\d+) lock failures", stdout.getvalue()
+        ).groups())
+        self.assertLessEqual(booked, 4)
+        self.assertEqual(booked + refused + lock_failed, 40)
+
+
+class PricingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.engine.invalidate()
+        pricing.engine.invalidate()
+        room_status.projection.invalidate()
+        self.addCleanup(pricing.engine.invalidate)
+        today = date.today()
+        self.monday = today + timedelta(days=7 - today.weekday()) # Inside the price grid
+        self.room = Room.objects.create(room_number='901', room_type='single', price=100)
+        RatePlan.objects.create(name='Weekend', room_type='single', nightly_price=150, weekdays='45')
+        RatePlan.objects.create(name='Festival', room_type='single', nightly_price=200, priority=1,
+                                start_date=self.monday + timedelta(days=7), end_date=self.monday + timedelta(days=13))
+        RatePlan.objects.create(name='Suite weekend', room_type='suite', nightly_price=500, weekdays='56')
+
+    def quote(self, first, last):
+        return pricing.quote(self.room, self.monday + timedelta(days=first), self.monday + timedelta(days=last))
+
+    def test_plans_by_weekday_and_priority(self):
+        # Mon-Thu and Sun at the room price, Fri and Sat at the weekend rate
+        self.assertEqual(self.quote(0, 7), Decimal('800.00'))
+        # Sat, Sun, then the festival outranks everything (including its own weekend)
+        self.assertEqual(self.quote(5, 9), Decimal('650.00'))
+        self.assertEqual(self.quote(11, 13), Decimal('400.00'))
+        self.assertEqual(self.quote(3, 3), Decimal('0.00'))
+
+    def test_grid_matches_night_by_night_rules(self):
+        stays = [(first, first + nights) for first in range(0, 20, 3) for nights in (1, 2, 5, 9)]
+        from_grid = [self.quote(first, last) for first, last in stays]
+        with override_settings(HOTEL_PRICING_HORIZON_DAYS=0):
+            pricing.engine.invalidate()
+            self.assertEqual([self.quote(first, last) for first, last in stays], from_grid)
+
+    def test_grid_rebuilt_when_a_plan_changes(self):
+        self.assertEqual(self.quote(0, 1), Decimal('100.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            RatePlan.objects.create(name='Mondays', room_type='single', nightly_price=90, weekdays='0')
+        self.assertEqual(self.quote(0, 1), Decimal('90.00'))
+
+    def test_availability_page_shows_stay_totals(self):
+        response = self.client.get(reverse('room_availability'), {
+            'check_in_date': self.monday.isoformat(), 'check_out_date': (self.monday + timedelta(days=7)).isoformat(),
+        })
+        self.assertContains(response, 'Total for 7 nights')
+        self.assertContains(response, '<td>800.00</td>')
+
+
+class RoomStatusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.engine.invalidate()
+        room_status.projection.invalidate()
+        self.rooms = [Room.objects.create(room_number=f"{floor}0{number}", room_type='single', price=90)
+                      for floor in (4, 5) for number in (1, 2, 3)]
+
+    def test_transitions_follow_the_state_machine_and_are_logged(self):
+        room = self.rooms[0]
+        room_status.transition(room, RoomStatus.OCCUPIED, note='Checked in')
+        room_status.transition(room, RoomStatus.DIRTY)
+        with self.assertRaises(room_status.InvalidTransition):
+            room_status.transition(room, RoomStatus.OCCUPIED)
+        room.refresh_from_db()
+        self.assertEqual(room.status, RoomStatus.DIRTY)
+        self.assertEqual(list(room.status_events.order_by('id').values_list('from_status', 'to_status', 'note')), [
+            ('', 'available', ''), ('available', 'occupied', 'Checked in'), ('occupied', 'dirty', ''),
+        ])
+        with self.assertRaises(ValueError):
+            room.status_events.first().save()
+
+    def test_batch_transition_costs_the_same_for_any_number_of_rooms(self):
+        def queries(rooms):
+            with CaptureQueriesContext(connection) as captured:
+                room_status.transition_many(Room.objects.filter(id__in=[room.id for room in rooms]), RoomStatus.DIRTY)
+            return len(captured)
+        self.assertEqual(queries(self.rooms[:1]), queries(self.rooms[1:]))
+        self.assertEqual(RoomStatusEvent.objects.filter(to_status=RoomStatus.DIRTY).count(), 6)
+
+    def test_history_outlives_the_room(self):
+        room = self.rooms[0]
+        room_status.transition(room, RoomStatus.MAINTENANCE, note='Leak')
+        room.delete()
+        self.assertEqual(list(RoomStatusEvent.objects.filter(room_number='401').order_by('id').values_list(
+            'room', 'from_status', 'to_status', 'note'
+        )), [(None, '', 'available', ''), (None, 'available', 'maintenance', 'Leak')])
+
+    def test_bulk_created_rooms_get_their_first_event(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rooms.csv')
+            with open(path, 'w') as f:
+                f.write('room_number,room_type,price,status\\n601,single,90,available\\n602,double,120,maintenance\\n')
+            call_command('import_data', 'rooms', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(sorted(RoomStatusEvent.objects.filter(note='Imported').values_list('room__room_number', 'to_status')),
+                         [('601', 'available'), ('602', 'maintenance')])
+
+    def test_floor_transition_skips_rooms_that_cannot_move(self):
+        room_status.transition_many(Room.objects.filter(room_number__in=['401', '402']), RoomStatus.DIRTY)
+        room_status.transition(self.rooms[2], RoomStatus.OCCUPIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = room_status.transition_floor('4', RoomStatus.AVAILABLE, note='Floor cleaned')
+        self.assertEqual(sorted(changed), [self.rooms[0].id, self.rooms[1].id])
+        self.assertEqual(room_status.counts()[RoomStatus.OCCUPIED], 1)
+
+    def test_availability_and_dashboard_read_the_projection(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room_status.transition(self.rooms[0], RoomStatus.MAINTENANCE)
+            room_status.transition(self.rooms[1], RoomStatus.OCCUPIED)
+            room_status.transition(self.rooms[2], RoomStatus.DIRTY)
+        self.client.get(reverse('room_availability'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('room_availability'))
+        # Dirty rooms can still be sold; occupied and maintenance rooms can't
+        self.assertContains(response, 'all available rooms (4)')
+        self.assertNotContains(response, '<td>401</td>')
+        self.assertContains(response, '<td>403</td>')
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['available_rooms_count'], 3)
+        self.assertIn(('Maintenance', 1), response.context['room_status_counts'])
+
+    def test_room_form_and_housekeeping_page(self):
+        room = self.rooms[0]
+        url = reverse('room_update', kwargs={'pk': room.pk})
+        data = {'room_number': room.room_number, 'room_type': 'single', 'price': '90', 'status': 'occupied'}
+        self.client.post(url, data)
+        self.assertEqual(room.status_events.latest('id').to_status, 'occupied')
+        self.assertEqual(self.client.post(url, {**data, 'status': 'cleaning'}).status_code, 200) # Form error
+        self.client.post(reverse('housekeeping'), {'to_status': 'dirty', 'floor': '5', 'note': 'Checked out'})
+        self.assertEqual(set(Room.objects.filter(room_number__startswith='5').values_list('status', flat=True)), {'dirty'})
+        self.assertEqual(Room.objects.get(pk=room.pk).status, 'occupied')
+
+
+class InvoicingTests(TestCase):
+
+    def setUp(self):
+        pricing.engine.invalidate()
+        self.room = Room.objects.create(room_number='601', room_type='single', price=100)
+        self.guest = Guest.objects.create(name='Ines Larsen', contact_info='ines@example.com')
+        self.spa = Service.objects.create(name='Spa', description='Spa treatment', price=40)
+        self.booking = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 3, 4),
+                                              check_out_date=date(2030, 3, 7), status='confirmed')
+
+    def invoice(self):
+        return InvoiceSummary.objects.get(booking=self.booking)
+
+    def test_balance_is_room_nights_plus_services_minus_payments(self):
+        self.assertEqual((self.invoice().nights, self.invoice().balance), (3, Decimal('300.00')))
+        ServiceCharge.objects.create(booking=self.booking, service=self.spa, quantity=2, unit_price=40)
+        Payment.objects.create(booking=self.booking, amount=150, payment_method='card')
+        invoice = self.invoice()
+        self.assertEqual((invoice.room_charges, invoice.service_charges, invoice.payments, invoice.balance),
+                         (Decimal('300.00'), Decimal('80.00'), Decimal('150.00'), Decimal('230.00')))
+        Payment.objects.filter(booking=self.booking).first().delete()
+        self.assertEqual(self.invoice().balance, Decimal('380.00'))
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self.assertEqual(self.invoice().balance, Decimal('80.00'))
+
+    def test_edited_booking_is_repriced_in_one_update(self):
+        Payment.objects.create(booking=self.booking, amount=100, payment_method='card')
+        self.booking.check_out_date = date(2030, 3, 9)
+        with self.assertNumQueries(1):
+            invoicing.reprice(self.booking)
+        invoice = self.invoice()
+        self.assertEqual((invoice.nights, invoice.room_charges, invoice.payments, invoice.balance),
+                         (5, Decimal('500.00'), Decimal('100.00'), Decimal('400.00')))
+        InvoiceSummary.objects.all().delete()
+        invoicing.reprice(self.booking) # No summary yet, so a full refresh
+        self.assertEqual(self.invoice().balance, Decimal('400.00'))
+
+    def test_rebuild_matches_the_signal_maintained_rows(self):
+        ServiceCharge.objects.create(booking=self.booking, service=self.spa, quantity=1, unit_price=40)
+        Payment.objects.create(booking=self.booking, amount=300, payment_method='cash')
+        RatePlan.objects.create(name='Spring', room_type='single', nightly_price=120,
+                                start_date=date(2030, 3, 1), end_date=date(2030, 3, 31))
+        pricing.engine.invalidate()
+        invoicing.refresh(self.booking)
+        fields = ('nights', 'room_charges', 'service_charges', 'payments', 'balance')
+        expected = InvoiceSummary.objects.values_list(*fields).get()
+        self.assertEqual(expected[1], Decimal('360.00'))
+        self.assertEqual(invoicing.rebuild(), 1)
+        self.assertEqual(InvoiceSummary.objects.values_list(*fields).get(), expected)
+        self.booking.delete()
+        self.assertFalse(InvoiceSummary.objects.exists())
+
+    def test_invoice_pages(self):
+        paid = Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 4, 1),
+                                      check_out_date=date(2030, 4, 2), status='confirmed')
+        Payment.objects.create(booking=paid, amount=100, payment_method='card')
+        response = self.client.get(reverse('invoice_list'))
+        self.assertEqual([invoice.booking_id for invoice in response.context['invoices']], [self.booking.id])
+        self.assertEqual(response.context['outstanding'], {'total': Decimal('300.00'), 'count': 1})
+        self.assertEqual(len(self.client.get(reverse('invoice_list'), {'show': 'all'}).context['invoices']), 2)
+        self.client.post(reverse('booking_add_service', kwargs={'pk': self.booking.pk}), {'service': self.spa.pk, 'quantity': 1})
+        response = self.client.get(reverse('invoice_detail', kwargs={'pk': self.booking.pk}))
+        self.assertContains(response, 'INV-%d' % self.booking.pk)
+        self.assertContains(response, '340.00')
+
+    def test_batch_rendering_writes_one_file_per_invoice(self):
+        with tempfile.TemporaryDirectory() as directory:
+            progress = []
+            written = invoicing.render_invoices([self.booking.id], directory, batch_size=1, progress=progress.append)
+            self.assertEqual((written, progress, os.listdir(directory)), (1, [1], [f"INV-{self.booking.id}.html"]))
+        self.client.post(reverse('invoice_render'), {'scope': 'open', 'format': 'html'})
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.params), ('render_invoices', {'scope': 'open', 'file_format': 'html'}))
+        with tempfile.TemporaryDirectory() as directory, override_settings(HOTEL_INVOICE_DIR=directory):
+            self.assertEqual(jobs.work_off(), 1)
+            self.assertEqual(os.listdir(directory), [f"INV-{self.booking.id}.html"])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress_done, job.progress_total, job.result['invoices']), ('done', 1, 1, 1))
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(jobs.TASKS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        @jobs.task('flaky', "Flaky test task", max_attempts=3)
+        def flaky(progress, fail_times=0):
+            self.calls.append(progress.job.attempts)
+            progress(len(self.calls), 3)
+            if len(self.calls) <= fail_times:
+                raise RuntimeError("Temporary failure")
+            return {'calls': len(self.calls)}
+
+    def test_failed_attempts_are_retried_until_max_attempts(self):
+        job = jobs.enqueue('flaky', fail_times=1)
+        with override_settings(HOTEL_JOB_RETRY_DELAY=3600), self.assertLogs('hotel.jobs', 'ERROR'):
+            jobs.work_off()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertIn("Temporary failure", job.error)
+            self.assertIsNone(jobs.claim('test')) # Not due until the retry delay has passed
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        jobs.work_off()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result, self.calls), ('done', 2, {'calls': 2}, [1, 2]))
+
+        failing = jobs.enqueue('flaky', fail_times=10)
+        with override_settings(HOTEL_JOB_RETRY_DELAY=0), self.assertLogs('hotel.jobs', 'ERROR') as logs:
+            jobs.work_off()
+        self.assertEqual(len(logs.records), 3)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('failed', 3))
+        self.assertEqual(jobs.retry(failing), 1)
+        self.assertEqual(Job.objects.get(pk=failing.pk).status, 'queued')
+
+    def test_a_job_is_claimed_once_and_stale_jobs_are_requeued(self):
+        job = jobs.enqueue('flaky')
+        self.assertEqual(jobs.claim('worker-a').pk, job.pk)
+        self.assertIsNone(jobs.claim('worker-b'))
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=job.created_at - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('worker-b').worker, 'worker-b')
+
+    def test_job_pages_and_export_download(self):
+        Booking.objects.create(guest=Guest.objects.create(name='Jonas Novak', contact_info='jonas@example.com'),
+                               room=Room.objects.create(room_number='701', room_type='single', price=80),
+                               check_in_date=date(2030, 5, 1), check_out_date=date(2030, 5, 3), status='confirmed')
+        with tempfile.TemporaryDirectory() as directory, override_settings(HOTEL_JOB_OUTPUT_DIR=directory):
+            response = self.client.post(reverse('job_create'), {'task': 'export', 'kind': 'bookings', 'file_format': 'csv'})
+            job = Job.objects.get(task='export')
+            self.assertRedirects(response, reverse('job_detail', kwargs={'pk': job.pk}))
+            self.assertEqual(self.client.get(reverse('job_progress', kwargs={'pk': job.pk})).json()['status'], 'queued')
+            jobs.work_off()
+            self.assertTrue(self.client.get(reverse('job_progress', kwargs={'pk': job.pk})).json()['finished'])
+            response = self.client.get(reverse('job_download', kwargs={'pk': job.pk}))
+            self.assertIn(b'Jonas Novak', b''.join(response.streaming_content))
+            response.close()
+        job.refresh_from_db()
+        self.client.post(reverse('job_create'), {'task': 'rebuild_reports'})
+        self.client.post(reverse('job_create'), {'task': 'flaky'}) # Only maintenance tasks and exports can be queued here
+        response = self.client.get(reverse('job_list'))
+        self.assertEqual([title for _, title in response.context['jobs']], ["Rebuild report rollups", "Export for accounting"])
+        self.assertIn(('queued', 'Queued', 1), response.context['status_counts'])
+        self.assertContains(self.client.get(reverse('job_detail', kwargs={'pk': job.pk})), job.result['filename'])
+
+
+class ImportDataTests(TestCase):
+
+    def setUp(self):
+        self.room = Room.objects.create(room_number='801', room_type='double', price=150)
+        self.guest = Guest.objects.create(name="Import Guest", contact_info="import@example.com")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_csv(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write('\\n'.join(lines) + '\\n')
+        return path
+
+    def import_data(self, kind, path, **options):
+        stderr = StringIO()
+        call_command('import_data', kind, path, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_bookings_refresh_report_rollups(self):
+        path = self.write_csv('bookings.csv', [
+            'guest,room,check_in_date,check_out_date,status',
+            f'{self.guest.pk},{self.room.pk},2031-02-01,2031-02-03,confirmed',
+            f'{self.guest.pk},{self.room.pk},2031-02-10,2031-02-11,confirmed',
+        ])
+        self.import_data('bookings', path)
+        occupied = dict(DailyRollup.objects.filter(room_type='double').values_list('date', 'occupied_rooms'))
+        self.assertEqual(min(occupied), date(2031, 2, 1))
+        self.assertEqual(max(occupied), date(2031, 2, 11))
+        self.assertEqual(sum(occupied.values()), 3)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        path = self.write_csv('rooms.csv', [
+            'room_number,room_type,price,status',
+            '802,single,90,available',
+            '803,single,not a price,available',
+            '802,double,120,available',
+            '804,suite,300,occupied',
+        ])
+        errors = self.import_data('rooms', path)
+        self.assertIn('Line 3:', errors)
+        self.assertIn('price', errors)
+        self.assertIn('Line 4: Duplicate room_number 802 in file', errors)
+        self.assertEqual(sorted(Room.objects.values_list('room_number', flat=True)), ['801', '802', '804'])
+
+    def test_overlapping_bookings_are_rejected(self):
+        Booking.objects.create(guest=self.guest, room=self.room, check_in_date=date(2031, 3, 1),
+                               check_out_date=date(2031, 3, 5), status='confirmed')
+        path = self.write_csv('bookings.csv', [
+            'guest,room,check_in_date,check_out_date,status',
+            f'{self.guest.pk},{self.room.pk},2031-03-05,2031-03-07,confirmed', # Touches the existing stay
+            f'{self.guest.pk},{self.room.pk},2031-03-10,2031-03-12,confirmed',
+            f'{self.guest.pk},{self.room.pk},2031-03-12,2031-03-14,confirmed', # Touches the row above
+            f'{self.guest.pk},{self.room.pk},2031-03-15,2031-03-16,confirmed',
+        ])
+        errors = self.import_data('bookings', path)
+        self.assertEqual([line.split(':')[0] for line in errors.splitlines()], ['Line 2', 'Line 4'])
+        self.assertEqual(sorted(self.room.booking_set.values_list('check_in_date', flat=True)),
+                         [date(2031, 3, 1), date(2031, 3, 10), date(2031, 3, 15)])
+
+    def test_resume_after_a_strict_stop(self):
+        lines = ['name,contact_info'] + [f'Guest {i},guest{i}@example.com' for i in range(3)] + [',missing name']
+        path = self.write_csv('guests.csv', lines + ['Guest 4,guest4@example.com'])
+        with self.assertRaisesMessage(CommandError, 'Stopped at invalid line 5'):
+            self.import_data('guests', path, strict=True, batch_size=2)
+        with open(path + '.import-state.json') as f:
+            self.assertEqual(json.load(f), {'line': 4}) # Every row before the bad one was committed
+        self.assertEqual(Guest.objects.count(), 4)
+
+        self.write_csv('guests.csv', lines[:4] + ['Guest 3,guest3@example.com', 'Guest 4,guest4@example.com'])
+        self.import_data('guests', path, resume=True, batch_size=2)
+        self.assertEqual(sorted(Guest.objects.exclude(pk=self.guest.pk).values_list('name', flat=True)),
+                         [f'Guest {i}' for i in range(5)])
+        self.assertFalse(os.path.exists(path + '.import-state.json'))
+
+
+class BenchmarkDataTests(TestCase):
+
+    def test_generated_bookings_never_overlap(self):
+        call_command('generate_data', rooms=5, guests=40, bookings=120, staff=3, stdout=StringIO())
+        self.assertEqual((Room.objects.count(), Guest.objects.count(), Booking.objects.count()), (5, 40, 120))
+        self.assertEqual(RoomStatusEvent.objects.filter(from_status='', note='Generated').count(), 5)
+        payment = Payment.objects.select_related('booking').first()
+        self.assertEqual(payment.payment_date.date(), payment.booking.check_in_date) # Dated at check-in, not load time
+        self.assertTrue(Payment._meta.get_field('payment_date').auto_now_add)
+        self.assertEqual(InvoiceSummary.objects.count(), 120)
+        for room in Room.objects.all():
+            stays = list(room.booking_set.exclude(status='cancelled').order_by('check_in_date').values_list('check_in_date', 'check_out_date'))
+            for (_, previous_out), (next_in, _) in zip(stays, stays[1:]):
+                self.assertGreater(next_in, previous_out)
+
+    def test_benchmark_writes_every_case(self):
+        call_command('generate_data', rooms=3, guests=10, bookings=20, staff=1, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command('benchmark', iterations=1, warmup=0, output=output, stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(report['meta']['rows']['Booking'], 20)
+        self.assertIn('booking_create', report['results'])
+        for name, result in report['results'].items():
+            self.assertLess(result['status'], 400, name)
+        self.assertGreater(report['results']['booking_create']['queries'], 0)
+        self.assertEqual(Booking.objects.count(), 20)
+
+
+class TokenIndexSearchTests(GuestSearchTests):
+    \"\"\"Same behaviour from the pure-Python fallback used without FTS5.\"\"\"
+
+    def setUp(self):
+        patcher = mock.patch.object(search, 'fts_enabled', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(search.token_index.invalidate)
+        super().setUp()
+        search.token_index.reload()
+"""
+
+@step("9d", "Write query-count regression tests in hotel/tests.py", parallel=True)
+def write_tests():
+    print(f"Creating tests at: {tests_file_path}")
+    try:
+        write_file(tests_file_path, tests_content)
+        print("tests.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to tests.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9e: Create the dashboard stats cache in hotel/dashboard.py ---
+dashboard_file_path = os.path.join(app_name, "dashboard.py")
+dashboard_content = """
+import calendar
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import room_status
+from .models import Room, RoomStatus, Guest, Booking
+
+STATS_KEY = 'hotel:dashboard:stats'
+HITS_KEY = 'hotel:dashboard:hits'
+MISSES_KEY = 'hotel:dashboard:misses'
+CALENDAR_GENERATION_KEY = 'hotel:calendar:generation'
+
+
+def _cache():
+    # Any configured cache alias can back the dashboard (locmem, Redis, Memcached...)
+    return caches[getattr(settings, 'HOTEL_DASHBOARD_CACHE', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'HOTEL_DASHBOARD_CACHE_TTL', 60)
+
+
+def _count(key):
+    cache = _cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError: # Evicted between add() and incr()
+            cache.add(key, 1, timeout=None)
+
+
+def room_counts(counts):
+    \"\"\"Dashboard figures from the room-status projection, which is cheaper to read than the cache.\"\"\"
+    return {
+        'available_rooms_count': counts[RoomStatus.AVAILABLE],
+        'room_status_counts': [(label, counts[value]) for value, label in RoomStatus.choices],
+    }
+
+
+def compute_stats():
+    return {
+        'recent_guests': list(Guest.objects.order_by('-id')[:5]), # Get 5 most recent guests
+        'recent_bookings': list(Booking.objects.only('id', 'check_in_date').order_by('-id')[:5]), # Get 5 most recent bookings
+    }
+
+
+def get_stats():
+    \"\"\"Return the dashboard context, computing and caching it on a miss.\"\"\"
+    stats = _cache().get(STATS_KEY)
+    if stats is not None:
+        _count(HITS_KEY)
+    else:
+        _count(MISSES_KEY)
+        stats = compute_stats()
+        _cache().set(STATS_KEY, stats, _ttl())
+    return {**stats, **room_counts(room_status.counts())}
+
+
+async def _acount(key):
+    # incr() first: every async cache call is a hop to a worker thread, and the key almost always exists
+    cache = _cache()
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+async def acompute_stats():
+    return {
+        'recent_guests': [guest async for guest in Guest.objects.order_by('-id')[:5]],
+        'recent_bookings': [booking async for booking in Booking.objects.only('id', 'check_in_date').order_by('-id')[:5]],
+    }
+
+
+async def aget_stats():
+    \"\"\"get_stats() for async views, through the cache's and the ORM's async API.\"\"\"
+    stats = await _cache().aget(STATS_KEY)
+    if stats is not None:
+        await _acount(HITS_KEY)
+    else:
+        await _acount(MISSES_KEY)
+        stats = await acompute_stats()
+        await _cache().aset(STATS_KEY, stats, _ttl())
+    return {**stats, **room_counts(await room_status.acounts())}
+
+
+def invalidate():
+    _cache().delete(STATS_KEY)
+
+
+def _calendar_generation():
+    # Bumped whenever a room changes, which affects every month at once
+    return _cache().get_or_set(CALENDAR_GENERATION_KEY, 0, timeout=None)
+
+
+def _calendar_key(year, month):
+    return f'hotel:calendar:{_calendar_generation()}:{year}-{month:02d}'
+
+
+def compute_month_occupancy(year, month):
+    first_day = date(year, month, 1)
+    days_in_month = calendar.monthrange(year, month)[1]
+    last_day = first_day + timedelta(days=days_in_month - 1)
+
+    rooms_by_status = room_status.counts()
+    total_rooms = sum(rooms_by_status.values())
+    maintenance = rooms_by_status[RoomStatus.MAINTENANCE]
+
+    # One query for every booking touching the month, then a linear sweep over a difference array.
+    # Same rule as room_availability: a room is taken from its check-in through its check-out day.
+    bookings = Booking.objects.overlapping(first_day, last_day).exclude(room__status=RoomStatus.MAINTENANCE).order_by(
+        'room_id', 'check_in_date'
+    ).values_list('room_id', 'check_in_date', 'check_out_date')
+    delta = [0] * (days_in_month + 1)
+
+    def mark(start, end):
+        delta[(max(start, first_day) - first_day).days] += 1
+        delta[(min(end, last_day) - first_day).days + 1] -= 1
+
+    # Merge each room's intervals first so a room is never counted twice on one day
+    current_room, run_start, run_end = None, None, None
+    for room_id, check_in, check_out in bookings:
+        if room_id == current_room and check_in <= run_end:
+            run_end = max(run_end, check_out)
+            continue
+        if current_room is not None:
+            mark(run_start, run_end)
+        current_room, run_start, run_end = room_id, check_in, check_out
+    if current_room is not None:
+        mark(run_start, run_end)
+
+    days, booked = [], 0
+    for offset in range(days_in_month):
+        booked += delta[offset]
+        days.append({
+            'date': (first_day + timedelta(days=offset)).isoformat(),
+            'free': total_rooms - maintenance - booked,
+            'booked': booked,
+            'maintenance': maintenance,
+        })
+    return days
+
+
+def month_occupancy(year, month):
+    \"\"\"Cached per-day occupancy for a month; dropped when a booking in that month changes.\"\"\"
+    key = _calendar_key(year, month)
+    days = _cache().get(key)
+    if days is None:
+        days = compute_month_occupancy(year, month)
+        _cache().set(key, days, getattr(settings, 'HOTEL_CALENDAR_CACHE_TTL', 3600))
+    return days
+
+
+def _months_between(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def invalidate_months(check_in, check_out):
+    _cache().delete_many([_calendar_key(year, month) for year, month in _months_between(check_in, check_out)])
+
+
+def invalidate_calendar():
+    cache = _cache()
+    if not cache.add(CALENDAR_GENERATION_KEY, 1, timeout=None):
+        try:
+            cache.incr(CALENDAR_GENERATION_KEY)
+        except ValueError: # Evicted between add() and incr(); a clock value cannot match a generation still cached
+            cache.set(CALENDAR_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def cache_counters():
+    cache = _cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+
+@receiver([post_save, post_delete], sender=Guest)
+@receiver([post_save, post_delete], sender=Booking)
+def _dashboard_data_changed(sender, **kwargs):
+    # Drop the cached stats once the change is visible to other requests
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_save, sender=Booking)
+def _remember_booking_dates(sender, instance, **kwargs):
+    # An edit can move a booking out of a month, so that month must be refreshed too.
+    # hotel/reports.py reads the same attribute to refresh the rollups of the old dates.
+    instance._previous_stay_dates = None
+    if instance.pk:
+        instance._previous_stay_dates = Booking.objects.filter(pk=instance.pk).values_list(
+            'check_in_date', 'check_out_date'
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def _booking_calendar_changed(sender, instance, **kwargs):
+    ranges = [(instance.check_in_date, instance.check_out_date)]
+    previous_dates = getattr(instance, '_previous_stay_dates', None)
+    if previous_dates:
+        ranges.append(previous_dates)
+    transaction.on_commit(lambda: [invalidate_months(check_in, check_out) for check_in, check_out in ranges])
+
+
+@receiver([post_save, post_delete], sender=Room)
+def _room_calendar_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_calendar)
+
+
+@receiver(room_status.statuses_changed)
+def _room_statuses_changed(sender, **kwargs):
+    # Sent after the batch transition has committed; rooms going in or out of maintenance change every month
+    invalidate_calendar()
+"""
+
+@step("9e", "Create the dashboard stats cache in hotel/dashboard.py", parallel=True)
+def write_dashboard_cache():
+    print(f"Creating dashboard stats cache at: {dashboard_file_path}")
+    try:
+        write_file(dashboard_file_path, dashboard_content)
+        print("dashboard.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to dashboard.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9f: Create the guest search index in hotel/search.py ---
+search_file_path = os.path.join(app_name, "search.py")
+search_content = """
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from threading import RLock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Guest
+
+# FTS5 table created by the guest_search_index migration on SQLite builds that support it
+FTS_TABLE = 'hotel_guest_fts'
+TOKEN_RE = re.compile(r'\\w+')
+
+_fts_enabled = None
+
+
+def tokenize(text):
+    \"\"\"Lower-case, accent-stripped word tokens, matching FTS5's unicode61 tokenizer.\"\"\"
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return [token for token in TOKEN_RE.findall(stripped.lower()) if token != '_']
+
+
+def fts_enabled():
+    global _fts_enabled
+    if _fts_enabled is None:
+        _fts_enabled = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_enabled
+
+
+class TokenIndex:
+    \"\"\"
+    Pure-Python inverted index used when FTS5 is not available: token -> guest ids,
+    plus a sorted vocabulary so prefix terms expand with a bisect.
+    \"\"\"
+
+    def __init__(self):
+        self._lock = RLock()
+        self._postings = {}
+        self._documents = {} # guest_id -> tokens it was indexed under
+        self._vocabulary = []
+        self._loaded_at = None
+
+    def _ttl(self):
+        return getattr(settings, 'HOTEL_GUEST_SEARCH_INDEX_TTL', 300)
+
+    def reload(self):
+        with self._lock:
+            self._postings, self._documents, self._vocabulary = {}, {}, []
+            rows = Guest.objects.values_list('id', 'name', 'contact_info')
+            for guest_id, name, contact_info in rows.iterator(chunk_size=5000):
+                tokens = set(tokenize(name) + tokenize(contact_info))
+                self._documents[guest_id] = tokens
+                for token in tokens:
+                    self._postings.setdefault(token, set()).add(guest_id)
+            self._vocabulary = sorted(self._postings)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl():
+            self.reload()
+
+    def remove(self, guest_id):
+        with self._lock:
+            for token in self._documents.pop(guest_id, ()):
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.discard(guest_id)
+                if not postings:
+                    del self._postings[token]
+                    position = bisect_left(self._vocabulary, token)
+                    if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                        del self._vocabulary[position]
+
+    def add(self, guest_id, name, contact_info):
+        with self._lock:
+            if self._loaded_at is None:
+                return # Nothing loaded yet; the first search reads the current table
+            self.remove(guest_id)
+            tokens = set(tokenize(name) + tokenize(contact_info))
+            self._documents[guest_id] = tokens
+            for token in tokens:
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    insort(self._vocabulary, token)
+                self._postings[token].add(guest_id)
+
+    def _expand(self, term):
+        position = bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            yield self._vocabulary[position]
+            position += 1
+
+    def search(self, terms, limit):
+        with self._lock:
+            self._ensure_loaded()
+            scores = None
+            for term in terms:
+                # Exact token matches rank above prefix matches; every term must match
+                term_scores = {}
+                for token in self._expand(term):
+                    weight = 2 if token == term else 1
+                    for guest_id in self._postings[token]:
+                        if weight > term_scores.get(guest_id, 0):
+                            term_scores[guest_id] = weight
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {guest_id: scores[guest_id] + weight for guest_id, weight in term_scores.items() if guest_id in scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [guest_id for guest_id, score in ranked[:limit]]
+
+
+token_index = TokenIndex()
+
+
+def search_guest_ids(query, limit=100):
+    \"\"\"Ids of guests whose name or contact info has a word starting with every query term, best first.\"\"\"
+    terms = tokenize(query)
+    if not terms:
+        return []
+    if not fts_enabled():
+        return token_index.search(terms, limit)
+    # Terms are plain word characters, so quoting them is enough to keep FTS syntax out
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s", # Name hits outrank contact-info hits
+            [match, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_guests(query, limit=100):
+    guest_ids = search_guest_ids(query, limit)
+    guests = Guest.objects.in_bulk(guest_ids)
+    return [guests[guest_id] for guest_id in guest_ids if guest_id in guests]
+
+
+async def asearch_guests(query, limit=100):
+    # The FTS5 lookup is raw SQL (and the fallback index may reload), so it runs in the ORM's thread
+    guest_ids = await sync_to_async(search_guest_ids)(query, limit)
+    guests = await Guest.objects.ain_bulk(guest_ids)
+    return [guests[guest_id] for guest_id in guest_ids if guest_id in guests]
+
+
+def rebuild():
+    \"\"\"Re-index every guest, e.g. after rows were loaded with bulk_create (which sends no signals).\"\"\"
+    if fts_enabled():
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}(rowid, name, contact_info) SELECT id, name, contact_info FROM hotel_guest")
+    else:
+        token_index.reload()
+
+
+@receiver(post_save, sender=Guest)
+def _guest_saved(sender, instance, **kwargs):
+    if fts_enabled():
+        # Written in the same transaction as the guest row
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [instance.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, contact_info) VALUES (%s, %s, %s)",
+                [instance.pk, instance.name, instance.contact_info]
+            )
+    else:
+        transaction.on_commit(lambda: token_index.add(instance.pk, instance.name, instance.contact_info))
+
+
+@receiver(post_delete, sender=Guest)
+def _guest_deleted(sender, instance, **kwargs):
+    guest_id = instance.pk
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [guest_id])
+    else:
+        transaction.on_commit(lambda: token_index.remove(guest_id))
+"""
+
+@step("9f", "Create the guest search index in hotel/search.py", parallel=True)
+def write_guest_search():
+    print(f"Creating guest search index at: {search_file_path}")
+    try:
+        write_file(search_file_path, search_content)
+        print("search.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to search.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9g: Create streaming exports in hotel/exports.py ---
+exports_file_path = os.path.join(app_name, "exports.py")
+exports_content = """
+import csv
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Booking, Payment
+
+CHUNK_SIZE = 2000
+
+# Columns per export: (header, ORM path), read with values_list so no model instances are built
+EXPORTS = {
+    'bookings': {
+        'columns': [
+            ('id', 'id'),
+            ('guest_id', 'guest_id'),
+            ('guest_name', 'guest__name'),
+            ('room_number', 'room__room_number'),
+            ('room_type', 'room__room_type'),
+            ('check_in_date', 'check_in_date'),
+            ('check_out_date', 'check_out_date'),
+            ('status', 'status'),
+        ],
+        'date_filters': ('check_in_date__gte', 'check_in_date__lte'),
+        'queryset': lambda: Booking.objects.all(),
+    },
+    'payments': {
+        'columns': [
+            ('id', 'id'),
+            ('booking_id', 'booking_id'),
+            ('amount', 'amount'),
+            ('payment_method', 'payment_method'),
+            ('payment_date', 'payment_date'),
+        ],
+        'date_filters': ('payment_date__date__gte', 'payment_date__date__lte'),
+        'queryset': lambda: Payment.objects.all(),
+    },
+}
+
+
+def export_rows(kind, start=None, end=None):
+    \"\"\"Yield tuples for one export, streamed from the database in CHUNK_SIZE batches.\"\"\"
+    spec = EXPORTS[kind]
+    queryset = spec['queryset']()
+    start_lookup, end_lookup = spec['date_filters']
+    if start:
+        queryset = queryset.filter(**{start_lookup: start})
+    if end:
+        queryset = queryset.filter(**{end_lookup: end})
+    paths = [path for header, path in spec['columns']]
+    return queryset.order_by('id').values_list(*paths).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _csv_chunks(kind, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, path in EXPORTS[kind]['columns']])
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_chunks(kind, rows):
+    headers = [header for header, path in EXPORTS[kind]['columns']]
+    encoder = DjangoJSONEncoder()
+    parts = ['[']
+    for count, row in enumerate(rows):
+        parts.append((',' if count else '') + encoder.encode(dict(zip(headers, row))))
+        if len(parts) >= CHUNK_SIZE:
+            yield ''.join(parts)
+            parts = []
+    parts.append(']')
+    yield ''.join(parts)
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31) # 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(kind, file_format='csv', start=None, end=None, compress=False):
+    \"\"\"Stream an export as text chunks, or gzip-compressed byte chunks when compress is set.\"\"\"
+    rows = export_rows(kind, start, end)
+    chunks = _json_chunks(kind, rows) if file_format == 'json' else _csv_chunks(kind, rows)
+    return _gzip_chunks(chunks) if compress else chunks
+"""
+
+@step("9g", "Create streaming exports in hotel/exports.py", parallel=True)
+def write_exports():
+    print(f"Creating exports at: {exports_file_path}")
+    try:
+        write_file(exports_file_path, exports_content)
+        print("exports.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to exports.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9h: Create the reporting engine in hotel/reports.py ---
+reports_file_path = os.path.join(app_name, "reports.py")
+reports_content = """
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import pricing
+from .models import Room, RoomStatus, Booking, Payment, RatePlan, DailyRollup
+
+logger = logging.getLogger(__name__)
+
+ONE_DAY = timedelta(days=1)
+
+
+def compute_rollups(start, end):
+    \"\"\"
+    Aggregate occupancy, room revenue and payments per (date, room_type) for start..end
+    straight from the raw tables. A booking occupies the nights from check-in up to the
+    day before check-out and earns each of them at the nightly rate the rate plans give
+    (the room's own price where none applies), the same rate quotes and invoices use.
+    \"\"\"
+    available = dict(
+        Room.objects.exclude(status=RoomStatus.MAINTENANCE).values_list('room_type').annotate(total=Count('id')).order_by()
+    )
+    rows = {}
+
+    def row(day, room_type):
+        key = (day, room_type)
+        if key not in rows:
+            rows[key] = {'available_rooms': available.get(room_type, 0), 'occupied_rooms': 0,
+                         'room_revenue': Decimal('0'), 'payments_collected': Decimal('0')}
+        return rows[key]
+
+    day = start
+    while day <= end:
+        for room_type in available:
+            row(day, room_type)
+        day += ONE_DAY
+
+    grid = pricing.grid_between(start, end)
+    stays = Booking.objects.filter(
+        check_in_date__lte=end, check_out_date__gt=start
+    ).exclude(status='cancelled').values_list('check_in_date', 'check_out_date', 'room__room_type', 'room__price')
+    for check_in, check_out, room_type, price in stays.iterator(chunk_size=5000):
+        base_cents = pricing.to_cents(price)
+        day, last_night = max(check_in, start), min(check_out - ONE_DAY, end)
+        while day <= last_night:
+            current = row(day, room_type)
+            current['occupied_rooms'] += 1
+            current['room_revenue'] += pricing.from_cents(grid.quote_cents(room_type, base_cents, day, day + ONE_DAY))
+            day += ONE_DAY
+
+    payments = Payment.objects.filter(payment_date__date__gte=start, payment_date__date__lte=end).values_list(
+        'payment_date__date', 'booking__room__room_type'
+    ).annotate(total=Sum('amount')).order_by()
+    for day, room_type, total in payments:
+        row(day, room_type)['payments_collected'] += total
+    return rows
+
+
+def refresh(start, end):
+    \"\"\"
+    Recompute the rollup rows for start..end. Rows are upserted rather than deleted and
+    inserted again, so concurrent refreshes of the same days (two bookings committing at
+    once) both succeed instead of one failing on the unique (date, room_type) constraint.
+    available_rooms is a snapshot of the rooms not in maintenance when the refresh runs,
+    not that day's own count: room status history is not replayed, so refreshing past
+    days restates their capacity with today's rooms.
+    \"\"\"
+    rows = compute_rollups(start, end)
+    with transaction.atomic():
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(date=day, room_type=room_type, **values) for (day, room_type), values in rows.items()],
+            batch_size=1000, update_conflicts=True, unique_fields=['date', 'room_type'],
+            update_fields=['available_rooms', 'occupied_rooms', 'room_revenue', 'payments_collected'],
+        )
+        # Room types with no rooms or stays left on a day
+        existing = DailyRollup.objects.filter(date__gte=start, date__lte=end).values_list('id', 'date', 'room_type')
+        stale = [rollup_id for rollup_id, day, room_type in existing if (day, room_type) not in rows]
+        if stale:
+            DailyRollup.objects.filter(id__in=stale).delete()
+    return len(rows)
+
+
+def rebuild(start=None, end=None, chunk_days=31, progress=None):
+    \"\"\"Rebuild every rollup (or those in start..end) in month-sized chunks.\"\"\"
+    if start is None or end is None:
+        bounds = [
+            Booking.objects.order_by('check_in_date').values_list('check_in_date', flat=True).first(),
+            Booking.objects.order_by('-check_out_date').values_list('check_out_date', flat=True).first(),
+            Payment.objects.order_by('payment_date').values_list('payment_date__date', flat=True).first(),
+            Payment.objects.order_by('-payment_date').values_list('payment_date__date', flat=True).first(),
+        ]
+        known = [bound for bound in bounds if bound]
+        if not known:
+            return 0
+        start, end = start or min(known), end or max(known)
+    total, chunk_start = 0, start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        total += refresh(chunk_start, chunk_end)
+        if progress:
+            progress(chunk_end, total)
+        chunk_start = chunk_end + ONE_DAY
+    return total
+
+
+def missing_ranges(start, end):
+    \"\"\"(first, last) day ranges in start..end that have no rollups yet (e.g. quiet days never refreshed).\"\"\"
+    present = set(DailyRollup.objects.filter(date__gte=start, date__lte=end).values_list('date', flat=True).distinct())
+    ranges, gap_start, day = [], None, start
+    while day <= end + ONE_DAY:
+        missing = day <= end and day not in present
+        if missing and gap_start is None:
+            gap_start = day
+        elif not missing and gap_start is not None:
+            ranges.append((gap_start, day - ONE_DAY))
+            gap_start = None
+        day += ONE_DAY
+    return ranges
+
+
+def fill_gaps(start, end):
+    \"\"\"Compute and store the rollups of the days in start..end that have none yet. Returns the row count.\"\"\"
+    return sum(refresh(first, last) for first, last in missing_ranges(start, end))
+
+
+def report(start, end, group_by='month'):
+    \"\"\"
+    Occupancy, ADR, RevPAR and payments per period and room type, read from the rollups
+    only. Days without rollups are left out; missing_ranges() lists them so the view can
+    say so and offer a `rebuild_reports` job that fills them in.
+    \"\"\"
+    rollups = DailyRollup.objects.filter(date__gte=start, date__lte=end)
+    if group_by == 'month':
+        rollups = rollups.annotate(period=TruncMonth('date'))
+        period = 'period'
+    else:
+        period = 'date'
+    totals = {
+        (total[period], total['room_type']): total
+        for total in rollups.values(period, 'room_type').annotate(
+            room_nights=Sum('available_rooms'),
+            occupied=Sum('occupied_rooms'),
+            revenue=Sum('room_revenue'),
+            payments=Sum('payments_collected'),
+        ).order_by()
+    }
+
+    cents = Decimal('0.01')
+    lines = []
+    for (period_start, room_type), total in sorted(totals.items()):
+        revenue = (total['revenue'] or Decimal('0')).quantize(cents)
+        lines.append({
+            'period': period_start,
+            'room_type': room_type,
+            'occupied_room_nights': total['occupied'],
+            'occupancy': round(100 * total['occupied'] / total['room_nights'], 1) if total['room_nights'] else None,
+            'revenue': revenue,
+            'adr': (revenue / total['occupied']).quantize(cents) if total['occupied'] else None,
+            'revpar': (revenue / total['room_nights']).quantize(cents) if total['room_nights'] else None,
+            'payments': (total['payments'] or Decimal('0')).quantize(cents),
+        })
+    return lines
+
+
+# Incremental upkeep: refresh only the days a changed booking or payment touches
+@receiver([post_save, post_delete], sender=Booking)
+def _booking_changed(sender, instance, **kwargs):
+    ranges = [(instance.check_in_date, instance.check_out_date)]
+    previous_dates = getattr(instance, '_previous_stay_dates', None) # Set by hotel/dashboard.py
+    if previous_dates:
+        ranges.append(previous_dates)
+    transaction.on_commit(lambda: _refresh_after_commit(ranges))
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def _payment_changed(sender, instance, **kwargs):
+    if instance.payment_date:
+        day = instance.payment_date.date()
+        transaction.on_commit(lambda: _refresh_after_commit([(day, day)]))
+
+
+@receiver([post_save, post_delete], sender=RatePlan)
+def _rate_plan_changed(sender, **kwargs):
+    # A plan can reprice nights across years of stays, so the rollups are rebuilt by a worker
+    from . import jobs # jobs imports this module
+    transaction.on_commit(lambda: jobs.enqueue('rebuild_reports'))
+
+
+def _coalesce(ranges):
+    # A booking moved by a few days touches two overlapping ranges; their union is refreshed once
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _refresh_after_commit(ranges):
+    # The booking or payment is already committed, so a failure here must not turn its request into an error
+    for start, end in _coalesce(ranges):
+        try:
+            refresh(start, end)
+        except Exception:
+            logger.exception("Could not refresh the report rollups for %s..%s; run rebuild_rollups to repair them", start, end)
+"""
+
+@step("9h", "Create the reporting engine in hotel/reports.py", parallel=True)
+def write_reports():
+    print(f"Creating reporting engine at: {reports_file_path}")
+    try:
+        write_file(reports_file_path, reports_content)
+        print("reports.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to reports.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9i: Create the static asset pipeline in hotel/assets.py ---
+assets_file_path = os.path.join(app_name, "assets.py")
+assets_content = """
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError: # Optional: only gzip variants are written without it
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map')
+# ManifestStaticFilesStorage inserts a 12-character content hash before the extension
+HASHED_NAME = re.compile(r'\\.[0-9a-f]{12}\\.[^/.]+$')
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def minify_css(css):
+    \"\"\"Drop comments and the whitespace a browser does not need.\"\"\"
+    css = re.sub(r'/\\*.*?\\*/', '', css, flags=re.S)
+    css = re.sub(r'\\s+', ' ', css)
+    css = re.sub(r'\\s*([{};,>])\\s*', r'\\1', css)
+    css = re.sub(r':\\s+', ':', css) # Not before ':', where a space separates a descendant pseudo-class
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def compress_file(path):
+    \"\"\"Write .gz (and .br when brotli is installed) next to `path` if they save bytes.\"\"\"
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        if os.path.exists(path + suffix):
+            continue # Hashed names are content-addressed, so an existing variant is current
+        compressed = compress()
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    \"\"\"
+    Manifest storage that minifies the hashed CSS and writes precompressed
+    variants of every hashed text asset at collectstatic time.
+    \"\"\"
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # The hash is taken from the source file, so the minified copy keeps a stable name
+        for hashed_name in set(self.hashed_files.values()):
+            path = self.path(hashed_name)
+            if hashed_name.endswith('.css'):
+                with open(path, encoding='utf-8') as f:
+                    css = f.read()
+                minified = minify_css(css)
+                if minified != css:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(minified)
+            if hashed_name.endswith(COMPRESSIBLE):
+                compress_file(path)
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name # Not collected yet (fresh checkout, test runs): use the plain name
+
+
+def serve_static(request, path):
+    \"\"\"
+    Serve a collected file, preferring a precompressed variant the client accepts.
+
+    Hashed names never change content, so they get a one-year immutable lifetime;
+    everything else revalidates after HOTEL_STATIC_MAX_AGE seconds.
+    \"\"\"
+    fullpath = safe_join(settings.STATIC_ROOT, path)
+    if not os.path.isfile(fullpath):
+        raise Http404(f"{path} not found")
+    served, encoding = fullpath, None
+    accepted = request.headers.get('Accept-Encoding', '')
+    for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if name in accepted and os.path.isfile(fullpath + suffix):
+            served, encoding = fullpath + suffix, name
+            break
+
+    mtime = os.stat(served).st_mtime
+    if not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+        response.headers['Last-Modified'] = http_date(mtime)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if HASHED_NAME.search(path):
+        patch_cache_control(response, public=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'HOTEL_STATIC_MAX_AGE', 3600))
+    return response
+"""
+
+@step("9i", "Create the static asset pipeline in hotel/assets.py", parallel=True)
+def write_assets():
+    print(f"Creating static asset pipeline at: {assets_file_path}")
+    try:
+        write_file(assets_file_path, assets_content)
+        print("assets.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to assets.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9j: Create the template and URL warm-up in hotel/warmup.py ---
+warmup_file_path = os.path.join(app_name, "warmup.py")
+warmup_content = """
+import os
+import time
+
+from django.apps import apps
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import URLResolver, clear_url_caches, get_resolver
+
+
+def template_names():
+    \"\"\"Every template shipped with the hotel app, as loader names ('hotel/base.html', ...).\"\"\"
+    root = os.path.join(apps.get_app_config('hotel').path, 'templates')
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.html'):
+                yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+
+
+def _compile_patterns(resolver):
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex # Compiled lazily on first access and kept on the pattern
+        if isinstance(pattern, URLResolver):
+            count += _compile_patterns(pattern)
+        else:
+            count += 1
+    return count
+
+
+def warm():
+    \"\"\"
+    Compile every hotel template into the cached loader and build the URL
+    resolver, so the first request after start-up does not pay for it.
+    Returns (templates, url patterns, seconds).
+    \"\"\"
+    started = time.perf_counter()
+    names = list(template_names())
+    for name in names:
+        get_template(name)
+    resolver = get_resolver()
+    resolver.reverse_dict # Populates the reverse lookup tables
+    patterns = _compile_patterns(resolver)
+    return len(names), patterns, time.perf_counter() - started
+
+
+def reset():
+    \"\"\"Forget compiled templates and the URL resolver (used to measure a cold start).\"\"\"
+    for engine in engines.all():
+        for loader in engine.engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+    clear_url_caches()
+"""
+
+@step("9j", "Create the template and URL warm-up in hotel/warmup.py", parallel=True)
+def write_warmup():
+    print(f"Creating warm-up at: {warmup_file_path}")
+    try:
+        write_file(warmup_file_path, warmup_content)
+        print("warmup.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to warmup.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9k: Create request instrumentation in hotel/instrumentation.py ---
+instrumentation_file_path = os.path.join(app_name, "instrumentation.py")
+instrumentation_content = """
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('hotel.slow_queries')
+
+# Upper bounds in seconds, Prometheus' default buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+WORKERS_KEY = 'hotel:metrics:workers'
+WORKER_KEY = 'hotel:metrics:worker:{}'
+
+
+def _cache():
+    # Shared by every worker process (Redis, Memcached...) for /metrics to cover all of them;
+    # with the default per-process locmem cache each worker reports only itself
+    return caches[getattr(settings, 'HOTEL_METRICS_CACHE', 'default')]
+
+
+def worker_id():
+    # Looked up on every call: servers that import the app before forking give each worker its own pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'db_seconds', 'slow_queries', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1) # Last slot is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slow_queries = 0
+        self.statuses = {}
+
+
+class Registry:
+    \"\"\"
+    Request metrics keyed by (URL name, method), collected in each process and copied
+    to the shared cache every HOTEL_METRICS_PUBLISH_INTERVAL seconds so that /metrics,
+    whichever worker answers it, can report every worker (see collect()).
+    \"\"\"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._published_at = None
+
+    def record(self, view, method, status, seconds, queries, db_seconds, slow_queries):
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[(view, method)] = ViewStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.queries += queries
+            stats.db_seconds += db_seconds
+            stats.slow_queries += slow_queries
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        self.publish()
+
+    def publish(self, force=False):
+        now = time.monotonic()
+        interval = getattr(settings, 'HOTEL_METRICS_PUBLISH_INTERVAL', 5)
+        if not force and self._published_at is not None and now - self._published_at < interval:
+            return
+        self._published_at = now
+        worker, cache = worker_id(), _cache()
+        # A worker that stops drops out of /metrics once its copy expires
+        cache.set(WORKER_KEY.format(worker), self.snapshot(), getattr(settings, 'HOTEL_METRICS_WORKER_TTL', 3600))
+        workers = cache.get(WORKERS_KEY, [])
+        if worker not in workers:
+            # Not atomic, but a worker lost to a concurrent update adds itself again on its next publish
+            cache.set(WORKERS_KEY, sorted({*workers, worker}), None)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: (list(s.buckets), s.count, s.seconds, s.queries, s.db_seconds, s.slow_queries, dict(s.statuses))
+                for key, s in self._views.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+        self.publish(force=True)
+
+
+registry = Registry()
+
+
+def collect():
+    \"\"\"{worker id: snapshot} for every worker that published within HOTEL_METRICS_WORKER_TTL, this one up to date.\"\"\"
+    registry.publish(force=True)
+    cache = _cache()
+    workers = cache.get(WORKERS_KEY, [])
+    found = cache.get_many([WORKER_KEY.format(worker) for worker in workers])
+    snapshots = {worker: found[WORKER_KEY.format(worker)] for worker in workers if WORKER_KEY.format(worker) in found}
+    if len(snapshots) < len(workers):
+        cache.set(WORKERS_KEY, sorted(snapshots), None) # Forget expired workers
+    snapshots[worker_id()] = registry.snapshot()
+    return snapshots
+
+
+class QueryRecorder:
+    \"\"\"connection.execute_wrapper hook: counts and times queries, logs the slow ones.\"\"\"
+
+    def __init__(self, view_name, threshold):
+        self.view_name = view_name
+        self.threshold = threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if elapsed >= self.threshold:
+                self.slow += 1
+                logger.warning("slow query (%.1f ms) in %s: %s; params=%r",
+                               elapsed * 1000, self.view_name() or 'unresolved', sql, params)
+
+
+class InstrumentationMiddleware:
+    \"\"\"
+    Opt-in (HOTEL_INSTRUMENTATION) per-view timing: wall time, query count and
+    DB time per request, aggregated for /metrics, plus a Server-Timing header.
+    Queries slower than HOTEL_SLOW_QUERY_MS are logged with their SQL.
+    \"\"\"
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'HOTEL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'HOTEL_SLOW_QUERY_MS', 100) / 1000
+
+    def __call__(self, request):
+        view_name = lambda: request.resolver_match and request.resolver_match.view_name
+        recorder = QueryRecorder(view_name, self.threshold)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        registry.record(view_name() or 'unresolved', request.method, response.status_code,
+                        elapsed, recorder.count, recorder.seconds, recorder.slow)
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"'
+        )
+        return response
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def render_metrics():
+    \"\"\"Every worker's metrics in the Prometheus text exposition format (version 0.0.4), labelled by worker.\"\"\"
+    lines = []
+    snapshot = sorted(
+        ((view, method, worker), values) for worker, views in collect().items() for (view, method), values in views.items()
+    )
+
+    lines += ['# HELP hotel_request_duration_seconds Request wall time by URL name.',
+              '# TYPE hotel_request_duration_seconds histogram']
+    for (view, method, worker), (buckets, count, seconds, *_) in snapshot:
+        cumulative = 0
+        for bound, hits in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += hits
+            labels = _labels(view=view, method=method, worker=worker, le=bound)
+            lines.append(f'hotel_request_duration_seconds_bucket{{{labels}}} {cumulative}')
+        lines.append(f'hotel_request_duration_seconds_sum{{{_labels(view=view, method=method, worker=worker)}}} {seconds:.6f}')
+        lines.append(f'hotel_request_duration_seconds_count{{{_labels(view=view, method=method, worker=worker)}}} {count}')
+
+    lines += ['# HELP hotel_requests_total Responses by URL name and status code.',
+              '# TYPE hotel_requests_total counter']
+    for (view, method, worker), (*_, statuses) in snapshot:
+        for status, total in sorted(statuses.items()):
+            lines.append(f'hotel_requests_total{{{_labels(view=view, method=method, worker=worker, status=status)}}} {total}')
+
+    counters = (
+        ('hotel_db_queries_total', 'ORM queries issued by URL name.', 3, '{}'),
+        ('hotel_db_query_seconds_total', 'Time spent in the database by URL name.', 4, '{:.6f}'),
+        ('hotel_slow_queries_total', 'Queries over HOTEL_SLOW_QUERY_MS by URL name.', 5, '{}'),
+    )
+    for name, help_text, index, value_format in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method, worker), values in snapshot:
+            lines.append(f'{name}{{{_labels(view=view, method=method, worker=worker)}}} {value_format.format(values[index])}')
+    return '\\n'.join(lines) + '\\n'
+"""
+
+@step("9k", "Create request instrumentation in hotel/instrumentation.py", parallel=True)
+def write_instrumentation():
+    print(f"Creating request instrumentation at: {instrumentation_file_path}")
+    try:
+        write_file(instrumentation_file_path, instrumentation_content)
+        print("instrumentation.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to instrumentation.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9l: Create async read views in hotel/async_views.py ---
+async_views_file_path = os.path.join(app_name, "async_views.py")
+async_views_content = """
+from datetime import date
+
+from django.conf import settings
+from django.contrib import messages
+from django.shortcuts import render
+
+from . import availability, dashboard, pricing, room_status, search
+from .models import Room, Guest
+from .views import keyset_query, keyset_result
+
+# Async versions of the read-heavy views, routed by hotel/urls.py when HOTEL_ASYNC_VIEWS is on
+# (the ASGI entry point turns it on). Same templates and context as their counterparts in views.py;
+# every query is awaited, so nothing may reach the database lazily while the template renders.
+
+
+async def akeyset_page(request, queryset):
+    query, window = keyset_query(request, queryset)
+    return keyset_result(request, [row async for row in query], window)
+
+
+async def home(request):
+    \"\"\"A simple home view for the application.\"\"\"
+    context = await dashboard.aget_stats()
+    return render(request, 'hotel/home.html', context)
+
+
+async def room_list(request):
+    page = await akeyset_page(request, Room.objects.all())
+    return render(request, 'hotel/room_list.html', {'rooms': page['object_list'], 'page': page})
+
+
+async def guest_list(request):
+    search_query = request.GET.get('q')
+
+    if search_query:
+        guests = await search.asearch_guests(search_query, limit=getattr(settings, 'HOTEL_GUEST_SEARCH_LIMIT', 100))
+        page = {'object_list': guests, 'next_cursor': None, 'previous_cursor': None, 'querystring': ''}
+    else:
+        page = await akeyset_page(request, Guest.objects.all())
+    return render(request, 'hotel/guest_list.html', {'guests': page['object_list'], 'page': page, 'search_query': search_query})
+
+
+async def room_availability(request):
+    \"\"\"A view for room availability with date filtering.\"\"\"
+    check_in = request.GET.get('check_in_date')
+    check_out = request.GET.get('check_out_date')
+    context = {
+        'rooms': [],
+        'current_month': 'Current View',
+        'check_in_date': check_in,
+        'check_out_date': check_out,
+    }
+    available = await room_status.arooms()
+
+    if not (check_in and check_out):
+        context['rooms'] = available
+        context['message'] = f"Currently showing all available rooms ({len(context['rooms'])}). Select dates to filter."
+        return render(request, 'hotel/room_availability.html', context)
+
+    try:
+        check_in_date_obj = date.fromisoformat(check_in)
+        check_out_date_obj = date.fromisoformat(check_out)
+    except ValueError:
+        messages.error(request, "Invalid date format. Please use YYYY-MM-DD.")
+        context['message'] = "Invalid date format. Please use YYYY-MM-DD."
+        return render(request, 'hotel/room_availability.html', context)
+
+    if check_in_date_obj >= check_out_date_obj:
+        messages.error(request, "Check-out date must be after check-in date.")
+        context['current_month'] = 'Invalid Dates'
+        context['message'] = "Check-out date must be after check-in date."
+        return render(request, 'hotel/room_availability.html', context)
+
+    booked_room_ids = await availability.abooked_room_ids(check_in_date_obj, check_out_date_obj)
+    context['rooms'] = [room for room in available if room.id not in booked_room_ids]
+    quotes = await pricing.aquote_rooms(context['rooms'], check_in_date_obj, check_out_date_obj)
+    for room in context['rooms']:
+        room.stay_total = quotes[room.id]
+    context['nights'] = (check_out_date_obj - check_in_date_obj).days
+    if context['rooms']:
+        context['message'] = f"{len(context['rooms'])} rooms available for the selected dates."
+    else:
+        context['message'] = "No rooms available for the selected dates."
+    return render(request, 'hotel/room_availability.html', context)
+"""
+
+@step("9l", "Create async read views in hotel/async_views.py", parallel=True)
+def write_async_views():
+    print(f"Creating async views at: {async_views_file_path}")
+    try:
+        write_file(async_views_file_path, async_views_content)
+        print("async_views.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to async_views.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9m: Create the pricing engine in hotel/pricing.py ---
+pricing_file_path = os.path.join(app_name, "pricing.py")
+pricing_content = """
+import time
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+from threading import RLock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import RatePlan
+
+ONE_DAY = timedelta(days=1)
+
+
+def to_cents(amount):
+    return int(amount * 100)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2) # Keeps two decimal places, like the DecimalFields
+
+
+def plan_for(plans, day):
+    \"\"\"The plan that prices `day`, from one room type's plans in precedence order.\"\"\"
+    for plan in plans:
+        if plan.applies_to(day):
+            return plan
+    return None
+
+
+class PriceGrid:
+    \"\"\"
+    Nightly prices per room type for the dates start .. start + days - 1.
+
+    Each room type is stored as running totals of integer cents plus running counts of the
+    nights no plan covers (those fall back to the room's own price). A stay inside the grid
+    is priced with two lookups per array, however many nights it has.
+    \"\"\"
+
+    def __init__(self, start, days, plans_by_type):
+        self.start = start
+        self.days = days
+        self._totals = {} # room_type -> array of days + 1 running cent totals
+        self._unpriced = {} # room_type -> array of days + 1 running counts of unpriced nights
+        for room_type, plans in plans_by_type.items():
+            totals, unpriced = array('q', [0]), array('l', [0])
+            day = start
+            for _ in range(days):
+                plan = plan_for(plans, day)
+                totals.append(totals[-1] + (to_cents(plan.nightly_price) if plan else 0))
+                unpriced.append(unpriced[-1] + (0 if plan else 1))
+                day += ONE_DAY
+            self._totals[room_type], self._unpriced[room_type] = totals, unpriced
+
+    def covers(self, check_in, check_out):
+        return self.start <= check_in and (check_out - self.start).days <= self.days
+
+    def quote_cents(self, room_type, base_cents, check_in, check_out):
+        first, last = (check_in - self.start).days, (check_out - self.start).days
+        totals = self._totals.get(room_type)
+        if totals is None:
+            return base_cents * (last - first)
+        unpriced = self._unpriced[room_type]
+        return totals[last] - totals[first] + base_cents * (unpriced[last] - unpriced[first])
+
+
+class PricingEngine:
+    \"\"\"
+    Quotes stays from the rate plans through a PriceGrid covering the recent past and the
+    next HOTEL_PRICING_HORIZON_DAYS days. Stays outside it are priced night by night.
+
+    Rebuilt lazily after a rate plan changes, and every HOTEL_PRICING_GRID_TTL seconds so that
+    changes made by other worker processes (and the passing days) are picked up.
+    \"\"\"
+
+    PAST_DAYS = 31
+
+    def __init__(self):
+        self._lock = RLock()
+        self._grid = None
+        self._plans_by_type = {}
+        self._loaded_at = None
+
+    def _ttl(self):
+        return getattr(settings, 'HOTEL_PRICING_GRID_TTL', 300)
+
+    def reload(self):
+        plans_by_type = {}
+        # Precedence: highest priority first, then the most recently added plan
+        for plan in RatePlan.objects.order_by('-priority', '-id'):
+            plans_by_type.setdefault(plan.room_type, []).append(plan)
+        start = date.today() - timedelta(days=self.PAST_DAYS)
+        days = self.PAST_DAYS + getattr(settings, 'HOTEL_PRICING_HORIZON_DAYS', 730)
+        grid = PriceGrid(start, days, plans_by_type)
+        with self._lock:
+            self._grid, self._plans_by_type = grid, plans_by_type
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def needs_reload(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl()
+
+    def ensure_loaded(self):
+        with self._lock:
+            if self.needs_reload():
+                self.reload()
+
+    def plans_by_type(self):
+        with self._lock:
+            if self.needs_reload():
+                self.reload()
+            return self._plans_by_type
+
+    def quote_cents(self, room_type, base_cents, check_in, check_out):
+        with self._lock:
+            if self.needs_reload():
+                self.reload()
+            grid, plans = self._grid, self._plans_by_type.get(room_type, ())
+        if grid.covers(check_in, check_out):
+            return grid.quote_cents(room_type, base_cents, check_in, check_out)
+        total, day = 0, check_in
+        while day < check_out:
+            plan = plan_for(plans, day)
+            total += to_cents(plan.nightly_price) if plan else base_cents
+            day += ONE_DAY
+        return total
+
+
+engine = PricingEngine()
+
+
+def quote(room, check_in, check_out):
+    \"\"\"Price of staying in `room` for the nights check_in .. check_out - 1, as a Decimal.\"\"\"
+    return from_cents(engine.quote_cents(room.room_type, to_cents(room.price), check_in, check_out))
+
+
+def grid_between(start, end):
+    \"\"\"A one-off PriceGrid for the nights start .. end, e.g. to price years of past stays in one pass.\"\"\"
+    return PriceGrid(start, (end - start).days + 1, engine.plans_by_type())
+
+
+def quote_rooms(rooms, check_in, check_out):
+    \"\"\"{room.id: stay total} for every room, one grid lookup each.\"\"\"
+    return {room.id: quote(room, check_in, check_out) for room in rooms}
+
+
+async def aquote_rooms(rooms, check_in, check_out):
+    \"\"\"quote_rooms() for async views: only a rebuild of the grid leaves the event loop.\"\"\"
+    if engine.needs_reload():
+        await sync_to_async(engine.ensure_loaded)()
+    return quote_rooms(rooms, check_in, check_out)
+
+
+@receiver(post_save, sender=RatePlan)
+@receiver(post_delete, sender=RatePlan)
+def _rate_plan_changed(sender, **kwargs):
+    transaction.on_commit(engine.invalidate)
+"""
+
+@step("9m", "Create the rate-plan pricing engine in hotel/pricing.py", parallel=True)
+def write_pricing_engine():
+    print(f"Creating pricing engine at: {pricing_file_path}")
+    try:
+        write_file(pricing_file_path, pricing_content)
+        print("pricing.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to pricing.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9n: Create the room-status state machine in hotel/room_status.py ---
+room_status_file_path = os.path.join(app_name, "room_status.py")
+room_status_content = """
+import time
+from threading import RLock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import Room, RoomStatus, RoomStatusEvent
+
+# Where a room can go from each status. Housekeeping: occupied -> dirty -> cleaning -> available.
+TRANSITIONS = {
+    RoomStatus.AVAILABLE: {RoomStatus.OCCUPIED, RoomStatus.DIRTY, RoomStatus.MAINTENANCE},
+    RoomStatus.OCCUPIED: {RoomStatus.DIRTY, RoomStatus.MAINTENANCE},
+    RoomStatus.DIRTY: {RoomStatus.CLEANING, RoomStatus.AVAILABLE, RoomStatus.MAINTENANCE},
+    RoomStatus.CLEANING: {RoomStatus.AVAILABLE, RoomStatus.DIRTY, RoomStatus.MAINTENANCE},
+    RoomStatus.MAINTENANCE: {RoomStatus.DIRTY, RoomStatus.AVAILABLE},
+}
+
+# Rooms in these statuses can be sold for a stay; a dirty room is cleaned before the guest arrives
+SELLABLE = (RoomStatus.AVAILABLE, RoomStatus.DIRTY, RoomStatus.CLEANING)
+
+# Sent after a batch transition commits, with the ids of the rooms that changed (bulk updates send no post_save)
+statuses_changed = Signal()
+
+
+def label(status):
+    return RoomStatus(status).label if status in RoomStatus.values else status
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def floor_of(room_number):
+    \"\"\"Floor of a room numbered like 101 or 1204: everything before the last two characters.\"\"\"
+    return room_number[:-2] or '0'
+
+
+class InvalidTransition(Exception):
+
+    def __init__(self, rooms, to_status):
+        self.rooms = rooms # [(room_number, current status)]
+        listed = ', '.join(f"{number} ({label(status).lower()})" for number, status in rooms[:10])
+        more = f" and {len(rooms) - 10} more" if len(rooms) > 10 else ""
+        super().__init__(f"Can't mark as {label(to_status).lower()}: room {listed}{more}.")
+
+
+class RoomState:
+    \"\"\"The room columns the listing pages show, copied out of the projection on every read.\"\"\"
+
+    __slots__ = ('id', 'room_number', 'room_type', 'price', 'status', 'stay_total')
+
+    def __init__(self, room_id, room_number, room_type, price, status):
+        self.id, self.room_number, self.room_type, self.price, self.status = room_id, room_number, room_type, price, status
+        self.stay_total = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def floor(self):
+        return floor_of(self.room_number)
+
+    def get_status_display(self):
+        return label(self.status)
+
+
+class StatusProjection:
+    \"\"\"
+    Current status (and listing columns) of every room, so that room_availability and the
+    dashboard need no room query. Room.status is the stored projection: every transition
+    updates it in the same transaction as the RoomStatusEvent rows.
+
+    Reloaded lazily after a room or its status changes, and every HOTEL_ROOM_STATUS_TTL
+    seconds so that changes made by other worker processes are picked up.
+    \"\"\"
+
+    def __init__(self):
+        self._lock = RLock()
+        self._rows = () # (id, room_number, room_type, price, status), ordered by room number
+        self._counts = {}
+        self._loaded_at = None
+
+    def _ttl(self):
+        return getattr(settings, 'HOTEL_ROOM_STATUS_TTL', 300)
+
+    def reload(self):
+        rows = tuple(Room.objects.order_by('room_number').values_list('id', 'room_number', 'room_type', 'price', 'status'))
+        counts = dict.fromkeys(RoomStatus.values, 0)
+        for row in rows:
+            counts[row[4]] = counts.get(row[4], 0) + 1
+        with self._lock:
+            self._rows, self._counts = rows, counts
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def needs_reload(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl()
+
+    def ensure_loaded(self):
+        # Under the lock, so a burst of requests on a stale projection reloads it once
+        with self._lock:
+            if self.needs_reload():
+                self.reload()
+
+    def rooms(self, statuses=None):
+        self.ensure_loaded()
+        rows = self._rows
+        if statuses is not None:
+            statuses = set(statuses)
+            rows = [row for row in rows if row[4] in statuses]
+        return [RoomState(*row) for row in rows]
+
+    def counts(self):
+        self.ensure_loaded()
+        return dict(self._counts)
+
+
+projection = StatusProjection()
+
+
+def rooms(statuses=SELLABLE):
+    \"\"\"Rooms in `statuses` (every room for None) as RoomState copies, ordered by room number.\"\"\"
+    return projection.rooms(statuses)
+
+
+def counts():
+    \"\"\"{status: number of rooms} for every status.\"\"\"
+    return projection.counts()
+
+
+async def arooms(statuses=SELLABLE):
+    \"\"\"rooms() for async views: only a reload of the projection leaves the event loop.\"\"\"
+    if projection.needs_reload():
+        await sync_to_async(projection.ensure_loaded)()
+    return projection.rooms(statuses)
+
+
+async def acounts():
+    if projection.needs_reload():
+        await sync_to_async(projection.ensure_loaded)()
+    return projection.counts()
+
+
+def transition_many(rooms, to_status, note='', skip_invalid=False):
+    \"\"\"
+    Move every room of the `rooms` queryset to `to_status` with one UPDATE and one bulk
+    insert of events, however many rooms there are. Rooms already there are left alone.
+
+    Raises InvalidTransition (and changes nothing) if the state machine forbids the move for
+    any room, unless skip_invalid is set, which leaves those rooms out instead.
+    Returns the ids of the rooms that changed.
+    \"\"\"
+    to_status = RoomStatus(to_status)
+    with transaction.atomic():
+        current = list(rooms.select_for_update().exclude(status=to_status).order_by('id').values_list(
+            'id', 'room_number', 'status'
+        ))
+        invalid = [(number, status) for _, number, status in current if not can_transition(status, to_status)]
+        if invalid and not skip_invalid:
+            raise InvalidTransition(invalid, to_status)
+        moving = [room for room in current if can_transition(room[2], to_status)]
+        if not moving:
+            return []
+        room_ids = [room_id for room_id, _, _ in moving]
+        Room.objects.filter(id__in=room_ids).update(status=to_status)
+        changed_at = timezone.now()
+        RoomStatusEvent.objects.bulk_create([
+            RoomStatusEvent(room_id=room_id, room_number=number, from_status=status, to_status=to_status,
+                            changed_at=changed_at, note=note)
+            for room_id, number, status in moving
+        ], batch_size=1000)
+        transaction.on_commit(lambda: _statuses_changed(room_ids))
+    return room_ids
+
+
+def transition(room, to_status, note=''):
+    \"\"\"Move one room; raises InvalidTransition if the state machine forbids it.\"\"\"
+    changed = transition_many(Room.objects.filter(pk=room.pk), to_status, note)
+    room.status = room._loaded_status = RoomStatus(to_status).value
+    return bool(changed)
+
+
+def transition_floor(floor, to_status, note=''):
+    \"\"\"Move the rooms on `floor` that can make the move (e.g. mark the dirty ones clean).\"\"\"
+    room_ids = [room.id for room in rooms(None) if room.floor == floor]
+    return transition_many(Room.objects.filter(id__in=room_ids), to_status, note, skip_invalid=True)
+
+
+def log_new_rooms(rooms, note=''):
+    \"\"\"The first event of each saved room in `rooms`, for rooms inserted with bulk_create (which sends no post_save).\"\"\"
+    changed_at = timezone.now()
+    RoomStatusEvent.objects.bulk_create((
+        RoomStatusEvent(room_id=room.pk, room_number=room.room_number, to_status=room.status, changed_at=changed_at, note=note)
+        for room in rooms
+    ), batch_size=1000)
+
+
+def _statuses_changed(room_ids):
+    projection.invalidate()
+    statuses_changed.send(sender=Room, room_ids=room_ids)
+
+
+@receiver(post_save, sender=Room)
+def _room_saved(sender, instance, created, **kwargs):
+    # Status edits through the room form, the admin or imports go into the event log too
+    previous = '' if created else getattr(instance, '_loaded_status', '')
+    if instance.status != previous:
+        RoomStatusEvent.objects.create(room=instance, room_number=instance.room_number, from_status=previous or '',
+                                       to_status=instance.status)
+        instance._loaded_status = instance.status
+    transaction.on_commit(projection.invalidate)
+
+
+@receiver(post_delete, sender=Room)
+def _room_deleted(sender, **kwargs):
+    transaction.on_commit(projection.invalidate)
+"""
+
+@step("9n", "Create the room-status state machine in hotel/room_status.py", parallel=True)
+def write_room_status():
+    print(f"Creating room-status state machine at: {room_status_file_path}")
+    try:
+        write_file(room_status_file_path, room_status_content)
+        print("room_status.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to room_status.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9o: Create the invoice ledger in hotel/invoicing.py ---
+invoicing_file_path = os.path.join(app_name, "invoicing.py")
+invoicing_content = """
+import os
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, Min, Sum
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import pricing
+from .models import Booking, Payment, ServiceCharge, InvoiceSummary
+
+ZERO = Decimal('0.00')
+SERVICE_TOTAL = Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def summary_values(status, check_in, check_out, room_charges, service_charges, payments):
+    \"\"\"InvoiceSummary columns. A cancelled booking owes no room nights, only its services.\"\"\"
+    if status == 'cancelled':
+        room_charges = ZERO
+    return {
+        'nights': (check_out - check_in).days,
+        'room_charges': room_charges,
+        'service_charges': service_charges,
+        'payments': payments,
+        'balance': room_charges + service_charges - payments,
+    }
+
+
+def refresh(booking, new=False):
+    \"\"\"
+    Recompute one booking's InvoiceSummary in the current transaction. Room nights are priced
+    with the rate plans (hotel/pricing.py), i.e. nights x the room's price when no plan applies.
+    \"\"\"
+    if new:
+        service_charges = payments = ZERO # Nothing can be charged or paid before the booking exists
+    else:
+        service_charges = ServiceCharge.objects.filter(booking_id=booking.pk).aggregate(total=SERVICE_TOTAL)['total'] or ZERO
+        payments = Payment.objects.filter(booking_id=booking.pk).aggregate(total=Sum('amount'))['total'] or ZERO
+    values = summary_values(booking.status, booking.check_in_date, booking.check_out_date,
+                            pricing.quote(booking.room, booking.check_in_date, booking.check_out_date),
+                            service_charges, payments)
+    if new:
+        return InvoiceSummary.objects.create(booking=booking, **values)
+    summary, _ = InvoiceSummary.objects.update_or_create(booking_id=booking.pk, defaults=values)
+    return summary
+
+
+def reprice(booking):
+    \"\"\"
+    Update an edited booking's nights and room charges with a single UPDATE. The stored
+    service and payment totals are kept as they are, since editing a booking does not
+    change them. Falls back to refresh() when the booking has no summary yet.
+    \"\"\"
+    values = summary_values(booking.status, booking.check_in_date, booking.check_out_date,
+                            pricing.quote(booking.room, booking.check_in_date, booking.check_out_date), ZERO, ZERO)
+    updated = InvoiceSummary.objects.filter(booking_id=booking.pk).update(
+        nights=values['nights'], room_charges=values['room_charges'],
+        balance=values['room_charges'] + F('service_charges') - F('payments'), updated_at=timezone.now(),
+    )
+    if not updated:
+        refresh(booking)
+
+
+def rebuild(batch_size=5000, progress=None):
+    \"\"\"
+    Recompute every InvoiceSummary from the raw tables, e.g. after bulk loads that send no
+    signals: one grouped query each for service charges and payments, one pass over bookings.
+    \"\"\"
+    bounds = Booking.objects.aggregate(first=Min('check_in_date'), last=Max('check_out_date'))
+    service_charges = dict(ServiceCharge.objects.values_list('booking_id').annotate(total=SERVICE_TOTAL).order_by())
+    payments = dict(Payment.objects.values_list('booking_id').annotate(total=Sum('amount')).order_by())
+    # One price grid over every stay instead of pricing old bookings night by night
+    grid = pricing.grid_between(bounds['first'], bounds['last']) if bounds['first'] else None
+    rows = Booking.objects.values_list('id', 'status', 'check_in_date', 'check_out_date', 'room__room_type', 'room__price')
+
+    total, batch = 0, []
+    with transaction.atomic():
+        InvoiceSummary.objects.all().delete()
+        for booking_id, status, check_in, check_out, room_type, price in rows.iterator(chunk_size=batch_size):
+            room_charges = pricing.from_cents(grid.quote_cents(room_type, pricing.to_cents(price), check_in, check_out))
+            batch.append(InvoiceSummary(booking_id=booking_id, **summary_values(
+                status, check_in, check_out, room_charges,
+                service_charges.get(booking_id, ZERO), payments.get(booking_id, ZERO)
+            )))
+            if len(batch) >= batch_size:
+                InvoiceSummary.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+                if progress:
+                    progress(total)
+        InvoiceSummary.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def open_invoices():
+    \"\"\"Invoices with money still owed, served by the invoice_open_idx partial index.\"\"\"
+    return InvoiceSummary.objects.filter(balance__gt=0)
+
+
+def load_invoices(booking_ids):
+    \"\"\"Summaries with their booking, guest, room, service charges and payments, in four queries.\"\"\"
+    return list(
+        InvoiceSummary.objects.filter(booking_id__in=booking_ids)
+        .select_related('booking__guest', 'booking__room')
+        .prefetch_related('booking__service_charges__service', 'booking__payment_set')
+        .order_by('booking_id')
+    )
+
+
+def render_invoice(invoice):
+    return render_to_string('hotel/invoice.html', {'invoice': invoice, 'booking': invoice.booking})
+
+
+def pdf_renderer():
+    \"\"\"WeasyPrint's HTML class if it is installed (pip install weasyprint), else None.\"\"\"
+    try:
+        from weasyprint import HTML
+    except (ImportError, OSError): # OSError: installed without its system libraries
+        return None
+    return HTML
+
+
+def render_invoices(booking_ids, output_dir, file_format='html', batch_size=200, progress=None):
+    \"\"\"Write INV-<booking id>.html (or .pdf) for every booking id into output_dir, batch_size at a time.\"\"\"
+    renderer = pdf_renderer() if file_format == 'pdf' else None
+    if file_format == 'pdf' and renderer is None:
+        raise ValueError("PDF invoices need WeasyPrint (pip install weasyprint); HTML works without it.")
+    os.makedirs(output_dir, exist_ok=True)
+    done = 0
+    for start in range(0, len(booking_ids), batch_size):
+        for invoice in load_invoices(booking_ids[start:start + batch_size]):
+            html = render_invoice(invoice)
+            path = os.path.join(output_dir, f"INV-{invoice.booking_id}.{file_format}")
+            if renderer:
+                renderer(string=html).write_pdf(path)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(html)
+            done += 1
+        if progress:
+            progress(done)
+    return done
+
+
+def _deleted_with_booking(sender, origin):
+    # post_delete's origin is what delete() was called on; a booking, guest or room delete
+    # takes the summary row with it, so there is nothing to refresh
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender
+
+
+@receiver(post_save, sender=Booking)
+def _booking_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        refresh(instance, new=True)
+    else:
+        reprice(instance)
+
+
+@receiver([post_save, post_delete], sender=Payment)
+@receiver([post_save, post_delete], sender=ServiceCharge)
+def _bill_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleted_with_booking(sender, origin):
+        return
+    refresh(Booking.objects.select_related('room').get(pk=instance.booking_id))
+"""
+
+@step("9o", "Create the invoice ledger in hotel/invoicing.py", parallel=True)
+def write_invoicing():
+    print(f"Creating invoice ledger at: {invoicing_file_path}")
+    try:
+        write_file(invoicing_file_path, invoicing_content)
+        print("invoicing.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to invoicing.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 9p: Create the background job queue in hotel/jobs.py ---
+jobs_file_path = os.path.join(app_name, "jobs.py")
+jobs_content = """
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from . import exports, invoicing, pricing, reports, search
+from .models import Booking, InvoiceSummary, Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+TASKS = {} # name -> Task, filled by the @task decorator below
+
+# Tasks without parameters that the Jobs page can start
+MAINTENANCE_TASKS = ('rebuild_reports', 'rebuild_guest_index', 'rebuild_invoices')
+
+
+class Task:
+
+    def __init__(self, name, func, title, max_attempts):
+        self.name, self.func, self.title, self.max_attempts = name, func, title, max_attempts
+
+
+def task(name, title, max_attempts=3):
+    \"\"\"Register `func(progress, **params)` as a background task. Its return value (JSON) becomes Job.result.\"\"\"
+    def register(func):
+        TASKS[name] = Task(name, func, title, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, **params):
+    \"\"\"Queue task `name` with JSON-serialisable keyword arguments and return the Job.\"\"\"
+    if name not in TASKS:
+        raise ValueError(f"Unknown task: {name}")
+    return Job.objects.create(task=name, params=params, max_attempts=TASKS[name].max_attempts)
+
+
+def title(job):
+    return TASKS[job.task].title if job.task in TASKS else job.task
+
+
+class Progress:
+    \"\"\"
+    Passed to every task as its first argument: progress(done, total=None, message='').
+    Writes to the job row at most every HOTEL_JOB_PROGRESS_INTERVAL seconds, and always
+    once done reaches total, so a tight loop can call it on every item. What is held back
+    is written with the job's outcome.
+    \"\"\"
+
+    def __init__(self, job):
+        self.job = job
+        self.pending = {}
+        self._written_at = 0
+
+    def __call__(self, done, total=None, message=''):
+        self.pending['progress_done'] = done
+        if total is not None:
+            self.pending['progress_total'] = total
+        if message:
+            self.pending['message'] = message[:200]
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        if not finished and now - self._written_at < getattr(settings, 'HOTEL_JOB_PROGRESS_INTERVAL', 1):
+            return
+        self._written_at = now
+        try:
+            _update(self.job, heartbeat_at=timezone.now(), **self.pending)
+            self.pending = {}
+        except OperationalError: # e.g. SQLite busy with another job's write; the next call catches up
+            logger.warning("Could not record progress of job %s", self.job.pk)
+
+
+def _update(job, **fields):
+    # Only while this worker still holds the job; requeue_stale() may have handed it to another
+    return Job.objects.filter(pk=job.pk, status=JobStatus.RUNNING, worker=job.worker).update(**fields)
+
+
+def claim(worker):
+    \"\"\"
+    Take the oldest due job for `worker`, or None. The conditional UPDATE is the lock, so any
+    number of worker threads and processes can share the table on SQLite and PostgreSQL alike.
+    \"\"\"
+    now = timezone.now()
+    due = Job.objects.filter(status=JobStatus.QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    for job_id in due.values_list('id', flat=True)[:5]:
+        claimed = Job.objects.filter(id=job_id, status=JobStatus.QUEUED).update(
+            status=JobStatus.RUNNING, worker=worker, attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None # Queue empty, or other workers took every candidate first
+
+
+def run(job):
+    \"\"\"
+    Run a claimed job and record the outcome. A failed attempt is queued again after
+    HOTEL_JOB_RETRY_DELAY seconds, doubling each time, until max_attempts is reached.
+    Returns True if the job succeeded.
+    \"\"\"
+    progress = Progress(job)
+    try:
+        if job.task not in TASKS:
+            raise ValueError(f"Unknown task: {job.task}")
+        result = TASKS[job.task].func(progress, **job.params)
+    except Exception:
+        now = timezone.now()
+        retry = job.task in TASKS and job.attempts < job.max_attempts
+        logger.exception("Job %s (%s) failed on attempt %s of %s", job.pk, job.task, job.attempts, job.max_attempts)
+        if retry:
+            delay = getattr(settings, 'HOTEL_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            _update(job, status=JobStatus.QUEUED, run_after=now + timedelta(seconds=delay), error=traceback.format_exc())
+        else:
+            _update(job, status=JobStatus.FAILED, finished_at=now, error=traceback.format_exc())
+        return False
+    now = timezone.now()
+    _update(job, status=JobStatus.DONE, result=result, finished_at=now, heartbeat_at=now, **progress.pending)
+    return True
+
+
+def retry(job):
+    \"\"\"Queue a failed job again with a fresh set of attempts.\"\"\"
+    return Job.objects.filter(pk=job.pk, status=JobStatus.FAILED).update(
+        status=JobStatus.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None, worker='',
+    )
+
+
+def requeue_stale():
+    \"\"\"
+    Put back running jobs whose worker stopped sending heartbeats for HOTEL_JOB_TIMEOUT seconds
+    (killed or crashed mid-job); jobs that have used up their attempts fail instead.
+    \"\"\"
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=JobStatus.RUNNING, heartbeat_at__lt=now - timedelta(seconds=getattr(settings, 'HOTEL_JOB_TIMEOUT', 300))
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=JobStatus.FAILED, finished_at=now, error="The worker stopped responding.",
+    )
+    return failed + stale.update(status=JobStatus.QUEUED, run_after=now, worker='')
+
+
+def work_off(worker='inline', limit=None):
+    \"\"\"Run due jobs one after another in this thread until none are left (or `limit` ran). Returns the count.\"\"\"
+    done = 0
+    while limit is None or done < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        done += 1
+    return done
+
+
+class Worker:
+    \"\"\"
+    Claims jobs and runs up to `concurrency` of them at once on a thread pool, each with
+    its own database connection. Start several (`manage.py worker`) to use more processes.
+    \"\"\"
+
+    def __init__(self, concurrency=2, poll_interval=1.0, name=None):
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        \"\"\"Stop claiming jobs; the ones already running are finished first.\"\"\"
+        self._stop.set()
+
+    def _execute(self, job):
+        close_old_connections()
+        try:
+            run(job)
+        finally:
+            connection.close() # This thread's own connection
+
+    def _heartbeat(self):
+        # Long tasks that report no progress still count as alive while their worker is
+        Job.objects.filter(status=JobStatus.RUNNING, worker=self.name).update(heartbeat_at=timezone.now())
+        requeue_stale()
+
+    def run(self, burst=False):
+        \"\"\"Work until stop() (or, with burst, until nothing is due). Returns the number of jobs run.\"\"\"
+        started, heartbeat_at = 0, 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='hotel-worker') as pool:
+            while not self._stop.is_set():
+                if time.monotonic() - heartbeat_at > getattr(settings, 'HOTEL_JOB_TIMEOUT', 300) / 5:
+                    self._heartbeat()
+                    heartbeat_at = time.monotonic()
+                job = None
+                while len(running) < self.concurrency:
+                    job = claim(self.name)
+                    if job is None:
+                        break
+                    running.add(pool.submit(self._execute, job))
+                    started += 1
+                if burst and not running and job is None:
+                    break
+                if running:
+                    finished, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if future.exception(): # run() records task failures itself, so this is the database
+                            logger.error("Worker %s could not record a job: %s", self.name, future.exception())
+                else:
+                    self._stop.wait(self.poll_interval)
+        return started
+
+
+def _output_dir():
+    output_dir = getattr(settings, 'HOTEL_JOB_OUTPUT_DIR', os.path.join(settings.BASE_DIR, 'job_output'))
+    os.makedirs(output_dir, exist_ok=True)
+    return str(output_dir)
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+@task('rebuild_reports', "Rebuild report rollups")
+def rebuild_reports(progress, start=None, end=None, gaps_only=False):
+    pricing.engine.invalidate() # Rate plans may have changed in another process since this one's grid was built
+    if gaps_only:
+        return {'rows': reports.fill_gaps(_date(start), _date(end))}
+    total = reports.rebuild(
+        _date(start), _date(end), progress=lambda chunk_end, rows: progress(rows, message=f"Rollups up to {chunk_end}"),
+    )
+    return {'rows': total}
+
+
+@task('rebuild_guest_index', "Rebuild guest search index")
+def rebuild_guest_index(progress):
+    # Other processes' in-memory token indexes catch up within HOTEL_GUEST_SEARCH_INDEX_TTL
+    search.rebuild()
+    return {'backend': 'fts5' if search.fts_enabled() else 'token index'}
+
+
+@task('rebuild_invoices', "Rebuild invoice totals")
+def rebuild_invoices(progress):
+    total = Booking.objects.count()
+    return {'invoices': invoicing.rebuild(progress=lambda done: progress(done, total))}
+
+
+@task('render_invoices', "Render printable invoices")
+def render_invoices(progress, scope='open', file_format='html', output_dir=None):
+    # Booking ids are read when the job runs, so a queued job picks up balances that changed meanwhile
+    invoices = InvoiceSummary.objects.all() if scope == 'all' else invoicing.open_invoices()
+    booking_ids = list(invoices.order_by('booking_id').values_list('booking_id', flat=True))
+    output_dir = output_dir or getattr(settings, 'HOTEL_INVOICE_DIR', os.path.join(settings.BASE_DIR, 'invoices'))
+    progress(0, len(booking_ids))
+    total = invoicing.render_invoices(
+        booking_ids, str(output_dir), file_format, progress=lambda done: progress(done, len(booking_ids)),
+    )
+    return {'invoices': total, 'output_dir': str(output_dir), 'format': file_format}
+
+
+@task('export', "Export for accounting")
+def export(progress, kind, file_format='csv', start=None, end=None, compress=False):
+    filename = f"{kind}-{progress.job.pk}.{file_format}" + ('.gz' if compress else '')
+    path = os.path.join(_output_dir(), filename)
+    written = 0
+    with open(path, 'wb' if compress else 'w', encoding=None if compress else 'utf-8', newline=None if compress else '') as f:
+        for chunk in exports.export_chunks(kind, file_format, _date(start), _date(end), compress):
+            f.write(chunk)
+            written += len(chunk)
+            progress(written, message=f"{written} {'bytes' if compress else 'characters'} written")
+    return {'path': path, 'filename': filename, 'size': os.path.getsize(path)}
+"""
+
+@step("9p", "Create the background job queue in hotel/jobs.py", parallel=True)
+def write_jobs():
+    print(f"Creating job queue at: {jobs_file_path}")
+    try:
+        write_file(jobs_file_path, jobs_content)
+        print("jobs.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to jobs.py: {e}")
+        sys.exit(1)
+
+
+# --- Step 10: Create static directories and style.css ---
+static_css_dir = os.path.join(app_name, "static", app_name, "css")
+style_css_path = os.path.join(static_css_dir, "style.css")
+style_css_content = """
+/* General Body and Layout */
+body {
+    font-family: 'Inter', sans-serif; /* Assuming Inter font from image */
+    margin: 0;
+    padding: 0;
+    background-color: #f0f2f5; /* Light gray background */
+    display: flex;
+    min-height: 100vh;
+    color: #333;
+}
+
+.container {
+    display: flex;
+    width: 100%;
+}
+
+/* Sidebar Styling */
+.sidebar {
+    width: 250px;
+    background-color: #2c3e50; /* Dark blue/gray */
+    color: #ecf0f1; /* Light text */
+    padding: 20px;
+    box-shadow: 2px 0 5px rgba(0,0,0,0.1);
+    display: flex;
+    flex-direction: column;
+}
+
+.sidebar h2 {
+    color: #fff;
+    text-align: center;
+    margin-bottom: 30px;
+}
+
+.sidebar ul {
     list-style: none;
     padding: 0;
 }
@@ -787,6 +6848,14 @@ table th {
     cursor: not-allowed;
 }
 
+.room-availability-card .calendar .day.partial {
+    background-color: #fdebd0; /* Some rooms booked */
+}
+
+.room-availability-card .calendar .day.full {
+    background-color: #f5b7b1; /* No rooms left */
+}
+
 .invoice-item {
     display: flex;
     justify-content: space-between;
@@ -836,37 +6905,50 @@ table th {
     margin-bottom: 20px;
 }
 
+/* Pager below the list tables */
+.pagination {
+    display: flex;
+    justify-content: space-between;
+    margin-top: 20px;
+}
+
+.pagination .button.disabled {
+    background-color: #bdc3c7;
+    cursor: default;
+}
+
 /* Font Awesome Icons */
 /* Ensure Font Awesome is linked in base.html */
 """
-try:
-    with open(style_css_path, 'w') as f:
-        f.write(style_css_content)
-    print("style.css created successfully with dashboard styling.")
-except Exception as e:
-    print(f"An error occurred while writing to style.css: {e}")
-    sys.exit(1)
 
-# --- Step 11: Create base.html and update other templates to extend it ---
-templates_dir = os.path.join(app_name, "templates", app_name)
+@step("10", "Create static directories and style.css", parallel=True)
+def write_static_css():
+    os.makedirs(static_css_dir, exist_ok=True)
 
-# Ensure the templates directory exists before trying to create files in it
-print(f"Ensuring template directory exists: {templates_dir}")
-try:
-    os.makedirs(templates_dir, exist_ok=True)
-    # Optional: Add a small delay if timing is suspected to be an issue on certain systems
-    # time.sleep(0.1)
-    if not os.path.isdir(templates_dir): # Double check if directory exists
-        raise OSError(f"Failed to create directory: {templates_dir}")
-except Exception as e:
-    print(f"Error creating template directory {templates_dir}: {e}")
-    sys.exit(1)
+    print(f"Creating style.css at: {style_css_path}")
+    try:
+        write_file(style_css_path, style_css_content)
+        print("style.css created successfully with dashboard styling.")
+    except Exception as e:
+        print(f"An error occurred while writing to style.css: {e}")
+        sys.exit(1)
 
+
+# --- Step 11: Create base.html and update other templates to extend it ---
+templates_dir = os.path.join(app_name, "templates", app_name)
 # Create base.html
 base_html_path = os.path.join(templates_dir, "base.html")
-print(f"Creating base.html at: {base_html_path}")
+context_processors_file_path = os.path.join(app_name, "context_processors.py")
+context_processors_content = """
+from django.conf import settings
+
+
+def build(request):
+    \"\"\"Part of every cached fragment's key, so a deploy never serves markup cached by the previous version.\"\"\"
+    return {'hotel_build': getattr(settings, 'HOTEL_BUILD_ID', '')}
+"""
 base_html_content = """
-{% load static %}
+{% load static cache %}
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -880,16 +6962,22 @@ base_html_content = """
 </head>
 <body>
     <div class="container">
+        {% cache 86400 sidebar_nav hotel_build request.resolver_match.url_name %}
         <div class="sidebar">
             <h2>HMS</h2>
             <ul>
                 <li><a href="{% url 'home' %}" class="{% if request.resolver_match.url_name == 'home' %}active{% endif %}"><i class="fas fa-tachometer-alt"></i> Dashboard</a></li>
                 <li><a href="{% url 'room_list' %}" class="{% if 'room' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-bed"></i> Room Booking</a></li>
                 <li><a href="{% url 'room_availability' %}" class="{% if request.resolver_match.url_name == 'room_availability' %}active{% endif %}"><i class="fas fa-calendar-alt"></i> Room Availability</a></li>
+                <li><a href="{% url 'housekeeping' %}" class="{% if request.resolver_match.url_name == 'housekeeping' %}active{% endif %}"><i class="fas fa-broom"></i> Housekeeping</a></li>
                 <li><a href="{% url 'guest_list' %}" class="{% if 'guest' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-users"></i> Customers</a></li>
-                <li><a href="{% url 'booking_list' %}" class="{% if 'booking' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-file-invoice"></i> Invoices</a></li>
+                <li><a href="{% url 'booking_list' %}" class="{% if 'booking' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-calendar-check"></i> Bookings</a></li>
+                <li><a href="{% url 'invoice_list' %}" class="{% if 'invoice' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-file-invoice"></i> Invoices</a></li>
+                <li><a href="{% url 'reports' %}" class="{% if request.resolver_match.url_name == 'reports' %}active{% endif %}"><i class="fas fa-chart-line"></i> Reports</a></li>
+                <li><a href="{% url 'job_list' %}" class="{% if 'job' in request.resolver_match.url_name %}active{% endif %}"><i class="fas fa-tasks"></i> Jobs</a></li>
             </ul>
         </div>
+        {% endcache %}
         <div class="main-content">
             <div class="header">
                 {% block header_title %}Dashboard{% endblock %}
@@ -908,17 +6996,8 @@ base_html_content = """
 </body>
 </html>
 """
-try:
-    with open(base_html_path, 'w') as f:
-        f.write(base_html_content)
-    print("base.html created successfully.")
-except Exception as e:
-    print(f"An error occurred while writing to base.html: {e}")
-    sys.exit(1)
-
 # Create room_availability.html
 room_availability_html_path = os.path.join(templates_dir, "room_availability.html")
-print(f"Creating room_availability.html at: {room_availability_html_path}")
 room_availability_html_content = """
 {% extends 'hotel/base.html' %}
 
@@ -946,6 +7025,7 @@ room_availability_html_content = """
                     <th>Room Number</th>
                     <th>Room Type</th>
                     <th>Price</th>
+                    {% if nights %}<th>Total for {{ nights }} night{{ nights|pluralize }}</th>{% endif %}
                     <th>Status</th>
                 </tr>
             </thead>
@@ -955,11 +7035,12 @@ room_availability_html_content = """
                         <td>{{ room.room_number }}</td>
                         <td>{{ room.room_type }}</td>
                         <td>{{ room.price }}</td>
-                        <td>{{ room.status }}</td>
+                        {% if nights %}<td>{{ room.stay_total }}</td>{% endif %}
+                        <td>{{ room.get_status_display }}</td>
                     </tr>
                 {% empty %}
                     <tr>
-                        <td colspan="4">No rooms found for the selected criteria.</td>
+                        <td colspan="5">No rooms found for the selected criteria.</td>
                     </tr>
                 {% endfor %}
             </tbody>
@@ -968,14 +7049,6 @@ room_availability_html_content = """
     </div>
 {% endblock %}
 """
-try:
-    with open(room_availability_html_path, 'w') as f:
-        f.write(room_availability_html_content)
-    print("room_availability.html created successfully.")
-except Exception as e:
-    print(f"An error occurred while writing to room_availability.html: {e}")
-    sys.exit(1)
-
 # Update existing HTML templates to extend base.html and use blocks
 html_files_to_update = {
     "home.html": """
@@ -1006,6 +7079,10 @@ html_files_to_update = {
                 {# Calendar days will be rendered by JavaScript #}
             </div>
             <p style="text-align: center; margin-top: 15px;">Total Available Rooms: <strong>{{ available_rooms_count }}</strong></p>
+            <p style="text-align: center;">
+                {% for label, count in room_status_counts %}{{ label }}: <strong>{{ count }}</strong>{% if not forloop.last %} &middot; {% endif %}{% endfor %}
+                &middot; <a href="{% url 'housekeeping' %}">Housekeeping</a>
+            </p>
             <div class="mt-20 text-center">
                 <a href="{% url 'room_availability' %}" class="button">View Full Availability</a>
             </div>
@@ -1050,13 +7127,13 @@ html_files_to_update = {
             <div class="invoice-item">
                 <span>INV-{{ booking.id }}</span>
                 <span>{{ booking.check_in_date|date:"M d, Y" }}</span>
-                <a href="{% url 'booking_detail' pk=booking.pk %}" class="download-icon"><i class="fas fa-info-circle"></i></a>
+                <a href="{% url 'invoice_detail' pk=booking.pk %}" class="download-icon"><i class="fas fa-file-invoice"></i></a>
             </div>
             {% empty %}
             <p>No recent bookings to display.</p>
             {% endfor %}
             <div class="mt-20 text-center">
-                <a href="{% url 'booking_list' %}" class="button">View All Invoices</a>
+                <a href="{% url 'invoice_list' %}" class="button">View All Invoices</a>
             </div>
         </div>
     </div>
@@ -1068,6 +7145,8 @@ html_files_to_update = {
             const prevMonthBtn = document.getElementById('prevMonth');
             const nextMonthBtn = document.getElementById('nextMonth');
 
+            const occupancyUrlTemplate = "{% url 'occupancy_calendar' year=1970 month=1 %}";
+
             let currentMonth = new Date().getMonth();
             let currentYear = new Date().getFullYear();
 
@@ -1096,6 +7175,7 @@ html_files_to_update = {
                 }
 
                 // Add days of the month
+                const dayElements = [];
                 for (let day = 1; day <= daysInMonth; day++) {
                     const dayElement = document.createElement('div');
                     dayElement.classList.add('day');
@@ -1104,7 +7184,32 @@ html_files_to_update = {
                         dayElement.classList.add('selected'); // Highlight current day
                     }
                     calendarDaysContainer.appendChild(dayElement);
+                    dayElements.push(dayElement);
                 }
+
+                loadOccupancy(currentYear, currentMonth, dayElements);
+            }
+
+            // Colour each day by how many rooms are still free (computed server-side for the whole month)
+            function loadOccupancy(year, month, dayElements) {
+                const url = occupancyUrlTemplate.replace('1970/1/', `${year}/${month + 1}/`);
+                fetch(url)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (year !== currentYear || month !== currentMonth) {
+                            return; // The user has already moved to another month
+                        }
+                        data.days.forEach((occupancy, index) => {
+                            const dayElement = dayElements[index];
+                            if (occupancy.free === 0) {
+                                dayElement.classList.add('full');
+                            } else if (occupancy.booked > 0) {
+                                dayElement.classList.add('partial');
+                            }
+                            dayElement.title = `${occupancy.free} free, ${occupancy.booked} booked, ${occupancy.maintenance} in maintenance`;
+                        });
+                    })
+                    .catch(() => {}); // Keep the plain calendar if the endpoint is unreachable
             }
 
             prevMonthBtn.addEventListener('click', function() {
@@ -1156,7 +7261,7 @@ html_files_to_update = {
                         <td>{{ room.room_number }}</td>
                         <td>{{ room.room_type }}</td>
                         <td>{{ room.price }}</td>
-                        <td>{{ room.status }}</td>
+                        <td>{{ room.get_status_display }}</td>
                         <td>
                             <a href="{% url 'room_detail' pk=room.pk %}" class="button">View</a>
                             <a href="{% url 'room_update' pk=room.pk %}" class="button">Edit</a>
@@ -1170,6 +7275,7 @@ html_files_to_update = {
                 {% endfor %}
             </tbody>
         </table>
+        {% include 'hotel/pagination.html' %}
     </div>
 {% endblock %}
 """,
@@ -1184,13 +7290,40 @@ html_files_to_update = {
         <h3>Room {{ room.room_number }}</h3>
         <p><strong>Room Type:</strong> {{ room.room_type }}</p>
         <p><strong>Price:</strong> {{ room.price }}</p>
-        <p><strong>Status:</strong> {{ room.status }}</p>
+        <p><strong>Status:</strong> {{ room.get_status_display }}</p>
         <div class="mt-20">
             <a href="{% url 'room_list' %}" class="button">Back to Room List</a>
             <a href="{% url 'room_update' pk=room.pk %}" class="button">Edit</a>
             <a href="{% url 'room_delete' pk=room.pk %}" class="button delete">Delete</a>
         </div>
     </div>
+    <div class="card mt-20">
+        <h3>Status History</h3>
+        <table>
+            <thead>
+                <tr>
+                    <th>When</th>
+                    <th>From</th>
+                    <th>To</th>
+                    <th>Note</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for event in status_events %}
+                    <tr>
+                        <td>{{ event.changed_at|date:"M d, Y H:i" }}</td>
+                        <td>{{ event.from_status|default:"-" }}</td>
+                        <td>{{ event.get_to_status_display }}</td>
+                        <td>{{ event.note }}</td>
+                    </tr>
+                {% empty %}
+                    <tr>
+                        <td colspan="4">No status changes recorded yet.</td>
+                    </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
 {% endblock %}
 """,
     "room_form.html": """
@@ -1281,6 +7414,7 @@ html_files_to_update = {
                 {% endfor %}
             </tbody>
         </table>
+        {% include 'hotel/pagination.html' %}
     </div>
 {% endblock %}
 """,
@@ -1304,6 +7438,28 @@ html_files_to_update = {
             <a href="{% url 'booking_delete' pk=booking.pk %}" class="button delete">Delete</a>
         </div>
     </div>
+    <div class="card mt-20">
+        <h3>Bill</h3>
+        {% if booking.invoice %}
+            <p><strong>Room ({{ booking.invoice.nights }} night{{ booking.invoice.nights|pluralize }}):</strong> {{ booking.invoice.room_charges }}</p>
+            <p><strong>Services:</strong> {{ booking.invoice.service_charges }}</p>
+            <p><strong>Payments:</strong> {{ booking.invoice.payments }}</p>
+            <p><strong>Balance:</strong> {{ booking.invoice.balance }}</p>
+        {% endif %}
+        <form method="post" action="{% url 'booking_add_service' pk=booking.pk %}" class="mt-10" style="display: flex; align-items: center; gap: 10px;">
+            {% csrf_token %}
+            {{ service_form.service }} {{ service_form.quantity }}
+            <button type="submit" class="button">Add Service</button>
+        </form>
+        <form method="post" action="{% url 'booking_add_payment' pk=booking.pk %}" class="mt-10" style="display: flex; align-items: center; gap: 10px;">
+            {% csrf_token %}
+            {{ payment_form.amount }} {{ payment_form.payment_method }}
+            <button type="submit" class="button">Record Payment</button>
+        </form>
+        <div class="mt-20">
+            <a href="{% url 'invoice_detail' pk=booking.pk %}" class="button">Printable Invoice</a>
+        </div>
+    </div>
 {% endblock %}
 """,
     "booking_form.html": """
@@ -1390,6 +7546,7 @@ html_files_to_update = {
                 {% endfor %}
             </tbody>
         </table>
+        {% include 'hotel/pagination.html' %}
     </div>
 {% endblock %}
 """,
@@ -1438,6 +7595,395 @@ html_files_to_update = {
         </form>
     </div>
 {% endblock %}
+""",
+    "reports.html": """
+{% extends 'hotel/base.html' %}
+
+{% block title %}Reports{% endblock %}
+{% block header_title %}Revenue &amp; Occupancy{% endblock %}
+
+{% block content %}
+    <div class="card">
+        <form method="get" action="{% url 'reports' %}" class="mb-20" style="display: flex; align-items: center; gap: 10px;">
+            <label for="start">From:</label>
+            <input type="date" id="start" name="start" value="{{ start|date:'Y-m-d' }}">
+            <label for="end">To:</label>
+            <input type="date" id="end" name="end" value="{{ end|date:'Y-m-d' }}">
+            <select name="group_by">
+                <option value="month"{% if group_by == 'month' %} selected{% endif %}>By month</option>
+                <option value="day"{% if group_by == 'day' %} selected{% endif %}>By day</option>
+            </select>
+            <button type="submit" class="button">Show Report</button>
+        </form>
+        <form method="post" action="{% url 'job_create' %}" class="mb-20">
+            {% csrf_token %}
+            <input type="hidden" name="task" value="rebuild_reports">
+            <button type="submit" class="button">Rebuild Rollups in the Background</button>
+        </form>
+        {% if missing %}
+            <form method="post" action="{% url 'job_create' %}" class="mb-20">
+                {% csrf_token %}
+                <p>Not yet computed, so left out of the figures below:
+                    {% for first, last in missing %}{{ first|date:"M d, Y" }}{% if last != first %} &ndash; {{ last|date:"M d, Y" }}{% endif %}{% if not forloop.last %}, {% endif %}{% endfor %}
+                </p>
+                <input type="hidden" name="task" value="rebuild_reports">
+                <input type="hidden" name="gaps_only" value="1">
+                <input type="hidden" name="start" value="{{ start|date:'Y-m-d' }}">
+                <input type="hidden" name="end" value="{{ end|date:'Y-m-d' }}">
+                <button type="submit" class="button">Compute Missing Days in the Background</button>
+            </form>
+        {% endif %}
+        <table>
+            <thead>
+                <tr>
+                    <th>{% if group_by == 'month' %}Month{% else %}Date{% endif %}</th>
+                    <th>Room Type</th>
+                    <th>Room Nights Sold</th>
+                    <th>Occupancy</th>
+                    <th>Revenue</th>
+                    <th>ADR</th>
+                    <th>RevPAR</th>
+                    <th>Payments Collected</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for line in lines %}
+                    <tr>
+                        <td>{% if group_by == 'month' %}{{ line.period|date:"M Y" }}{% else %}{{ line.period|date:"M d, Y" }}{% endif %}</td>
+                        <td>{{ line.room_type }}</td>
+                        <td>{{ line.occupied_room_nights }}</td>
+                        <td>{% if line.occupancy is not None %}{{ line.occupancy }}%{% else %}-{% endif %}</td>
+                        <td>{{ line.revenue }}</td>
+                        <td>{{ line.adr|default_if_none:"-" }}</td>
+                        <td>{{ line.revpar|default_if_none:"-" }}</td>
+                        <td>{{ line.payments }}</td>
+                    </tr>
+                {% empty %}
+                    <tr>
+                        <td colspan="8">No data for this period. Rebuild the rollups after importing history.</td>
+                    </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+{% endblock %}
+""",
+    "housekeeping.html": """
+{% extends 'hotel/base.html' %}
+
+{% block title %}Housekeeping{% endblock %}
+{% block header_title %}Housekeeping{% endblock %}
+
+{% block content %}
+    <div class="card">
+        <p class="mb-20">
+            {% for label, count in status_counts %}{{ label }}: <strong>{{ count }}</strong>{% if not forloop.last %} &middot; {% endif %}{% endfor %}
+        </p>
+        <form method="post" action="{% url 'housekeeping' %}">
+            {% csrf_token %}
+            <div class="mb-20" style="display: flex; align-items: center; gap: 10px;">
+                <label for="to_status">Mark as:</label>
+                <select id="to_status" name="to_status">
+                    {% for value, label in statuses %}<option value="{{ value }}">{{ label }}</option>{% endfor %}
+                </select>
+                <label for="floor">Whole floor:</label>
+                <select id="floor" name="floor">
+                    <option value="">Ticked rooms only</option>
+                    {% for floor, rooms in floors %}<option value="{{ floor }}">Floor {{ floor }}</option>{% endfor %}
+                </select>
+                <input type="text" name="note" placeholder="Note (optional)" maxlength="200">
+                <button type="submit" class="button">Update</button>
+            </div>
+            {% for floor, rooms in floors %}
+                <h4>Floor {{ floor }}</h4>
+                <table class="mb-20">
+                    <thead>
+                        <tr>
+                            <th></th>
+                            <th>Room Number</th>
+                            <th>Room Type</th>
+                            <th>Status</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {% for room in rooms %}
+                            <tr>
+                                <td><input type="checkbox" name="rooms" value="{{ room.id }}"></td>
+                                <td><a href="{% url 'room_detail' pk=room.pk %}">{{ room.room_number }}</a></td>
+                                <td>{{ room.room_type }}</td>
+                                <td>{{ room.get_status_display }}</td>
+                            </tr>
+                        {% endfor %}
+                    </tbody>
+                </table>
+            {% empty %}
+                <p>No rooms yet.</p>
+            {% endfor %}
+        </form>
+    </div>
+{% endblock %}
+""",
+    "invoice_list.html": """
+{% extends 'hotel/base.html' %}
+
+{% block title %}Invoices{% endblock %}
+{% block header_title %}Invoices{% endblock %}
+
+{% block content %}
+    <div class="card">
+        <p class="mb-20">
+            Open balances: <strong>{{ outstanding.count }}</strong> invoice{{ outstanding.count|pluralize }},
+            <strong>{{ outstanding.total|default:"0.00" }}</strong> owed.
+            {% if show_all %}<a href="{% url 'invoice_list' %}">Show open balances only</a>{% else %}<a href="?show=all">Show all invoices</a>{% endif %}
+        </p>
+        <form method="post" action="{% url 'invoice_render' %}" class="mb-20" style="display: flex; align-items: center; gap: 10px;">
+            {% csrf_token %}
+            <select name="scope">
+                <option value="open">Open invoices</option>
+                <option value="all">All invoices</option>
+            </select>
+            <select name="format">
+                <option value="html">HTML</option>
+                {% if pdf_available %}<option value="pdf">PDF</option>{% endif %}
+            </select>
+            <button type="submit" class="button">Render Printable Copies</button>
+        </form>
+        {% if render_jobs %}
+            <ul class="mb-20">
+                {% for job in render_jobs %}
+                    <li><a href="{% url 'job_detail' pk=job.pk %}">Job {{ job.id }}</a> ({{ job.params.file_format|upper }}, {{ job.params.scope }}): {{ job.get_status_display|lower }}, {{ job.progress_done }}{% if job.progress_total is not None %} of {{ job.progress_total }}{% endif %} written{% if job.result.output_dir %} to {{ job.result.output_dir }}{% endif %}</li>
+                {% endfor %}
+            </ul>
+        {% endif %}
+        <table>
+            <thead>
+                <tr>
+                    <th>Invoice</th>
+                    <th>Guest</th>
+                    <th>Room</th>
+                    <th>Nights</th>
+                    <th>Room Charges</th>
+                    <th>Services</th>
+                    <th>Payments</th>
+                    <th>Balance</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for invoice in invoices %}
+                    <tr>
+                        <td><a href="{% url 'invoice_detail' pk=invoice.booking_id %}">INV-{{ invoice.booking_id }}</a></td>
+                        <td>{{ invoice.booking.guest.name }}</td>
+                        <td>{{ invoice.booking.room.room_number }}</td>
+                        <td>{{ invoice.nights }}</td>
+                        <td>{{ invoice.room_charges }}</td>
+                        <td>{{ invoice.service_charges }}</td>
+                        <td>{{ invoice.payments }}</td>
+                        <td><strong>{{ invoice.balance }}</strong></td>
+                    </tr>
+                {% empty %}
+                    <tr>
+                        <td colspan="8">No invoices found.</td>
+                    </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% include 'hotel/pagination.html' %}
+    </div>
+{% endblock %}
+""",
+    "invoice.html": """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Invoice INV-{{ booking.id }}</title>
+    {# Self-contained so the batch renderer's files print the same anywhere #}
+    <style>
+        body { font-family: Helvetica, Arial, sans-serif; color: #222; max-width: 760px; margin: 40px auto; }
+        h1 { font-size: 24px; margin-bottom: 4px; }
+        table { width: 100%; border-collapse: collapse; margin-top: 20px; }
+        th, td { padding: 6px 8px; border-bottom: 1px solid #ddd; text-align: left; }
+        td.amount, th.amount { text-align: right; }
+        tr.total td { font-weight: bold; border-top: 2px solid #222; }
+        @media print { .no-print { display: none; } }
+    </style>
+</head>
+<body>
+    <h1>Invoice INV-{{ booking.id }}</h1>
+    <p>{{ booking.guest.name }}<br>{{ booking.guest.contact_info|linebreaksbr }}</p>
+    <p>Room {{ booking.room.room_number }} ({{ booking.room.room_type }}), {{ booking.check_in_date|date:"M d, Y" }} &ndash; {{ booking.check_out_date|date:"M d, Y" }}{% if booking.status == 'cancelled' %} (cancelled){% endif %}</p>
+    <table>
+        <thead>
+            <tr><th>Item</th><th class="amount">Quantity</th><th class="amount">Unit Price</th><th class="amount">Amount</th></tr>
+        </thead>
+        <tbody>
+            <tr>
+                <td>Room {{ booking.room.room_number }}</td>
+                <td class="amount">{{ invoice.nights }} night{{ invoice.nights|pluralize }}</td>
+                <td class="amount"></td>
+                <td class="amount">{{ invoice.room_charges }}</td>
+            </tr>
+            {% for charge in booking.service_charges.all %}
+                <tr>
+                    <td>{{ charge.service.name }} ({{ charge.charged_at|date:"M d" }})</td>
+                    <td class="amount">{{ charge.quantity }}</td>
+                    <td class="amount">{{ charge.unit_price }}</td>
+                    <td class="amount">{{ charge.amount }}</td>
+                </tr>
+            {% endfor %}
+            {% for payment in booking.payment_set.all %}
+                <tr>
+                    <td>Payment, {{ payment.payment_method }} ({{ payment.payment_date|date:"M d, Y" }})</td>
+                    <td class="amount"></td>
+                    <td class="amount"></td>
+                    <td class="amount">-{{ payment.amount }}</td>
+                </tr>
+            {% endfor %}
+            <tr class="total">
+                <td colspan="3">Balance due</td>
+                <td class="amount">{{ invoice.balance }}</td>
+            </tr>
+        </tbody>
+    </table>
+    <p class="no-print"><button onclick="window.print()">Print</button></p>
+</body>
+</html>
+""",
+    "job_list.html": """
+{% extends 'hotel/base.html' %}
+
+{% block title %}Background Jobs{% endblock %}
+{% block header_title %}Background Jobs{% endblock %}
+
+{% block content %}
+    <div class="card">
+        <p class="mb-20">
+            {% for value, label, count in status_counts %}<a href="?status={{ value }}">{{ label }}</a>: <strong>{{ count }}</strong> &middot; {% endfor %}
+            <a href="{% url 'job_list' %}">All</a>
+        </p>
+        <p class="mb-20">Jobs are run by <code>python manage.py worker</code>, which hms.py starts next to the server.</p>
+        <div class="mb-20" style="display: flex; align-items: center; gap: 10px;">
+            {% for name, title in maintenance_tasks %}
+                <form method="post" action="{% url 'job_create' %}">
+                    {% csrf_token %}
+                    <input type="hidden" name="task" value="{{ name }}">
+                    <button type="submit" class="button">{{ title }}</button>
+                </form>
+            {% endfor %}
+        </div>
+        <form method="post" action="{% url 'job_create' %}" class="mb-20" style="display: flex; align-items: center; gap: 10px;">
+            {% csrf_token %}
+            <input type="hidden" name="task" value="export">
+            {{ export_form.kind }} {{ export_form.file_format }}
+            <label for="{{ export_form.start.id_for_label }}">From:</label> {{ export_form.start }}
+            <label for="{{ export_form.end.id_for_label }}">To:</label> {{ export_form.end }}
+            <label>{{ export_form.compress }} Gzip</label>
+            <button type="submit" class="button">Export to File</button>
+        </form>
+        <table>
+            <thead>
+                <tr>
+                    <th>Job</th>
+                    <th>Task</th>
+                    <th>Status</th>
+                    <th>Progress</th>
+                    <th>Attempts</th>
+                    <th>Queued</th>
+                    <th>Finished</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for job, title in jobs %}
+                    <tr>
+                        <td><a href="{% url 'job_detail' pk=job.pk %}">{{ job.id }}</a></td>
+                        <td>{{ title }}</td>
+                        <td>{{ job.get_status_display }}</td>
+                        <td>{% if job.percent is not None %}{{ job.percent }}%{% else %}{{ job.progress_done }}{% endif %}</td>
+                        <td>{{ job.attempts }} / {{ job.max_attempts }}</td>
+                        <td>{{ job.created_at|date:"M d, H:i:s" }}</td>
+                        <td>{{ job.finished_at|date:"M d, H:i:s"|default:"-" }}</td>
+                    </tr>
+                {% empty %}
+                    <tr>
+                        <td colspan="7">No jobs yet.</td>
+                    </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+{% endblock %}
+""",
+    "job_detail.html": """
+{% extends 'hotel/base.html' %}
+
+{% block title %}Job {{ job.id }}{% endblock %}
+{% block header_title %}Job {{ job.id }}: {{ title }}{% endblock %}
+
+{% block content %}
+    <div class="card">
+        <p><strong>Status:</strong> <span id="job-status">{{ job.get_status_display }}</span></p>
+        <p><strong>Progress:</strong> <progress id="job-bar" max="100"{% if job.percent is not None %} value="{{ job.percent }}"{% endif %}></progress>
+            <span id="job-progress">{{ job.progress_done }}{% if job.progress_total is not None %} of {{ job.progress_total }}{% endif %}</span>
+            <span id="job-message">{{ job.message }}</span></p>
+        <p><strong>Attempts:</strong> <span id="job-attempts">{{ job.attempts }}</span> of {{ job.max_attempts }}</p>
+        <p><strong>Queued:</strong> {{ job.created_at }}{% if job.started_at %} &middot; <strong>Started:</strong> {{ job.started_at }}{% endif %}{% if job.finished_at %} &middot; <strong>Finished:</strong> {{ job.finished_at }}{% endif %}</p>
+        {% if job.worker %}<p><strong>Worker:</strong> {{ job.worker }}</p>{% endif %}
+        {% if job.params %}<p><strong>Parameters:</strong> {% for key, value in job.params.items %}{{ key }}={{ value }}{% if not forloop.last %}, {% endif %}{% endfor %}</p>{% endif %}
+        {% if job.result %}<p><strong>Result:</strong> {% for key, value in job.result.items %}{{ key }}={{ value }}{% if not forloop.last %}, {% endif %}{% endfor %}</p>{% endif %}
+        {% if job.error %}
+            <p><strong>{% if job.status == 'failed' %}Error{% elif job.status == 'done' %}Error in an earlier attempt{% else %}Last error (will be retried){% endif %}:</strong></p>
+            <pre style="white-space: pre-wrap;">{{ job.error }}</pre>
+        {% endif %}
+        <div class="mt-20" style="display: flex; align-items: center; gap: 10px;">
+            <a href="{% url 'job_list' %}" class="button">Back to Jobs</a>
+            {% if job.task == 'export' and job.status == 'done' %}<a href="{% url 'job_download' pk=job.pk %}" class="button">Download {{ job.result.filename }}</a>{% endif %}
+            {% if job.status == 'failed' %}
+                <form method="post" action="{% url 'job_retry' pk=job.pk %}">
+                    {% csrf_token %}
+                    <button type="submit" class="button">Retry</button>
+                </form>
+            {% endif %}
+        </div>
+    </div>
+    {% if not job.finished %}
+        <script>
+            // Follow the job until it finishes, then reload for the result or error
+            const progressUrl = "{% url 'job_progress' pk=job.pk %}";
+            const timer = setInterval(function() {
+                fetch(progressUrl)
+                    .then(response => response.json())
+                    .then(data => {
+                        document.getElementById('job-status').textContent = data.status_display;
+                        document.getElementById('job-progress').textContent = data.total === null ? data.done : `${data.done} of ${data.total}`;
+                        document.getElementById('job-message').textContent = data.message;
+                        document.getElementById('job-attempts').textContent = data.attempts;
+                        if (data.percent !== null) {
+                            document.getElementById('job-bar').value = data.percent;
+                        }
+                        if (data.finished) {
+                            clearInterval(timer);
+                            window.location.reload();
+                        }
+                    })
+                    .catch(() => {}); // Try again on the next tick
+            }, 2000);
+        </script>
+    {% endif %}
+{% endblock %}
+""",
+    "pagination.html": """
+<div class="pagination">
+    {% if page.previous_cursor %}
+        <a href="?{% if page.querystring %}{{ page.querystring }}&amp;{% endif %}before={{ page.previous_cursor }}" class="button">&laquo; Previous</a>
+    {% else %}
+        <span class="button disabled">&laquo; Previous</span>
+    {% endif %}
+    {% if page.next_cursor %}
+        <a href="?{% if page.querystring %}{{ page.querystring }}&amp;{% endif %}after={{ page.next_cursor }}" class="button">Next &raquo;</a>
+    {% else %}
+        <span class="button disabled">Next &raquo;</span>
+    {% endif %}
+</div>
 """,
     "guest_confirm_delete.html": """
 {% extends 'hotel/base.html' %}
@@ -1458,35 +8004,74 @@ html_files_to_update = {
 """
 }
 
-for filename, content in html_files_to_update.items():
-    file_path = os.path.join(templates_dir, filename)
+@step("11", "Create base.html and update other templates to extend it", parallel=True)
+def write_templates():
+    # Ensure the templates directory exists before trying to create files in it
+    print(f"Ensuring template directory exists: {templates_dir}")
+    try:
+        os.makedirs(templates_dir, exist_ok=True)
+        # Optional: Add a small delay if timing is suspected to be an issue on certain systems
+        # time.sleep(0.1)
+        if not os.path.isdir(templates_dir): # Double check if directory exists
+            raise OSError(f"Failed to create directory: {templates_dir}")
+    except Exception as e:
+        print(f"Error creating template directory {templates_dir}: {e}")
+        sys.exit(1)
+    print(f"Creating base.html at: {base_html_path}")
     try:
-        with open(file_path, "w") as f:
-            f.write(content)
-        print(f"Updated {file_path} to extend base.html and use styling classes.")
+        write_file(base_html_path, base_html_content)
+        print("base.html created successfully.")
     except Exception as e:
-        print(f"An error occurred while writing to {file_path}: {e}")
+        print(f"An error occurred while writing to base.html: {e}")
         sys.exit(1)
+    print(f"Creating template context processors at: {context_processors_file_path}")
+    try:
+        write_file(context_processors_file_path, context_processors_content)
+        print("context_processors.py created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to context_processors.py: {e}")
+        sys.exit(1)
+    print(f"Creating room_availability.html at: {room_availability_html_path}")
+    try:
+        write_file(room_availability_html_path, room_availability_html_content)
+        print("room_availability.html created successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to room_availability.html: {e}")
+        sys.exit(1)
+
+    for filename, content in html_files_to_update.items():
+        file_path = os.path.join(templates_dir, filename)
+        try:
+            write_file(file_path, content)
+            print(f"Updated {file_path} to extend base.html and use styling classes.")
+        except Exception as e:
+            print(f"An error occurred while writing to {file_path}: {e}")
+            sys.exit(1)
+
+    print("HTML templates updated with dynamic data, forms, and navigation links.")
 
-print("HTML templates updated with dynamic data, forms, and navigation links.")
 
 # --- Step 12: Configure URLs in hotel/urls.py ---
 app_urls_file_path = os.path.join(app_name, "urls.py")
-print(f"Creating/Updating {app_urls_file_path}")
 app_urls_content = """
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI (HOTEL_ASYNC_VIEWS) the read-heavy pages come from hotel/async_views.py
+read_views = async_views if getattr(settings, 'HOTEL_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.home, name='home'), # Home page for the hotel app
+    path('', read_views.home, name='home'), # Home page for the hotel app
     path('book_room_from_dashboard/', views.book_room_from_dashboard, name='book_room_from_dashboard'), # New URL for dashboard booking
 
     # Room URLs
-    path('rooms/', views.room_list, name='room_list'),
+    path('rooms/', read_views.room_list, name='room_list'),
     path('rooms/<int:pk>/', views.room_detail, name='room_detail'),
     path('rooms/new/', views.room_create, name='room_create'),
     path('rooms/<int:pk>/edit/', views.room_update, name='room_update'),
     path('rooms/<int:pk>/delete/', views.room_delete, name='room_delete'),
+    path('housekeeping/', views.housekeeping, name='housekeeping'), # Room statuses and batch transitions
 
     # Booking URLs
     path('bookings/', views.booking_list, name='booking_list'),
@@ -1494,36 +8079,64 @@ urlpatterns = [
     path('bookings/new/', views.booking_create, name='booking_create'),
     path('bookings/<int:pk>/edit/', views.booking_update, name='booking_update'),
     path('bookings/<int:pk>/delete/', views.booking_delete, name='booking_delete'),
+    path('bookings/<int:pk>/services/', views.booking_add_service, name='booking_add_service'),
+    path('bookings/<int:pk>/payments/', views.booking_add_payment, name='booking_add_payment'),
+
+    # Invoice URLs
+    path('invoices/', views.invoice_list, name='invoice_list'),
+    path('invoices/<int:pk>/', views.invoice_detail, name='invoice_detail'), # pk is the booking id
+    path('invoices/render/', views.invoice_render, name='invoice_render'),
+
+    # Background job URLs
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/new/', views.job_create, name='job_create'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/progress/', views.job_progress, name='job_progress'), # JSON, polled by the job page
+    path('jobs/<int:pk>/retry/', views.job_retry, name='job_retry'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
 
     # Guest URLs
-    path('guests/', views.guest_list, name='guest_list'),
+    path('guests/', read_views.guest_list, name='guest_list'),
     path('guests/<int:pk>/', views.guest_detail, name='guest_detail'),
     path('guests/new/', views.guest_create, name='guest_create'),
     path('guests/<int:pk>/edit/', views.guest_update, name='guest_update'),
     path('guests/<int:pk>/delete/', views.guest_delete, name='guest_delete'),
-    path('room_availability/', views.room_availability, name='room_availability'), # New URL for room availability
+    path('room_availability/', read_views.room_availability, name='room_availability'), # New URL for room availability
+    path('room_availability/batch/', views.room_availability_batch, name='room_availability_batch'), # JSON, many date ranges per call
+    path('dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
+    path('metrics', views.metrics, name='metrics'), # Prometheus scrape target
+
+    path('calendar/<int:year>/<int:month>/', views.occupancy_calendar, name='occupancy_calendar'),
+    path('export/<str:kind>/', views.export_data, name='export_data'), # ?format=csv|json&start=&end=&gzip=1
+    path('reports/', views.report_view, name='reports'),
 ]
 """
-try:
-    with open(app_urls_file_path, 'w') as f:
-        f.write(app_urls_content)
-    print(f"{app_name}/urls.py created/updated successfully.")
-except Exception as e:
-    print(f"An error occurred while writing to {app_urls_file_path}: {e}")
-    sys.exit(1)
+
+@step("12", "Configure URLs in hotel/urls.py", parallel=True)
+def write_app_urls():
+    print(f"Creating/Updating {app_urls_file_path}")
+    try:
+        write_file(app_urls_file_path, app_urls_content)
+        print(f"{app_name}/urls.py created/updated successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to {app_urls_file_path}: {e}")
+        sys.exit(1)
+
 
 # --- Step 13: Configure main project's urls.py to include app URLs ---
 project_urls_file_path = os.path.join(main_project_name, "urls.py")
-print(f"Configuring main project's urls.py: {project_urls_file_path}")
-
 # Explicitly define the content for the main urls.py to ensure correctness
 # This will overwrite the existing urls.py to ensure the root path is handled.
 project_urls_content_new = f"""
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from {app_name}.assets import serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('{app_name}.urls')), # Include the hotel app's URLs at the root
@@ -1532,45 +8145,538 @@ urlpatterns = [
 # Serve static files during development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+elif 'whitenoise.middleware.WhiteNoiseMiddleware' not in settings.MIDDLEWARE:
+    # Production without WhiteNoise: precompressed variants, immutable lifetimes for hashed names
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+    ]
 """
-try:
-    with open(project_urls_file_path, 'w') as f:
-        f.write(project_urls_content_new.strip()) # .strip() removes leading/trailing newlines
-    print(f"Main project's {main_project_name}/urls.py configured successfully.")
-except Exception as e:
-    print(f"An error occurred while writing to {project_urls_file_path}: {e}")
-    sys.exit(1)
+
+@step("13", "Configure main project's urls.py to include app URLs", parallel=True)
+def write_project_urls():
+    print(f"Configuring main project's urls.py: {project_urls_file_path}")
+    try:
+        write_file(project_urls_file_path, project_urls_content_new.strip()) # .strip() removes leading/trailing newlines
+        print(f"Main project's {main_project_name}/urls.py configured successfully.")
+    except Exception as e:
+        print(f"An error occurred while writing to {project_urls_file_path}: {e}")
+        sys.exit(1)
+
+
+# --- Step 13a: Warm templates and URLs when the WSGI/ASGI application loads ---
+entry_point_files = [os.path.join(main_project_name, "wsgi.py"), os.path.join(main_project_name, "asgi.py")]
+warmup_on_load = f"""
+
+# Compile the {app_name} templates and URL patterns before the first request ({app_name}/warmup.py)
+from {app_name}.warmup import warm
+
+warm()
+"""
+
+@step("13a", "Warm templates and URLs when the WSGI/ASGI application loads", parallel=True)
+def add_warmup_to_entry_points():
+    for entry_point in entry_point_files:
+        print(f"Adding start-up warm-up to: {entry_point}")
+        try:
+            with open(entry_point, 'r') as f:
+                entry_point_content = f.read()
+            if "warmup import warm" not in entry_point_content:
+                entry_point_content = entry_point_content.rstrip("\n") + "\n" + warmup_on_load
+            write_file(entry_point, entry_point_content)
+        except FileNotFoundError:
+            print(f"Error: {entry_point} not found")
+            sys.exit(1)
+        except Exception as e:
+            print(f"An error occurred while modifying {entry_point}: {e}")
+            sys.exit(1)
+
+
+# --- Step 13b: Serve the async read views from the ASGI entry point ---
+asgi_file_path = os.path.join(main_project_name, "asgi.py")
+asgi_settings_line = f"os.environ.setdefault('DJANGO_SETTINGS_MODULE', '{main_project_name}.settings')\n"
+asgi_async_views = (
+    "# ASGI servers run the async read views (hotel/async_views.py); WSGI servers keep the sync ones\n"
+    "os.environ.setdefault('HOTEL_ASYNC_VIEWS', '1')\n"
+)
+
+@step("13b", "Serve the async read views from the ASGI entry point")
+def enable_async_views_for_asgi():
+    print(f"Enabling async views in: {asgi_file_path}")
+    try:
+        with open(asgi_file_path, 'r') as f:
+            asgi_content = f.read()
+        if "HOTEL_ASYNC_VIEWS" not in asgi_content:
+            if asgi_settings_line not in asgi_content:
+                print(f"Error: could not find the DJANGO_SETTINGS_MODULE line in {asgi_file_path}")
+                sys.exit(1)
+            asgi_content = asgi_content.replace(asgi_settings_line, asgi_settings_line + asgi_async_views, 1)
+        write_file(asgi_file_path, asgi_content)
+    except FileNotFoundError:
+        print(f"Error: {asgi_file_path} not found")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An error occurred while modifying {asgi_file_path}: {e}")
+        sys.exit(1)
+
 
 # --- Step 14: Run migrations ---
-print("Running Django migrations...")
-try:
-    subprocess.run([sys.executable, "manage.py", "makemigrations", app_name], check=True)
-    subprocess.run([sys.executable, "manage.py", "migrate"], check=True)
-    print("Migrations applied successfully.")
-except subprocess.CalledProcessError as e:
-    error_output = e.stderr.decode() if e.stderr else "No error output."
-    print(f"Error running migrations: {error_output}")
-    sys.exit(1)
+# Hand-written migrations by name, in order. Each is numbered and chained onto the app's latest
+# migration when it is first written (see add_custom_migrations), so it lands after whatever
+# schema migration makemigrations just generated, on fresh and upgraded trees alike.
+custom_migrations = {
+    "guest_search_index": """
+from django.db import migrations, OperationalError
+
+
+def create_guest_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return # Other backends use the in-process token index in hotel/search.py
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE hotel_guest_fts USING fts5("
+            "name, contact_info, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        )
+    except OperationalError:
+        return # SQLite built without FTS5
+    schema_editor.execute(
+        "INSERT INTO hotel_guest_fts(rowid, name, contact_info) SELECT id, name, contact_info FROM hotel_guest"
+    )
+
+
+def drop_guest_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS hotel_guest_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '__leaf__'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_guest_search_index, drop_guest_search_index),
+    ]
+""",
+    "booking_stay_range": """
+from django.db import migrations
+
+
+def add_stay_range(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return # SQLite keeps using booking_room_dates_idx
+    # The stay is derived from the two date columns, so no write path has to maintain it.
+    # '[]' because a room counts as taken on its check-out day too (BookingQuerySet.overlapping)
+    schema_editor.execute(
+        "ALTER TABLE hotel_booking ADD COLUMN stay daterange "
+        "GENERATED ALWAYS AS (daterange(check_in_date, check_out_date, '[]')) STORED"
+    )
+    # btree_gist lets room_id share a GiST index with the range for the per-room overlap check
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute("CREATE INDEX booking_room_stay_gist ON hotel_booking USING gist (room_id, stay)")
+    schema_editor.execute("CREATE INDEX booking_stay_gist ON hotel_booking USING gist (stay)")
+
+
+def drop_stay_range(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE hotel_booking DROP COLUMN IF EXISTS stay") # Drops both indexes with it
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '__leaf__'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_stay_range, drop_stay_range),
+    ]
+""",
+    "room_status_values": """
+from django.db import migrations
+
+# Room.status used to be free text; map what earlier builds stored onto the RoomStatus values
+LEGACY_STATUSES = {'booked': 'occupied', 'occupied': 'occupied', 'dirty': 'dirty', 'cleaning': 'cleaning',
+                   'available': 'available', 'maintenance': 'maintenance'}
+
+
+def normalise_room_statuses(apps, schema_editor):
+    Room = apps.get_model('hotel', 'Room')
+    RoomStatusEvent = apps.get_model('hotel', 'RoomStatusEvent')
+    events = []
+    for room_id, status in Room.objects.values_list('id', 'status'):
+        # Anything unrecognised is taken out of sale until someone looks at it
+        new_status = LEGACY_STATUSES.get(status.strip().lower(), 'maintenance')
+        if new_status != status:
+            Room.objects.filter(id=room_id).update(status=new_status)
+            events.append(RoomStatusEvent(room_id=room_id, from_status=status[:20], to_status=new_status,
+                                          note="Converted from the free-text status"))
+    RoomStatusEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '__leaf__'), # The schema migration with RoomStatus choices and RoomStatusEvent
+    ]
+
+    operations = [
+        migrations.RunPython(normalise_room_statuses, migrations.RunPython.noop),
+    ]
+""",
+    "booking_no_overlap": """
+from django.db import migrations
+
+CONSTRAINT = 'booking_room_stay_excl'
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return # SQLite relies on save_booking() serialising writers
+    # The database's own guarantee that no two live bookings of a room share a day, whatever
+    # path wrote them (bulk imports, the admin, raw SQL); save_booking() checks the same rule first.
+    # Fails, naming the clashing rows, if the table already holds double bookings.
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE hotel_booking ADD CONSTRAINT {CONSTRAINT} "
+        "EXCLUDE USING gist (room_id WITH =, stay WITH &&) WHERE (status <> 'cancelled')"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"ALTER TABLE hotel_booking DROP CONSTRAINT IF EXISTS {CONSTRAINT}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '__leaf__'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
+""",
+    "status_event_room_numbers": """
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_room_numbers(apps, schema_editor):
+    # Events logged before RoomStatusEvent kept the room number of its own
+    Room = apps.get_model('hotel', 'Room')
+    RoomStatusEvent = apps.get_model('hotel', 'RoomStatusEvent')
+    RoomStatusEvent.objects.filter(room_number='', room__isnull=False).update(
+        room_number=Subquery(Room.objects.filter(pk=OuterRef('room_id')).values('room_number')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '__leaf__'), # The schema migration adding RoomStatusEvent.room_number
+    ]
+
+    operations = [
+        migrations.RunPython(fill_room_numbers, migrations.RunPython.noop),
+    ]
+""",
+}
+
+migrations_dir = os.path.join(app_name, "migrations")
+
+
+def migration_graph():
+    """{migration name: names of the app's migrations it depends on}, read from the files on disk."""
+    graph = {}
+    for filename in os.listdir(migrations_dir):
+        if re.fullmatch(r"\d{4}_\w+\.py", filename):
+            with open(os.path.join(migrations_dir, filename)) as f:
+                graph[filename[:-3]] = set(re.findall(rf"\('{app_name}', '(\w+)'\)", f.read()))
+    return graph
+
+
+def leaf_migrations(graph):
+    depended_on = set().union(*graph.values()) if graph else set()
+    return sorted(name for name in graph if name not in depended_on)
+
+
+def custom_migration_name(name):
+    """The custom_migrations key of a migration name like 0005_room_status_values, or None."""
+    suffix = name[5:]
+    return suffix if suffix in custom_migrations else None
+
+
+def remove_orphaned_custom_migrations():
+    """
+    Earlier versions of this script pinned each hand-written migration to a fixed predecessor,
+    which forks the graph when makemigrations adds a migration alongside it. migrate refuses a
+    forked graph, so nothing on the hand-written branch ever ran: remove it to be rewritten.
+    """
+    graph = migration_graph()
+    if len(leaf_migrations(graph)) < 2:
+        return
+    keep = set()
+    pending = [name for name in leaf_migrations(graph) if not custom_migration_name(name)]
+    while pending:
+        name = pending.pop()
+        if name not in keep:
+            keep.add(name)
+            pending.extend(graph.get(name, ()))
+    for name in graph:
+        if name not in keep and custom_migration_name(name):
+            print(f"Removing {name}: it forked the migration graph and was never applied")
+            os.remove(os.path.join(migrations_dir, name + ".py"))
+
+
+def add_custom_migrations():
+    """Write the hand-written migrations not on disk yet, each numbered after and depending on the current leaf."""
+    present = {custom_migration_name(name) for name in migration_graph()}
+    for key, content in custom_migrations.items():
+        if key in present:
+            continue # Already part of the history, whatever number it got
+        leaves = leaf_migrations(migration_graph())
+        if len(leaves) != 1:
+            raise RuntimeError(f"Expected one latest migration, found {', '.join(leaves) or 'none'}")
+        name = f"{int(leaves[0][:4]) + 1:04d}_{key}"
+        write_file(os.path.join(migrations_dir, name + ".py"), content.replace("__leaf__", leaves[0]))
+    importlib.invalidate_caches() # New modules for --in-process runs
+
+
+@step("14", "Run migrations",
+      fingerprint=lambda: file_digest(models_file_path) + json.dumps(custom_migrations, sort_keys=True) + run_options["database"],
+      products=("db.sqlite3",))
+def run_migrations():
+    print("Running Django migrations...")
+    try:
+        remove_orphaned_custom_migrations()
+        manage("makemigrations", app_name)
+        # Hand-written migrations for schema the autodetector cannot express
+        add_custom_migrations()
+        manage("migrate")
+        print("Migrations applied successfully.")
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.decode() if e.stderr else "No error output."
+        print(f"Error running migrations: {error_output}")
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"Error running migrations: {e}")
+        sys.exit(1)
+
 
 # --- Step 15: Collect static files (important for production, good practice for dev) ---
-print("Collecting static files...")
-try:
-    subprocess.run([sys.executable, "manage.py", "collectstatic", "--noinput"], check=True)
-    print("Static files collected successfully.")
-except subprocess.CalledProcessError as e:
-    error_output = e.stderr.decode() if e.stderr else "No error output."
-    print(f"Error collecting static files: {error_output}")
-    sys.exit(1)
+
+@step("15", "Collect static files (important for production, good practice for dev)",
+      fingerprint=lambda: tree_digest(os.path.join(app_name, "static")) + content_digest(assets_content),
+      products=("staticfiles",))
+def collect_static():
+    print("Collecting static files...")
+    try:
+        manage("collectstatic", "--noinput")
+        print("Static files collected successfully.")
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.decode() if e.stderr else "No error output."
+        print(f"Error collecting static files: {error_output}")
+        sys.exit(1)
 
 
 # --- Step 16: Run the development server ---
-print("Starting Django development server...")
-print("Access the application at: http://127.0.0.1:8000/")
-print("Press Ctrl+C to stop the server.")
-try:
-    process = subprocess.Popen([sys.executable, "manage.py", "runserver", "8000"])
-    process.wait() # Wait for the process to terminate
-except FileNotFoundError:
-    print("Error: 'python' command not found. Make sure Python is in your PATH.")
-except Exception as e:
-    print(f"An error occurred while starting the server: {e}")
+
+server_address = ("127.0.0.1", 8000)
+
+
+def production_server_command():
+    """The best installed production server: gunicorn, then uvicorn, then the project's threaded `serve` command."""
+    host, port = server_address
+    cpus = os.cpu_count() or 1
+    if importlib.util.find_spec("gunicorn"):
+        # Sync workers handle one request at a time, hence the usual 2 x CPUs + 1
+        return [sys.executable, "-m", "gunicorn", f"{main_project_name}.wsgi:application",
+                "--bind", f"{host}:{port}", "--workers", str(2 * cpus + 1),
+                "--keep-alive", "5", "--graceful-timeout", "30"]
+    if importlib.util.find_spec("uvicorn"):
+        return [sys.executable, "-m", "uvicorn", f"{main_project_name}.asgi:application",
+                "--host", host, "--port", str(port), "--workers", str(cpus),
+                "--timeout-keep-alive", "5", "--timeout-graceful-shutdown", "30"]
+    return [sys.executable, "manage.py", "serve", "--bind", f"{host}:{port}", "--workers", str(cpus)]
+
+
+def start_job_worker(env=None):
+    """`manage.py worker` next to the web server, so queued background jobs run without a second terminal."""
+    print("Starting the background job worker (manage.py worker)...")
+    return subprocess.Popen([sys.executable, "manage.py", "worker"], env=env)
+
+
+def stop_job_worker(worker):
+    # The worker finishes the jobs it is running before it exits
+    worker.terminate()
+    worker.wait()
+
+
+def run_production_server():
+    command = production_server_command()
+    print(f"Starting production server: {' '.join(command[1:])}")
+    print(f"Access the application at: http://{server_address[0]}:{server_address[1]}/ (DEBUG off)")
+    print("Send SIGHUP to the server process to reload workers gracefully; Ctrl+C stops it.")
+    env = dict(os.environ, DJANGO_DEBUG="0")
+    worker = start_job_worker(env)
+    process = subprocess.Popen(command, env=env)
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        process.terminate()
+        process.wait()
+    finally:
+        stop_job_worker(worker)
+
+
+@step("16", "Run the server", always=True, blocking=True)
+def run_server():
+    if run_options["serve"] == "production":
+        run_production_server()
+        return
+    print("Starting Django development server...")
+    print("Access the application at: http://127.0.0.1:8000/")
+    print("Press Ctrl+C to stop the server.")
+    worker = start_job_worker()
+    try:
+        process = subprocess.Popen([sys.executable, "manage.py", "runserver", "8000"])
+        process.wait() # Wait for the process to terminate
+    except FileNotFoundError:
+        print("Error: 'python' command not found. Make sure Python is in your PATH.")
+    except Exception as e:
+        print(f"An error occurred while starting the server: {e}")
+    finally:
+        stop_job_worker(worker)
+
+
+# --- Runner ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Provision the hotel management Django project step by step.")
+    parser.add_argument("--only", help="Comma-separated step ids to run, e.g. 7,9,14")
+    parser.add_argument("--from", dest="from_step", help="Run this step and every step after it")
+    parser.add_argument("--force", action="store_true", help="Re-run selected steps even when they are up to date")
+    parser.add_argument("--list", action="store_true", help="List the steps and exit")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run startproject/startapp/makemigrations/migrate/collectstatic through call_command() in this process")
+    parser.add_argument("--serve", choices=("dev", "production"), default="dev",
+                        help="Finish with runserver (dev) or a multi-worker server with DEBUG off (production)")
+    parser.add_argument("--database", choices=("sqlite", "postgres"), default="sqlite",
+                        help="Database profile written to settings.py (postgres reads POSTGRES_* from the environment)")
+    parser.add_argument("--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Threads for the file-generation steps (1 runs them one after another)")
+    return parser.parse_args(argv)
+
+
+def select_steps(args):
+    ids = [s["id"] for s in STEPS]
+    wanted = set(ids)
+    if args.only:
+        wanted = {step_id.strip() for step_id in args.only.split(",") if step_id.strip()}
+    if args.from_step:
+        if args.from_step not in ids:
+            print(f"Unknown step for --from: {args.from_step}. Use --list to see the steps.")
+            sys.exit(1)
+        wanted &= set(ids[ids.index(args.from_step):])
+    unknown = wanted - set(ids)
+    if unknown:
+        print(f"Unknown step(s): {', '.join(sorted(unknown))}. Use --list to see the steps.")
+        sys.exit(1)
+    return [s for s in STEPS if s["id"] in wanted or s["required"]]
+
+
+def up_to_date(s):
+    """Return the reason a step can be skipped, or None if it has to run."""
+    if s["always"]:
+        return None
+    if s["done"] and s["done"]():
+        return "already done"
+    if s["fingerprint"] and all(os.path.exists(p) for p in s["products"]):
+        recorded = manifest.get(s["id"], {}).get("fingerprint")
+        if recorded == content_digest(s["fingerprint"]()):
+            return "up to date"
+    return None
+
+
+def run_step(s, force):
+    """Run (or skip) one step and return its timing row."""
+    started = time.perf_counter()
+    reason = None if force else up_to_date(s)
+    if reason:
+        print(f"\n--- Step {s['id']}: {s['title']} --- skipped ({reason})")
+        return (s["id"], s["title"], f"skipped ({reason})", time.perf_counter() - started)
+
+    print(f"\n--- Step {s['id']}: {s['title']} ---")
+    current_step.id, current_step.changed = s["id"], []
+    manifest.pop(s["id"], None)
+    s["function"]()
+    entry = manifest.setdefault(s["id"], {})
+    if s["fingerprint"]:
+        entry["fingerprint"] = content_digest(s["fingerprint"]())
+    if current_step.changed and not s["fingerprint"]:
+        status = f"wrote {len(current_step.changed)} file(s)"
+    elif "outputs" in entry and not s["fingerprint"]:
+        status = "unchanged"
+    else:
+        status = "ran"
+    return (s["id"], s["title"], status, time.perf_counter() - started)
+
+
+def batches(selected, jobs):
+    """Group consecutive parallel steps together; every other step is a batch of its own."""
+    batch = []
+    for s in selected:
+        if s["parallel"] and jobs > 1:
+            batch.append(s)
+            continue
+        if batch:
+            yield batch
+            batch = []
+        yield [s]
+    if batch:
+        yield batch
+
+
+def print_timings(timings, started, args):
+    mode = "in-process" if args.in_process else "subprocess"
+    print(f"\n--- Step timings ({mode} commands, {args.jobs} job(s)) ---")
+    for step_id, title, status, elapsed in timings:
+        print(f"  {step_id:>3}  {elapsed:8.3f}s  {status:<22} {title}")
+    print(f"  end-to-end {time.perf_counter() - started:8.3f}s")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        for s in STEPS:
+            print(f"{s['id']:>3}  {s['title']}")
+        return
+    run_options["in_process"] = args.in_process
+    run_options["serve"] = args.serve
+    run_options["database"] = args.database
+
+    manifest_path = os.path.abspath(os.path.join(project_dir, MANIFEST_FILE))
+    load_manifest(manifest_path)
+
+    started = time.perf_counter()
+    timings = []
+    selected = select_steps(args)
+    for batch in batches(selected, args.jobs):
+        if batch[0]["blocking"]:
+            save_manifest(manifest_path)
+            print_timings(timings, started, args)
+        if len(batch) == 1:
+            timings.append(run_step(batch[0], args.force))
+        else:
+            with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                timings.extend(pool.map(lambda s: run_step(s, args.force), batch))
+        save_manifest(manifest_path)
+
+    if not any(s["blocking"] for s in selected):
+        print_timings(timings, started, args)
+
+
+if __name__ == "__main__":
+    main()